@@ -0,0 +1,491 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for loading and accessing the Emoji symbols data.
+
+Usage: ./benchmark.py [benchmark name...]
+Runs all benchmarks if no names are given.
+"""
+
+__author__ = "Markus Scherer"
+
+import gc
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import xml.dom.minidom
+import carrier_detect
+import emoji4unicode
+import emoji4unicode_test
+import symbol_store
+
+def _MicrosecondsPerCall(function, args, repetitions=20000):
+  """Calls function(*args) repeatedly and returns the average time."""
+  start = time.time()
+  for i in xrange(repetitions):
+    function(*args)
+  return (time.time() - start) * 1e6 / repetitions
+
+
+def _LinearScan(carrier, uni):
+  """Finds a symbol like before the reverse lookup indexes."""
+  for symbol in emoji4unicode.GetSymbols():
+    if symbol.GetCarrierUnicode(carrier) == uni: return symbol
+  return None
+
+
+def _ConvertViaSymbol(source, target, uni):
+  """Converts a carrier code like before the conversion tables."""
+  symbol = emoji4unicode.SymbolFromCarrierUnicode(source, uni)
+  if not symbol: return None
+  (is_fallback, codes) = symbol.GetCarrierCodes(target)
+  if codes: return (is_fallback, codes, "")
+  return (True, (), symbol.GetTextFallback())
+
+
+def _BenchmarkLookups():
+  """Reverse lookups: The time should not depend on the symbol's position."""
+  emoji4unicode.Load()
+  symbols = list(emoji4unicode.GetSymbols())
+  positions = (("first", symbols[0]),
+               ("middle", symbols[len(symbols) / 2]),
+               ("last", symbols[-1]))
+  print "%-44s %10s %10s %10s" % ("microseconds per lookup", "first",
+                                  "middle", "last")
+  def PrintRow(label, function, GetArgs, repetitions=20000):
+    times = []
+    for (position, symbol) in positions:
+      times.append(_MicrosecondsPerCall(function, GetArgs(symbol),
+                                        repetitions))
+    print "%-44s %10.3f %10.3f %10.3f" % tuple([label] + times)
+  for carrier in ("docomo", "google"):
+    PrintRow("SymbolFromCarrierUnicode(%s)" % carrier,
+             emoji4unicode.SymbolFromCarrierUnicode,
+             lambda symbol: (carrier, symbol.GetCarrierUnicode(carrier)))
+  PrintRow("SymbolFromUnicode",
+           emoji4unicode.SymbolFromUnicode,
+           lambda symbol: (symbol.GetUnicode() or
+                           symbol.GetProposedUnicode(),))
+  PrintRow("SymbolFromName",
+           emoji4unicode.SymbolFromName,
+           lambda symbol: (symbol.GetName(),))
+  PrintRow("SymbolFromGlyphRefID",
+           emoji4unicode.SymbolFromGlyphRefID,
+           lambda symbol: (symbol.GetGlyphRefID(),))
+  PrintRow("ConvertCarrierUnicode(google, docomo)",
+           emoji4unicode.ConvertCarrierUnicode,
+           lambda symbol: ("google", "docomo",
+                           symbol.GetCarrierUnicode("google")))
+  PrintRow("conversion table .get() (google, docomo)",
+           emoji4unicode.GetCarrierConversionTable("google", "docomo").get,
+           lambda symbol: (symbol.GetCarrierUnicode("google"),))
+  PrintRow("symbol lookup + GetCarrierCodes(docomo)",
+           _ConvertViaSymbol,
+           lambda symbol: ("google", "docomo",
+                           symbol.GetCarrierUnicode("google")))
+  PrintRow("linear scan over GetSymbols() (google)",
+           _LinearScan,
+           lambda symbol: ("google", symbol.GetCarrierUnicode("google")),
+           200)
+  # Carrier codes at the start, middle and end of the carrier's ranges.
+  for carrier in ("docomo", "kddi", "softbank"):
+    carrier_data = emoji4unicode.all_carrier_data[carrier]
+    all_uni = sorted(carrier_data.all_uni)
+    times = []
+    for uni in (all_uni[0], all_uni[len(all_uni) / 2], all_uni[-1]):
+      times.append(_MicrosecondsPerCall(carrier_data.SymbolFromUnicode,
+                                        (uni,)))
+    print "%-44s %10.3f %10.3f %10.3f" % tuple(
+        ["CarrierData.SymbolFromUnicode (%s)" % carrier] + times)
+  # Membership of code point integers, at the start, middle and end.
+  for carrier in ("docomo", "kddi", "softbank"):
+    carrier_data = emoji4unicode.all_carrier_data[carrier]
+    code_points = list(carrier_data.code_points)
+    code_points = (code_points[0], code_points[len(code_points) / 2],
+                   code_points[-1])
+    all_uni = carrier_data.all_uni
+    for (label, Contains) in (
+        ("\"%%04X\" in all_uni (%s)",
+         lambda code_point: "%04X" % code_point in all_uni),
+        ("in code_points (%s)", carrier_data.code_points.__contains__)):
+      times = []
+      for code_point in code_points:
+        times.append(_MicrosecondsPerCall(Contains, (code_point,)))
+      print "%-44s %10.3f %10.3f %10.3f" % tuple([label % carrier] + times)
+
+
+# Entry points for the startup benchmark: What a short script does
+# before it can print its first result.
+_STARTUP_ENTRY_POINTS = (
+    ("Load()", "emoji4unicode.Load()"),
+    ("SymbolFromName()",
+     "emoji4unicode.Load(); emoji4unicode.SymbolFromName('CLOUD')"),
+    ("ImageHTML() (docomo)",
+     "emoji4unicode.Load(); emoji4unicode.id_to_symbol['000'].ImageHTML()"),
+    ("GetARIB()",
+     "emoji4unicode.Load(); emoji4unicode.id_to_symbol['000'].GetARIB()"),
+    ("UnicodeHasVariationSequence()",
+     "emoji4unicode.Load(); "
+     "emoji4unicode.id_to_symbol['000'].UnicodeHasVariationSequence()"),
+    ("all carriers", "emoji4unicode.Load(); "
+     "[emoji4unicode.all_carrier_data[c].code_points "
+     "for c in emoji4unicode.carriers]"),
+)
+
+def _MillisecondsPerProcess(code, repetitions=15):
+  """Runs code in fresh Python processes and returns the best time.
+
+  Measures CPU time. Module imports are not included.
+  """
+  script = ("import time; import emoji4unicode; start = time.clock(); %s; "
+            "print (time.clock() - start)" % code)
+  best = None
+  for i in xrange(repetitions):
+    process = subprocess.Popen([sys.executable, "-c", script],
+                               stdout=subprocess.PIPE,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds = float(process.communicate()[0])
+    if best is None or seconds < best: best = seconds
+  return best * 1000
+
+
+def _BenchmarkStartup():
+  """Startup: Time until each entry point returns, in a fresh process."""
+  print "%-44s %10s %10s" % ("milliseconds", "parse", "snapshot")
+  for (label, code) in _STARTUP_ENTRY_POINTS:
+    parse = _MillisecondsPerProcess(
+        "import snapshot; snapshot.SetCacheDirectory(None); " + code)
+    # The first run writes the snapshots if they are missing.
+    cached = _MillisecondsPerProcess(code)
+    print "%-44s %10.1f %10.1f" % (label, parse, cached)
+
+
+def _BenchmarkStore():
+  """Symbol store: Opening the mmap file vs. loading the database."""
+  emoji4unicode.Load()
+  temp_dir = tempfile.mkdtemp()
+  try:
+    filename = os.path.join(temp_dir, "benchmark.symbols")
+    symbol_store.Write(emoji4unicode.GetDefaultDatabase(), filename)
+    print "file size: %d bytes" % os.path.getsize(filename)
+    print "%-44s %10s" % ("milliseconds in a fresh process", "")
+    print "%-44s %10.1f" % ("emoji4unicode.Load() + SymbolFromName()",
+                            _MillisecondsPerProcess(
+                                "emoji4unicode.Load(); "
+                                "emoji4unicode.SymbolFromName('CLOUD')"))
+    print "%-44s %10.1f" % ("SymbolStore() + SymbolFromId()",
+                            _MillisecondsPerProcess(
+                                "import symbol_store; "
+                                "symbol_store.SymbolStore(%r)."
+                                "SymbolFromId('001')" % filename))
+    store = symbol_store.SymbolStore(filename)
+    symbol = emoji4unicode.id_to_symbol["001"]
+    stored = store.SymbolFromId("001")
+    print "%-44s %10s %10s" % ("microseconds per call", "Symbol",
+                               "StoreSymbol")
+    for (label, function, args) in (
+        ("GetCarrierUnicode('docomo')", "GetCarrierUnicode", ("docomo",)),
+        ("GetCarrierCodePoints('docomo')", "GetCarrierCodePoints",
+         ("docomo",)),
+        ("GetName()", "GetName", ())):
+      print "%-44s %10.3f %10.3f" % (
+          label,
+          _MicrosecondsPerCall(getattr(symbol, function), args),
+          _MicrosecondsPerCall(getattr(stored, function), args))
+    store.close()
+  finally:
+    shutil.rmtree(temp_dir)
+
+
+def _BenchmarkWrite():
+  """Write(): Reading and writing the emoji4unicode.xml document."""
+  here = os.path.dirname(os.path.abspath(__file__))
+  e4u_filename = os.path.join(here, "..", "data", "emoji4unicode.xml")
+  document = emoji4unicode.ReadDocument(e4u_filename)
+  doc = xml.dom.minidom.parse(e4u_filename)
+  temp_dir = tempfile.mkdtemp()
+  try:
+    filename = os.path.join(temp_dir, "emoji4unicode.xml")
+    print "%-44s %10s" % ("milliseconds per call", "")
+    print "%-44s %10.1f" % ("emoji4unicode.ReadDocument()",
+                            _MicrosecondsPerCall(emoji4unicode.ReadDocument,
+                                                 (e4u_filename,), 20) / 1000)
+    print "%-44s %10.1f" % ("minidom parse()",
+                            _MicrosecondsPerCall(xml.dom.minidom.parse,
+                                                 (e4u_filename,), 20) / 1000)
+    print "%-44s %10.1f" % ("emoji4unicode.Write()",
+                            _MicrosecondsPerCall(emoji4unicode.Write,
+                                                 (document, filename),
+                                                 20) / 1000)
+    # The previous Write(): minidom's writexml() into a line-reassembling
+    # writer.
+    print "%-44s %10.1f" % ("previous Write() with minidom writexml()",
+                            _MicrosecondsPerCall(
+                                emoji4unicode_test.WriteWithWritexml,
+                                (doc, filename), 20) / 1000)
+    # For comparison: minidom's own serializer, without the file layout.
+    print "%-44s %10.1f" % ("minidom toxml()",
+                            _MicrosecondsPerCall(doc.toxml, ("UTF-8",),
+                                                 20) / 1000)
+  finally:
+    shutil.rmtree(temp_dir)
+    doc.unlink()
+
+
+def _PrivateKilobytes():
+  """Returns the private (unshared) memory of this process, or None.
+
+  Reads /proc/self/smaps, which is Linux-specific.
+  """
+  try:
+    smaps = open("/proc/self/smaps")
+  except IOError:
+    return None
+  total = 0
+  for line in smaps:
+    if line.startswith("Private_"): total += int(line.split()[1])
+  smaps.close()
+  return total
+
+
+def _WorkerWorkload():
+  """What a forked worker might do: Lookups touching all of the data."""
+  for symbol in emoji4unicode.GetSymbols():
+    emoji4unicode.SymbolFromName(symbol.GetName())
+    symbol.GetARIB()
+    symbol.UnicodeHasVariationSequence()
+  for carrier in emoji4unicode.carriers:
+    carrier_data = emoji4unicode.all_carrier_data[carrier]
+    for uni in carrier_data.all_uni: carrier_data.SymbolFromUnicode(uni)
+    emoji4unicode.GetSymbolsSortedByCarrierUnicode(carrier)
+  emoji4unicode.GetSymbolsSortedByUnicode()
+  len(emoji4unicode.GetQuery().new)
+  gc.collect()
+
+
+def _PrintWorkerMemory(prepare, workers=4):
+  """Runs prepare, forks workers and prints their average private memory."""
+  exec prepare
+  pipes = []
+  for i in xrange(workers):
+    (read_fd, write_fd) = os.pipe()
+    if os.fork() == 0:
+      os.close(read_fd)
+      before = _PrivateKilobytes()
+      _WorkerWorkload()
+      os.write(write_fd, "%d" % (_PrivateKilobytes() - before))
+      os._exit(0)
+    os.close(write_fd)
+    pipes.append(read_fd)
+  total = 0
+  for read_fd in pipes:
+    total += int(os.read(read_fd, 100))
+    os.close(read_fd)
+    os.wait()
+  print total / workers
+
+
+def _BenchmarkFork():
+  """Pre-fork: Private memory per forked worker after its workload."""
+  if _PrivateKilobytes() is None:
+    print "requires /proc/self/smaps"
+    return
+  print "%-44s %10s" % ("kB newly private per worker", "")
+  # Load() + LoadAll() separates the saving from preloading the data
+  # from the saving from PreloadForFork()'s garbage collection.
+  for (label, prepare) in (
+      ("Load()", "emoji4unicode.Load()"),
+      ("Load() + LoadAll()", "emoji4unicode.Load(); "
+                             "emoji4unicode.GetDefaultDatabase().LoadAll()"),
+      ("PreloadForFork()", "emoji4unicode.PreloadForFork()")):
+    script = "import benchmark; benchmark._PrintWorkerMemory(%r)" % prepare
+    process = subprocess.Popen([sys.executable, "-c", script],
+                               stdout=subprocess.PIPE,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    print "%-44s %10s" % (label, process.communicate()[0].strip())
+
+
+# The gen_html.sh variants.
+_GEN_HTML_ARGUMENTS = (
+    (),
+    ("--only_in_proposal",),
+    ("--no_codes",),
+    ("--proposed_by_unicode", "--show_only_font_chars"),
+    ("--only_in_proposal", "--show_only_font_chars"),
+    ("--emoji_data",),
+)
+
+def _BenchmarkGenHTML():
+  """gen_html: Generating each chart in a fresh process."""
+  print "%-44s %10s" % ("milliseconds", "")
+  total = 0
+  for arguments in _GEN_HTML_ARGUMENTS:
+    # Discard the chart but print the time to the real stdout.
+    milliseconds = _MillisecondsPerProcess(
+        "import gen_html, os, sys; stdout = sys.stdout; "
+        "sys.stdout = open(os.devnull, 'w'); "
+        "sys.argv = ['gen_html.py'] + %r; gen_html.main(); "
+        "sys.stdout = stdout" % list(arguments), 5)
+    total += milliseconds
+    print "%-44s %10.1f" % (" ".join(("gen_html.py",) + arguments),
+                            milliseconds)
+  print "%-44s %10.1f" % ("total", total)
+
+
+def _ScalarLookUpCodePoints(carrier_data, code_points):
+  """One SymbolFromUnicode() call per code point, for comparison."""
+  results = ([], [], [])
+  for code_point in code_points:
+    symbol = carrier_data.SymbolFromUnicode("%04X" % code_point)
+    results[0].append(symbol.shift_jis)
+    results[1].append(symbol.jis)
+    results[2].append(symbol.number)
+  return results
+
+
+def _BenchmarkBatch(count=1000000):
+  """batch: Looking up many code points at once."""
+  emoji4unicode.Load()
+  print "%-44s %10s %10s" % ("milliseconds per %d code points" % count,
+                             "scalar", "batch")
+  for carrier in ("docomo", "kddi", "softbank"):
+    carrier_data = emoji4unicode.all_carrier_data[carrier]
+    # Mostly the carrier's own code points, plus some out of range.
+    all_code_points = list(carrier_data.code_points)
+    code_points = [all_code_points[i % len(all_code_points)]
+                   for i in xrange(count)]
+    code_points[::10] = [0x41] * len(code_points[::10])
+    carrier_data.LookUpCodePoints(code_points[:1])  # Build the tables.
+    times = []
+    batch = lambda data, code_points: data.LookUpCodePoints(code_points)
+    for LookUp in (_ScalarLookUpCodePoints, batch):
+      best = None
+      for i in range(3):
+        start = time.clock()
+        LookUp(carrier_data, code_points)
+        milliseconds = (time.clock() - start) * 1000
+        if best is None or milliseconds < best: best = milliseconds
+      times.append(best)
+    print "%-44s %10.1f %10.1f" % tuple(["LookUpCodePoints (%s)" % carrier] +
+                                        times)
+
+
+def _ScanByteLoop(lead_bytes, trail_bytes, buffer):
+  """Emoji positions in a Shift-JIS buffer, decoding one byte at a time."""
+  positions = []
+  i = 0
+  length = len(buffer)
+  while i < length:
+    b = ord(buffer[i])
+    if 0x81 <= b <= 0x9f or 0xe0 <= b <= 0xfc:
+      if (b in lead_bytes and i + 1 < length and
+          ord(buffer[i + 1]) in trail_bytes):
+        positions.append(i)
+      i += 2
+    else:
+      i += 1
+  return positions
+
+
+def _ScanByteClasses(classes, buffer):
+  """Emoji positions in a Shift-JIS buffer, via ByteClasses.Find()."""
+  positions = []
+  i = classes.Find(buffer)
+  while i >= 0:
+    positions.append(i)
+    i = classes.Find(buffer, i + 2)
+  return positions
+
+
+def _BenchmarkScan(megabytes=4):
+  """scan: Finding Emoji in multi-megabyte Shift-JIS text."""
+  emoji4unicode.Load()
+  # Japanese-like text: ASCII, kanji, half-width katakana,
+  # and about one Emoji code per kilobyte.
+  # The kanji 88F8 has a trail byte which looks like a DoCoMo lead byte.
+  mixed_chunk = ("Tokyo 2012: \x93\x8c\x8b\x9e\x93\x73\x82\xcc\x88\xf8"
+                 "\xb1\xb2 ") * 40
+  # Only double-byte characters: Nearly every byte could be a lead byte.
+  kanji_chunk = "\x93\x8c\x8b\x9e\x93\x73\x82\xcc\x88\xf8" * 100
+  print "%-44s %10s %10s %10s" % ("milliseconds per %d MB" % megabytes,
+                                  "byte loop", "Find()", "matches")
+  for (text, chunk) in (("mixed", mixed_chunk), ("kanji", kanji_chunk)):
+    for carrier in ("docomo", "kddi", "softbank"):
+      carrier_data = emoji4unicode.all_carrier_data[carrier]
+      classes = carrier_data.GetShiftJISByteClasses()
+      symbol = carrier_data.SymbolFromUnicode(min(carrier_data.all_uni))
+      emoji = symbol.shift_jis.decode("hex")
+      buffer = (chunk + emoji) * (megabytes * 1024 * 1024 / (len(chunk) + 2))
+      times = []
+      for Scan in (lambda: _ScanByteLoop(classes.lead_bytes,
+                                         classes.trail_bytes, buffer),
+                   lambda: _ScanByteClasses(classes, buffer)):
+        start = time.clock()
+        positions = Scan()
+        times.append((time.clock() - start) * 1000)
+      print "%-44s %10.1f %10.1f %10d" % tuple(
+          ["%s Shift-JIS, %s text" % (carrier, text)] + times +
+          [len(positions)])
+
+
+def _BenchmarkDetect(megabytes=4):
+  """detect: Guessing the carrier of multi-megabyte Shift-JIS text."""
+  emoji4unicode.Load()
+  detector = carrier_detect.GetDefaultDetector()
+  chunk = ("Tokyo 2012: \x93\x8c\x8b\x9e\x93\x73\x82\xcc\x88\xf8"
+           "\xb1\xb2 ") * 40
+  print "%-44s %10s %10s %10s" % ("milliseconds per call", "prefix",
+                                  "%d MB" % megabytes, "guess")
+  for carrier in ("docomo", "kddi", "softbank"):
+    carrier_data = emoji4unicode.all_carrier_data[carrier]
+    symbol = carrier_data.SymbolFromUnicode(max(carrier_data.all_uni))
+    buffer = ((chunk + symbol.shift_jis.decode("hex")) *
+              (megabytes * 1024 * 1024 / (len(chunk) + 2)))
+    times = []
+    for max_bytes in (carrier_detect.DEFAULT_MAX_BYTES, len(buffer)):
+      times.append(_MicrosecondsPerCall(detector.Detect, (buffer, max_bytes),
+                                        5) / 1000)
+    print "%-44s %10.2f %10.2f %10s" % tuple(
+        ["Detect() (%s)" % carrier] + times + [detector.Detect(buffer)[0][0]])
+
+
+_BENCHMARKS = (
+    ("lookups", _BenchmarkLookups),
+    ("startup", _BenchmarkStartup),
+    ("store", _BenchmarkStore),
+    ("write", _BenchmarkWrite),
+    ("fork", _BenchmarkFork),
+    ("gen_html", _BenchmarkGenHTML),
+    ("batch", _BenchmarkBatch),
+    ("scan", _BenchmarkScan),
+    ("detect", _BenchmarkDetect),
+)
+
+def main():
+  names = sys.argv[1:]
+  for (name, function) in _BENCHMARKS:
+    if names and name not in names: continue
+    print "*** %s: %s" % (name, function.__doc__)
+    function()
+    print
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Byte-class tables for finding Emoji codes in Shift-JIS byte strings.
+
+A ByteClasses object classifies each of the 256 byte values as a lead byte
+and/or trail byte of a set of double-byte Emoji codes, in a table for
+str.translate(), and compiles a regular expression for a lead byte followed
+by a trail byte.
+Its Find() method searches a Shift-JIS buffer for the next possible Emoji
+code without a Python loop over the bytes: One regular expression match
+steps over whole characters, so that it stays at character boundaries.
+
+Usage:
+  classes = carrier_data.GetDocomoData().GetShiftJISByteClasses()
+  i = classes.Find(buffer)
+  while i >= 0:
+    ...  # buffer[i:i + 2] may be a DoCoMo Emoji code.
+    i = classes.Find(buffer, i + 2)
+"""
+
+__author__ = "Markus Scherer"
+
+import re
+
+# Bits in the ByteClasses.table values.
+LEAD = 1
+TRAIL = 2
+
+# Bytes which start double-byte Shift-JIS characters,
+# including the user-defined area F0..FC where carriers encode Emoji.
+_SHIFT_JIS_LEAD_BYTES = frozenset(range(0x81, 0xa0) + range(0xe0, 0xfd))
+
+def _CharClass(byte_values, except_byte_values=()):
+  """Returns a regular expression character class for the byte values."""
+  return "[%s]" % "".join(["\\x%02x" % b for b in sorted(byte_values)
+                           if b not in except_byte_values])
+
+
+class ByteClasses(object):
+  """Lead and trail byte classes of a set of double-byte Shift-JIS codes.
+
+  Attributes:
+    lead_bytes: frozenset of the lead byte values of the codes.
+    trail_bytes: frozenset of the trail byte values of the codes.
+    table: 256-byte string for str.translate(), mapping each byte value
+      to chr() of its LEAD and TRAIL bits.
+    pair_re: Compiled regular expression which matches a lead byte
+      followed by a trail byte.
+  """
+  def __init__(self, codes):
+    """Compute the byte classes.
+
+    Args:
+      codes: Iterable of double-byte Shift-JIS code integers,
+        lead byte in bits 15..8.
+    """
+    lead_bytes = set()
+    trail_bytes = set()
+    for code in codes:
+      lead_bytes.add(code >> 8)
+      trail_bytes.add(code & 0xff)
+    self.lead_bytes = frozenset(lead_bytes)
+    self.trail_bytes = frozenset(trail_bytes)
+    table = []
+    for b in xrange(256):
+      byte_class = 0
+      if b in lead_bytes: byte_class |= LEAD
+      if b in trail_bytes: byte_class |= TRAIL
+      table.append(chr(byte_class))
+    self.table = "".join(table)
+    # Matches whole characters up to the next lead byte followed by
+    # a trail byte: Single bytes, double-byte characters with other lead bytes,
+    # and lead bytes followed by other bytes.
+    skip = [_CharClass(xrange(256), _SHIFT_JIS_LEAD_BYTES) + "+",
+            "(?:%s[\\x00-\\xff])+" %
+            _CharClass(_SHIFT_JIS_LEAD_BYTES, lead_bytes)]
+    if lead_bytes:
+      self.pair_re = re.compile(_CharClass(lead_bytes) +
+                                _CharClass(trail_bytes))
+      skip.append(_CharClass(lead_bytes) +
+                  _CharClass(xrange(256), trail_bytes))
+    else:
+      self.pair_re = re.compile("(?!)")  # Never matches.
+    # Always matches, without backtracking: The alternatives start with
+    # different bytes.
+    self.__skip_re = re.compile("(?:%s)*" % "|".join(skip))
+
+  def Find(self, buffer, start=0):
+    """Find the next possible Emoji code in a Shift-JIS byte string.
+
+    Skips pairs which look like a code but start with the trail byte of
+    another double-byte character.
+    Does not check whether the pair is actually one of the codes,
+    only that its lead and trail bytes are in the classes.
+
+    Args:
+      buffer: Shift-JIS byte string.
+      start: Index in buffer where a character starts.
+
+    Returns:
+      The index of the next lead byte of a possible Emoji code,
+      or -1 if there is none.
+    """
+    index = self.__skip_re.match(buffer, start).end()
+    # The match stops before a lead byte followed by a trail byte,
+    # or before a lone lead byte at the end of the buffer.
+    if index + 1 < len(buffer): return index
+    return -1
@@ -0,0 +1,103 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = "Markus Scherer"
+
+import random
+import unittest
+import byte_classes
+import carrier_data
+
+def _FindAllByLoop(classes, buffer):
+  """Reference implementation: Decode Shift-JIS one byte at a time."""
+  positions = []
+  i = 0
+  while i < len(buffer):
+    b = ord(buffer[i])
+    if 0x81 <= b <= 0x9f or 0xe0 <= b <= 0xfc:
+      if (b in classes.lead_bytes and i + 1 < len(buffer) and
+          ord(buffer[i + 1]) in classes.trail_bytes):
+        positions.append(i)
+      i += 2
+    else:
+      i += 1
+  return positions
+
+
+def _FindAll(classes, buffer):
+  positions = []
+  i = classes.Find(buffer)
+  while i >= 0:
+    positions.append(i)
+    i = classes.Find(buffer, i + 2)
+  return positions
+
+
+class ByteClassesTest(unittest.TestCase):
+  def setUp(self):
+    self.__classes = byte_classes.ByteClasses((0xF89F, 0xF8A0, 0xF940))
+
+  def testClasses(self):
+    classes = self.__classes
+    self.assertEqual(classes.lead_bytes, frozenset((0xf8, 0xf9)))
+    self.assertEqual(classes.trail_bytes, frozenset((0x9f, 0xa0, 0x40)))
+    self.assertEqual(len(classes.table), 256)
+    self.assertEqual(ord(classes.table[0xf8]), byte_classes.LEAD)
+    self.assertEqual(ord(classes.table[0x40]), byte_classes.TRAIL)
+    self.assertEqual(ord(classes.table[0x41]), 0)
+    self.assertEqual("A\xf8\x9f".translate(classes.table), "\0\1\2")
+
+  def testFind(self):
+    classes = self.__classes
+    self.assertEqual(classes.Find(""), -1)
+    self.assertEqual(classes.Find("abc\xf8\x9f"), 3)
+    self.assertEqual(classes.Find("abc\xf8\x9f", 4), -1)
+    self.assertEqual(classes.Find("abc\xf8"), -1)
+    # F8 is the trail byte of the kanji 88F8.
+    self.assertEqual(classes.Find("\x88\xf8\x9f"), -1)
+    self.assertEqual(classes.Find("\x88\x88\xf8\x9f"), 2)
+    self.assertEqual(classes.Find("\x88\xf8\xf9\x40"), 2)
+    self.assertEqual(classes.Find("\x88\xf8" * 100 + "\xf8\x9f"), 200)
+    self.assertEqual(classes.Find("\x88\xf8" * 100 + "\xf8"), -1)
+    # Half-width katakana are single bytes.
+    self.assertEqual(classes.Find("\xb1\xf8\x9f"), 1)
+    self.assertEqual(byte_classes.ByteClasses(()).Find("\xf8\x9f"), -1)
+
+  def testSameAsLoop(self):
+    """Find() finds the same positions as decoding byte by byte."""
+    random.seed(1)
+    alphabet = ["a", "\xb1", "\x88", "\xe0", "\x40", "\x9f", "\xf8", "\xf9"]
+    for classes in (self.__classes,
+                    carrier_data.GetKddiData().GetShiftJISByteClasses()):
+      for length in range(50):
+        for i in range(20):
+          buffer = "".join([random.choice(alphabet) for j in range(length)])
+          self.assertEqual(_FindAll(classes, buffer),
+                           _FindAllByLoop(classes, buffer), repr(buffer))
+
+  def testCarrierClasses(self):
+    for data in (carrier_data.GetDocomoData(), carrier_data.GetKddiData(),
+                 carrier_data.GetSoftbankData(), carrier_data.GetGoogleData()):
+      self.assertEqual(data.GetShiftJISByteClasses().lead_bytes,
+                       data.GetShiftJISLeadBytes())
+      self.assertEqual(data.GetJISByteClassesAsShiftJIS().lead_bytes,
+                       data.GetJISLeadBytesAsShiftJIS())
+    classes = carrier_data.GetDocomoData().GetShiftJISByteClasses()
+    self.assertEqual(classes.Find("Rain: \xf8\xa1"), 6)
+
+
+if __name__ == "__main__":
+  unittest.main()
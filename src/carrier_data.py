@@ -18,69 +18,131 @@
 
 __author__ = "Markus Scherer"
 
+import array
+import collections
 import os.path
-import xml.dom.minidom
+import xml.parsers.expat
+import byte_classes
+import range_set
 import row_cell
+import snapshot
+
+try:
+  import numpy
+except ImportError:
+  numpy = None  # LookUpCodePoints() works without NumPy, but more slowly.
+
+_DEFAULT_DATA_ROOT = os.path.join(os.path.dirname(__file__), "..", "data")
+
+# Value in the LookUpCodePoints() result arrays for a code point
+# without a Shift-JIS code, JIS code or number.
+UNMAPPED = -1
 
 class CarrierData(object):
   """One carrier's Emoji symbols data.
 
+  The carriers are defined in the carriers.xml file in the data folder,
+  see _ParseDefinitions().
+
   Attributes:
-    all_uni: All Unicode code points, for all of this carrier's symbols.
+    carrier: Lowercase carrier name.
+    code_points: range_set.RangeSet of the Unicode code point integers,
+      for all of this carrier's symbols.
+    all_uni: The same code points as a frozenset of hex-digit strings.
+      Built on first use from code_points.
   """
-  all_uni = frozenset()
+  carrier = None
+  code_points = range_set.RangeSet()
 
   # Each _ranges attribute is a list of range tuples for mapping between
   # linear ranges of Unicode code points and corresponding linear, same-length
   # ranges of target values.
   # Shift-JIS or JIS target values only count valid codes according to the
   # encoding scheme.
-  # See _RangeFromUnicode(), _NumberFromUnicode(), etc.
+  # See _CompileTable().
   _uni_to_number_ranges = None
   _uni_to_old_number_ranges = None
   _uni_to_shift_jis_ranges = None
   _uni_to_jis_ranges = None
-  # Map from Unicode code point hex-digit strings to <e> DOM element nodes
-  # with symbol data.
-  _uni_to_elements = {}
+  # Dense lookup tables compiled from the ranges by _ParseDefinitions(),
+  # or None if there are no such ranges. See _CompileTable().
+  _number_table = None
+  _old_number_table = None
+  _shift_jis_table = None
+  _jis_table = None
+  # Map from field names to maps from range target values back to Unicode
+  # code point hex-digit strings, compiled by _ParseDefinitions().
+  _range_reverse_maps = None
+  # Tuple of image rules, see _ImageHTML().
+  _images = ()
+  # _AttributeTable with the attributes of the <e> elements with symbol data.
+  # Each instance with a carrier_data.xml file reads its own table.
+  _attributes = None
+  # Pairs of (filename, snapshot.GetFileState()) for the files that were read.
+  _source_states = ()
+  # Map from Symbol field name to a map from the field values back to
+  # Unicode code point hex-digit strings. Built on first use.
+  __reverse_maps = None
+  # Map from Unicode code point hex-digit strings to the shared Symbol objects
+  # returned by SymbolFromUnicode(). Created on first use.
+  __symbols = None
+  # frozenset for all_uni, built on first use.
+  __all_uni = None
+  # Tables for LookUpCodePoints(), built on first use.
+  __batch_tables = None
+  # Pair of Shift-JIS and JIS-as-Shift-JIS byte_classes.ByteClasses,
+  # built on first use.
+  __byte_classes = None
+
+  def __init__(self, carrier, data_root):
+    """Do not instantiate directly: Use GetCarrierData().
 
-  def _AllUnicodesFromRanges(self, ranges):
-    """Build the all_uni set from a list of range tuples."""
-    all_uni = set()
-    for one_range in ranges:
-      for uni in range(one_range[0], one_range[1] + 1):
-        all_uni.add("%04X" % uni)
-    self.all_uni = frozenset(all_uni)
-
-  def _CheckRanges(self):
-    """Verify that in each range tuple the source and target ranges
-    have the same length."""
-    if self._uni_to_number_ranges:
-      for range in self._uni_to_number_ranges:
-        assert (range[1] - range[0]) == (range[3] - range[2])
-    if self._uni_to_old_number_ranges:
-      for range in self._uni_to_old_number_ranges:
-        assert (range[1] - range[0]) == (range[3] - range[2])
-    if self._uni_to_shift_jis_ranges:
-      for range in self._uni_to_shift_jis_ranges:
-        # Shift the Shift-JIS codes down to JIS X 0208 and compute the
-        # linear differences.
-        shift_jis_start = row_cell.FromShiftJis((range[2] >> 8) - 0x10,
-                                                range[2] & 0xff)
-        shift_jis_end = row_cell.FromShiftJis((range[3] >> 8) - 0x10,
-                                              range[3] & 0xff)
-        assert (range[1] - range[0]) == (shift_jis_end - shift_jis_start)
-    if self._uni_to_jis_ranges:
-      for range in self._uni_to_jis_ranges:
-        jis_start = row_cell.From2022((range[2] >> 8), range[2] & 0xff)
-        jis_end = row_cell.From2022((range[3] >> 8), range[3] & 0xff)
-        assert (range[1] - range[0]) == (jis_end - jis_start)
+    Args:
+      carrier: Lowercase carrier name.
+      data_root: Path of the data folder with the carriers.xml file.
+    """
+    filename = os.path.join(data_root, _DEFINITIONS_FILENAME)
+    self._source_states = ((filename, snapshot.GetFileState(filename)),)
+    definition = snapshot.Load(filename, _ParseDefinitions,
+                               version=2).get(carrier)
+    if definition is None:
+      raise ValueError("unknown carrier \"%s\"" % carrier)
+    self.carrier = carrier
+    self.code_points = range_set.RangeSet(definition["code_points"])
+    ranges = definition["ranges"]
+    self._uni_to_number_ranges = ranges.get("number")
+    self._uni_to_old_number_ranges = ranges.get("old_number")
+    self._uni_to_shift_jis_ranges = ranges.get("shift_jis")
+    self._uni_to_jis_ranges = ranges.get("jis")
+    tables = definition["tables"]
+    self._number_table = tables.get("number")
+    self._old_number_table = tables.get("old_number")
+    self._shift_jis_table = tables.get("shift_jis")
+    self._jis_table = tables.get("jis")
+    self._range_reverse_maps = definition["reverse"]
+    self._images = definition["images"]
+    if definition["data"]:
+      self._ReadXML(os.path.join(data_root, *definition["data"].split("/")))
 
   def _ReadXML(self, filename):
-    self.__doc = xml.dom.minidom.parse(filename)
-    self.__root = self.__doc.documentElement
-    for element in self.__root.getElementsByTagName("e"):
-      self._uni_to_elements[element.getAttribute("unicode")] = element
+    self._source_states += ((filename, snapshot.GetFileState(filename)),)
+    self._attributes = _AttributeTable(
+        snapshot.Load(filename, _ParseXML, version=2))
+
+  @property
+  def all_uni(self):
+    all_uni = self.__all_uni
+    if all_uni is None:
+      # Concurrent callers might each build the set; any one will do.
+      all_uni = self.__all_uni = frozenset(
+          ["%04X" % code_point for code_point in self.code_points])
+    return all_uni
+
+  def IsCurrent(self):
+    """Returns False if a data file has changed since it was read."""
+    for (filename, state) in self._source_states:
+      if not snapshot.IsFileCurrent(filename, state): return False
+    return True
 
   def SymbolFromUnicode(self, uni):
     """Get carrier data for one Emoji symbol.
@@ -90,50 +152,226 @@ class CarrierData(object):
 
     Returns:
       The Symbol instance corresponding to uni.
+      For the carrier's code points, there is one shared, immutable
+      Symbol instance per code point.
     """
-    symbol = Symbol()
-    symbol.uni = uni
-    symbol._element = self._uni_to_elements.get(uni)
-    symbol._carrier_data = self
-
-    if self._uni_to_number_ranges:
-      symbol.number = _NumberFromUnicode(self._uni_to_number_ranges, uni)
-    elif symbol._element:
-      number = symbol._element.getAttribute("number")
-      if number: symbol.number = int(number)
-
-    if self._uni_to_old_number_ranges:
-      symbol.old_number = _NumberFromUnicode(self._uni_to_old_number_ranges,
-                                             uni)
-    elif symbol._element:
-      old_number = symbol._element.getAttribute("old_number")
-      if old_number: symbol.old_number = int(old_number)
-
-    if self._uni_to_shift_jis_ranges:
-      symbol.shift_jis = (
-          "%04X" % _ShiftJisFromUnicode(self._uni_to_shift_jis_ranges, uni))
-    elif symbol._element:
-      shift_jis = symbol._element.getAttribute("shift_jis")
-      if shift_jis: symbol.shift_jis = shift_jis
-
-    if self._uni_to_jis_ranges:
-      symbol.jis = "%04X" % _JisFromUnicode(self._uni_to_jis_ranges, uni)
-    elif symbol._element:
-      jis = symbol._element.getAttribute("jis")
-      if jis: symbol.jis = jis
-
-    if symbol._element:
-      new_number = symbol._element.getAttribute("new_number")
-      if new_number: symbol.new_number = int(new_number)
-
+    symbols = self.__symbols
+    if symbols is None:
+      # Concurrent callers might each create the map; any one will do.
+      symbols = self.__symbols = {}
+    symbol = symbols.get(uni)
+    if symbol: return symbol
+    return self.__NewSymbol(symbols, uni, int(uni, 16))
+
+  def __SymbolFromCodePoint(self, code_point):
+    """Like SymbolFromUnicode() but for a code point integer."""
+    symbols = self.__symbols
+    if symbols is None:
+      # Concurrent callers might each create the map; any one will do.
+      symbols = self.__symbols = {}
+    uni = "%04X" % code_point
+    symbol = symbols.get(uni)
+    if symbol: return symbol
+    return self.__NewSymbol(symbols, uni, code_point)
+
+  def __NewSymbol(self, symbols, uni, code_point):
+    """Create the Symbol for uni, which is code_point as a hex-digit string,
+    and share it via symbols if it is one of the carrier's symbols."""
+    attributes = self._attributes or _EMPTY_ATTRIBUTES
+    (number, old_number, new_number, shift_jis, jis,
+     name_en, name_ja) = attributes.Values(uni)
+    if self._number_table:
+      number = _LookUp(self._number_table, code_point)
+    if self._old_number_table:
+      old_number = _LookUp(self._old_number_table, code_point)
+    if self._shift_jis_table:
+      shift_jis = _LookUp(self._shift_jis_table, code_point)
+    if self._jis_table:
+      jis = _LookUp(self._jis_table, code_point)
+    symbol = Symbol(self, uni, number, old_number, new_number, shift_jis, jis,
+                    name_en, name_ja)
+    # Share the Symbol objects for this carrier's code points,
+    # but do not let lookups of other strings grow the map.
+    if ((code_point in self.code_points and uni == "%04X" % code_point) or
+        uni in attributes):
+      symbols[uni] = symbol
     return symbol
 
   def _ImageHTML(self, uni, number):
     """Get HTML for the symbol image, or an empty string.
 
+    Uses the first of the carrier's <image> rules which matches the symbol.
     Called only from Symbol.ImageHTML()."""
+    for (src, size, unis, min_number, number_offset) in self._images:
+      if unis is not None and uni not in unis: continue
+      if min_number is not None and (number is None or number < min_number):
+        continue
+      if "{number}" in src:
+        if number is None: continue
+        src = src.replace("{number}", str(number + number_offset))
+      return "<img src=%s%s>" % (src.replace("{uni}", uni), size)
     return ""
 
+  def __GetReverseMap(self, field):
+    maps = self.__reverse_maps
+    if maps is None:
+      # Concurrent callers might each build the maps; any result will do.
+      maps = self.__reverse_maps = self.__BuildReverseMaps()
+    return maps[field]
+
+  def __BuildReverseMaps(self):
+    """Map the values of all symbols back to their Unicode code points.
+
+    Like SymbolFromUnicode(), takes the values of fields with ranges from
+    the compiled reverse tables, and of other fields from the XML attributes.
+    If several code points share a value, the lowest one wins.
+    """
+    attributes = self._attributes or _EMPTY_ATTRIBUTES
+    # Values() returns the values in _REVERSE_MAP_FIELDS order.
+    uni_values = sorted([(int(uni, 16), uni, attributes.Values(uni))
+                         for uni in attributes if uni])
+    maps = {}
+    for (i, field) in enumerate(_REVERSE_MAP_FIELDS):
+      if field in self._range_reverse_maps:
+        maps[field] = self._range_reverse_maps[field]
+        continue
+      field_map = maps[field] = {}
+      for (code_point, uni, values) in uni_values:
+        if values[i] is not None: field_map.setdefault(values[i], uni)
+    return maps
+
+  def LookUpCodePoints(self, code_points):
+    """Batch lookup of Shift-JIS codes, JIS codes and numbers.
+
+    Returns the same values as SymbolFromUnicode() for each code point,
+    as integers. Uses vectorized NumPy operations if NumPy is installed.
+
+    Args:
+      code_points: Sequence or NumPy array of Unicode code point integers.
+
+    Returns:
+      A tuple of three arrays (shift_jis, jis, number), parallel to
+      code_points, with UNMAPPED where the symbol has no such value.
+      Each array is a sequence of 32-bit signed integers with len(),
+      indexing and iteration, and the same values with or without NumPy:
+      A NumPy int32 array if NumPy is installed, otherwise an
+      array.array("i"). Use list() or numpy.asarray() for one type.
+    """
+    (base, tables) = self.__GetBatchTables()
+    unmapped_index = len(tables[0]) - 1
+    if numpy:
+      indexes = numpy.asarray(code_points, dtype=numpy.int64) - base
+      # Out-of-range code points look up the trailing UNMAPPED entry.
+      indexes[(indexes < 0) | (indexes > unmapped_index)] = unmapped_index
+      return tuple([table[indexes] for table in tables])
+    indexes = []
+    for code_point in code_points:
+      index = code_point - base
+      if not 0 <= index < unmapped_index: index = unmapped_index
+      indexes.append(index)
+    return tuple([array.array("i", [table[index] for index in indexes])
+                  for table in tables])
+
+  def __GetBatchTables(self):
+    tables = self.__batch_tables
+    if tables is None:
+      # Concurrent callers might each build the tables; any result will do.
+      tables = self.__batch_tables = self.__BuildBatchTables()
+    return tables
+
+  def __BuildBatchTables(self):
+    """Build dense Shift-JIS, JIS and number tables for LookUpCodePoints().
+
+    Returns:
+      A pair (base, (shift_jis, jis, number)) where each table has the value
+      for code point c at index c - base, and UNMAPPED in its last entry.
+    """
+    code_points = set(self.code_points)
+    for uni in self._attributes or _EMPTY_ATTRIBUTES:
+      if uni: code_points.add(int(uni, 16))
+    if code_points:
+      base = min(code_points)
+      size = max(code_points) - base + 1
+    else:
+      base = size = 0
+    shift_jis_table = [UNMAPPED] * (size + 1)
+    jis_table = [UNMAPPED] * (size + 1)
+    number_table = [UNMAPPED] * (size + 1)
+    for code_point in code_points:
+      symbol = self.__SymbolFromCodePoint(code_point)
+      index = code_point - base
+      if symbol.shift_jis: shift_jis_table[index] = int(symbol.shift_jis, 16)
+      if symbol.jis: jis_table[index] = int(symbol.jis, 16)
+      if symbol.number is not None: number_table[index] = symbol.number
+    tables = (shift_jis_table, jis_table, number_table)
+    if numpy:
+      tables = tuple([numpy.array(table, dtype=numpy.int32)
+                      for table in tables])
+    return (base, tables)
+
+  def UnicodeFromShiftJis(self, shift_jis):
+    """Get the Unicode PUA code point for a Shift-JIS code.
+
+    Args:
+      shift_jis: Shift-JIS code, 4-hex-digit string (uppercase),
+        like Symbol.shift_jis
+
+    Returns:
+      The Unicode PUA code point hex-digit string, or None if no symbol
+      has this Shift-JIS code.
+    """
+    return self.__GetReverseMap("shift_jis").get(shift_jis)
+
+  def UnicodeFromJis(self, jis):
+    """Get the Unicode PUA code point for a JIS (ISO-2022-JP) code.
+
+    Args:
+      jis: JIS code, 4-hex-digit string (uppercase), like Symbol.jis
+
+    Returns:
+      The Unicode PUA code point hex-digit string, or None if no symbol
+      has this JIS code.
+    """
+    return self.__GetReverseMap("jis").get(jis)
+
+  def UnicodeFromNumber(self, number):
+    """Get the Unicode PUA code point for a carrier symbol number.
+
+    Args:
+      number: Integer, like Symbol.number
+
+    Returns:
+      The Unicode PUA code point hex-digit string, or None if no symbol
+      has this number.
+    """
+    return self.__GetReverseMap("number").get(number)
+
+  def UnicodeFromOldNumber(self, old_number):
+    """Get the Unicode PUA code point for a symbol number in the old
+    number system.
+
+    Args:
+      old_number: Integer, like Symbol.old_number
+
+    Returns:
+      The Unicode PUA code point hex-digit string, or None if no symbol
+      has this old number.
+    """
+    return self.__GetReverseMap("old_number").get(old_number)
+
+  def UnicodeFromNewNumber(self, new_number):
+    """Get the Unicode PUA code point for a symbol number in the new
+    number system.
+
+    Args:
+      new_number: Integer, like Symbol.new_number
+
+    Returns:
+      The Unicode PUA code point hex-digit string, or None if no symbol
+      has this new number.
+    """
+    return self.__GetReverseMap("new_number").get(new_number)
+
   def GetShiftJISLeadBytes(self):
     """Returns a frozenset of Shift-JIS lead bytes for Emoji symbols."""
     lead_bytes = set()
@@ -141,9 +379,8 @@ class CarrierData(object):
       for sj_range in self._uni_to_shift_jis_ranges:
         lead_bytes |= set(range(sj_range[2] >> 8, (sj_range[3] >> 8) + 1))
     else:
-      for element in self._uni_to_elements.itervalues():
-        shift_jis = element.getAttribute("shift_jis")
-        if shift_jis: lead_bytes.add(int(shift_jis[0:2], 16))
+      for shift_jis in (self._attributes or _EMPTY_ATTRIBUTES).shift_jis:
+        if shift_jis != UNMAPPED: lead_bytes.add(shift_jis >> 8)
     return frozenset(lead_bytes)
 
   def GetJISLeadBytesAsShiftJIS(self):
@@ -155,293 +392,477 @@ class CarrierData(object):
         sjis_end = row_cell.From2022Integer(jis_range[3]).ToShiftJis()
         lead_bytes |= set(range(sjis_start[0], sjis_end[0] + 1))
     else:
-      for element in self._uni_to_elements.itervalues():
-        jis = element.getAttribute("jis")
-        if jis: lead_bytes.add(row_cell.From2022String(jis).ToShiftJis()[0])
+      for jis in (self._attributes or _EMPTY_ATTRIBUTES).jis:
+        if jis != UNMAPPED:
+          lead_bytes.add(row_cell.From2022Integer(jis).ToShiftJis()[0])
     return frozenset(lead_bytes)
 
-def _RangeFromUnicode(ranges, uni):
-  """Select from a list the range containing the Unicode code point.
+  def GetShiftJISCodes(self):
+    """Returns a frozenset of the Shift-JIS codes (4-hex-digit strings)
+    of the carrier's Emoji symbols."""
+    return frozenset(self.__GetReverseMap("shift_jis"))
 
-  Args:
-    ranges: A list of ranges. Each range pair is a 4-tuple of
-      (unicode_start, unicode_end, target_start, target_end) integers.
-      Each range tuple represents a linear mapping between a range of Unicode
-      code points and a range of numbers/Shift-JIS codes/JIS codes.
-      In each tuple, the Unicode and target ranges must have the same length.
-      The _end values are inclusive range boundaries.
-    uni: A Unicode code point integer.
+  def GetShiftJISByteClasses(self):
+    """Returns byte_classes.ByteClasses for the Shift-JIS Emoji codes.
+
+    For finding the carrier's Emoji in Shift-JIS text.
+    """
+    return self.__GetByteClasses()[0]
+
+  def GetJISByteClassesAsShiftJIS(self):
+    """Returns byte_classes.ByteClasses for the JIS Emoji codes,
+    converted to Shift-JIS like GetJISLeadBytesAsShiftJIS()."""
+    return self.__GetByteClasses()[1]
+
+  def __GetByteClasses(self):
+    classes = self.__byte_classes
+    if classes is None:
+      # Concurrent callers might each build the classes; any result will do.
+      shift_jis_codes = [int(shift_jis, 16) for shift_jis
+                         in self.__GetReverseMap("shift_jis")]
+      jis_codes = []
+      for jis in self.__GetReverseMap("jis"):
+        (b1, b2) = row_cell.From2022String(jis).ToShiftJis()
+        jis_codes.append((b1 << 8) | b2)
+      classes = self.__byte_classes = (
+          byte_classes.ByteClasses(shift_jis_codes),
+          byte_classes.ByteClasses(jis_codes))
+    return classes
+
+# Symbol fields with CarrierData.UnicodeFrom...() reverse maps.
+_REVERSE_MAP_FIELDS = ("number", "old_number", "new_number", "shift_jis", "jis")
+
+_DEFINITIONS_FILENAME = "carriers.xml"
+
+def _ParseDefinitions(contents):
+  """Parse the carrier definitions in a carriers.xml file and compile them.
 
   Returns:
-    The range tuple where unicode_start <= uni <= unicode_end.
+    A map from lowercase carrier names to dictionaries with:
+      data: Path of the carrier_data.xml file relative to the data folder
+        with "/" separators, or None.
+      code_points: Tuple of the (start, end) ranges of Unicode code points
+        covered by the carrier's ranges, for range_set.RangeSet().
+      ranges: Map from field names to lists of range tuples.
+        See _CompileTable().
+      tables: Map from field names to dense tables. See _CompileTable().
+      reverse: Map from field names to maps from the ranges' target values
+        back to Unicode code point hex-digit strings.
+      images: Tuple of (src, size, unis, min_number, number_offset) image
+        rules for CarrierData._ImageHTML(), with unis and min_number None
+        if the rule does not have them.
+
+  Raises:
+    ValueError: If a definition is malformed.
   """
-  for range in ranges:
-    if range[0] <= uni <= range[1]: return range
-  return None
+  definitions = {}
+  current = []
+  def StartElement(name, attributes):
+    if name == "carrier":
+      data = attributes.get("data")
+      if data: data = str(data)
+      definition = {"data": data, "ranges": {}, "images": []}
+      definitions[str(attributes["name"])] = definition
+      current[:] = [definition]
+    elif name == "range":
+      field = attributes.get("field")
+      if field not in _RANGE_FIELDS:
+        raise ValueError("unknown range field \"%s\"" % field)
+      (start, end) = _ParseRange(attributes["unicode"], 16)
+      (target_start, target_end) = _ParseRange(attributes["target"],
+                                               _RANGE_FIELDS[field][0])
+      current[0]["ranges"].setdefault(str(field), []).append(
+          (start, end, target_start, target_end))
+    elif name == "image":
+      size = ""
+      for size_name in ("width", "height"):
+        if size_name in attributes:
+          size += " %s=%s" % (size_name, attributes[size_name])
+      unis = attributes.get("unicode")
+      if unis is not None: unis = frozenset(str(unis).split())
+      min_number = attributes.get("min_number")
+      if min_number is not None: min_number = int(min_number)
+      current[0]["images"].append(
+          (str(attributes["src"]), str(size), unis, min_number,
+           int(attributes.get("number_offset", 0))))
+  parser = xml.parsers.expat.ParserCreate()
+  parser.StartElementHandler = StartElement
+  try:
+    parser.Parse(contents, True)
+  except KeyError, e:
+    raise ValueError("carrier definition without %s attribute" % e)
+  for (carrier, definition) in definitions.iteritems():
+    try:
+      _CompileDefinition(definition)
+    except ValueError, e:
+      raise ValueError("carrier \"%s\": %s" % (carrier, e))
+  return definitions
+
+
+def _ParseRange(s, base):
+  """Parse a "start-end" range of integers in the base."""
+  (start, end) = s.split("-")
+  return (int(start, base), int(end, base))
+
+
+def _CompileDefinition(definition):
+  """Compute the code_points, tables, reverse and images of a definition.
+
+  Raises:
+    ValueError: If the Unicode and target ranges of a range tuple
+      do not have the same length.
+  """
+  code_point_ranges = []
+  tables = {}
+  reverse = {}
+  for (field, ranges) in definition["ranges"].iteritems():
+    (base, TargetOffset, TargetsFromRange) = _RANGE_FIELDS[field]
+    for one_range in ranges:
+      if (one_range[1] - one_range[0] !=
+          TargetOffset(one_range[3]) - TargetOffset(one_range[2])):
+        raise ValueError("%s range %04X-%04X does not match its target range"
+                         % (field, one_range[0], one_range[1]))
+      code_point_ranges.append(one_range[0:2])
+    table = tables[field] = _CompileTable(ranges, TargetsFromRange)
+    # Ascending code point order, so that the lowest code point wins.
+    field_map = reverse[field] = {}
+    for (i, value) in enumerate(table[1]):
+      if value is not None: field_map.setdefault(value, "%04X" % (table[0] + i))
+  definition["code_points"] = range_set.RangeSet(code_point_ranges).ranges
+  definition["tables"] = tables
+  definition["reverse"] = reverse
+  definition["images"] = tuple(definition["images"])
 
 
-def _NumberFromUnicode(ranges, uni):
-  """Map a Unicode code point to a number.
+def _NumberOffset(number):
+  return number
 
-  Args:
-    ranges: A list of ranges. See _RangeFromUnicode().
-    uni: A Unicode code point (a hex digit string).
+
+def _ShiftJisOffset(shift_jis):
+  # Shift the Shift-JIS codes down to JIS X 0208 to count only valid codes.
+  return row_cell.FromShiftJis((shift_jis >> 8) - 0x10, shift_jis & 0xff)
+
+
+def _JisOffset(jis):
+  return row_cell.From2022(jis >> 8, jis & 0xff)
+
+
+# Integer-valued <e> attributes, with the base of their string values.
+# Shift-JIS and JIS codes are 4-hex-digit strings.
+_INTEGER_ATTRIBUTES = (("number", 10), ("old_number", 10), ("new_number", 10),
+                       ("shift_jis", 16), ("jis", 16))
+
+def _ParseXML(contents):
+  """Parse the contents of a carrier_data.xml file.
 
   Returns:
-    The number integer corresponding to the
-    Unicode code point, according to the ranges;
-    or None if none of the ranges contains the code point.
+    A tuple of parallel columns with one value per <e> element:
+    The unicode, name_en and name_ja strings, followed by the
+    _INTEGER_ATTRIBUTES values as integers, or UNMAPPED if the element
+    does not have the attribute.
+  """
+  columns = tuple([[] for i in range(3 + len(_INTEGER_ATTRIBUTES))])
+  def StartElement(name, attributes):
+    if name == "e":
+      columns[0].append(intern(str(attributes.get("unicode", ""))))
+      columns[1].append(attributes.get("name_en", ""))
+      columns[2].append(attributes.get("name_ja", ""))
+      for (i, (field, base)) in enumerate(_INTEGER_ATTRIBUTES):
+        value = attributes.get(field)
+        if value:
+          columns[3 + i].append(int(value, base))
+        else:
+          columns[3 + i].append(UNMAPPED)
+  parser = xml.parsers.expat.ParserCreate()
+  parser.StartElementHandler = StartElement
+  parser.Parse(contents, True)
+  return tuple([tuple(column) for column in columns])
+
+
+class _AttributeTable(object):
+  """Compact table of the <e> element attributes of a carrier_data.xml file.
+
+  Stores one row per element in parallel columns: Tuples of strings,
+  with equal strings shared, and arrays of integers, with UNMAPPED
+  for missing values.
+
+  Attributes:
+    unis: Tuple of the Unicode code point hex-digit strings.
+    names_en: Tuple of the English names.
+    names_ja: Tuple of the Japanese names.
+    number, old_number, new_number, shift_jis, jis: array.array columns
+      with the _INTEGER_ATTRIBUTES values.
   """
-  uni = int(uni, 16)
-  range = _RangeFromUnicode(ranges, uni)
-  return range[2] + (uni - range[0])
+  __slots__ = ("_rows", "unis", "names_en", "names_ja", "number",
+               "old_number", "new_number", "shift_jis", "jis")
+
+  def __init__(self, columns):
+    """Build the table from the _ParseXML() columns."""
+    strings = {}
+    def Share(s):
+      return strings.setdefault(s, s)
+    self.unis = tuple([intern(uni) for uni in columns[0]])
+    self.names_en = tuple([Share(name) for name in columns[1]])
+    self.names_ja = tuple([Share(name) for name in columns[2]])
+    for ((field, base), column) in zip(_INTEGER_ATTRIBUTES, columns[3:]):
+      setattr(self, field, array.array("i", column))
+    # Map from Unicode code point hex-digit strings to row indexes.
+    # As before, the last element for a code point wins.
+    self._rows = dict([(uni, row) for (row, uni) in enumerate(self.unis)])
+
+  def __contains__(self, uni):
+    return uni in self._rows
+
+  def __iter__(self):
+    """Yields the Unicode code point hex-digit strings."""
+    return iter(self._rows)
+
+  def __len__(self):
+    return len(self._rows)
+
+  def Values(self, uni):
+    """Get the attribute values for a code point.
 
+    Args:
+      uni: Unicode code point hex-digit string.
+
+    Returns:
+      A tuple (number, old_number, new_number, shift_jis, jis,
+      name_en, name_ja) with None for each missing number or code,
+      the codes as 4-hex-digit strings, and empty strings for missing names.
+    """
+    row = self._rows.get(uni)
+    if row is None: return (None, None, None, None, None, "", "")
+    values = []
+    for (field, base) in _INTEGER_ATTRIBUTES:
+      value = getattr(self, field)[row]
+      if value == UNMAPPED:
+        values.append(None)
+      elif base == 16:
+        values.append("%04X" % value)
+      else:
+        values.append(value)
+    values.append(self.names_en[row])
+    values.append(self.names_ja[row])
+    return tuple(values)
 
-def _ShiftJisFromUnicode(ranges, uni):
-  """Map a Unicode code point to a Shift-JIS code.
 
-  In a range of Shift-JIS codes, only valid codes according to the encoding
-  scheme are counted. For example, after F27E follows F280 because 7F is not
-  a valid trail byte.
+_EMPTY_ATTRIBUTES = _AttributeTable(((),) * (3 + len(_INTEGER_ATTRIBUTES)))
+
+
+def _CompileTable(ranges, TargetsFromRange):
+  """Compile range tuples into a dense lookup table.
 
   Args:
-    ranges: A list of ranges. See _RangeFromUnicode().
-    uni: A Unicode code point (a hex digit string).
+    ranges: A list of ranges. Each range is a 4-tuple of
+      (unicode_start, unicode_end, target_start, target_end) integers.
+      Each range tuple represents a linear mapping between a range of Unicode
+      code points and a range of numbers/Shift-JIS codes/JIS codes.
+      In each tuple, the Unicode and target ranges must have the same length.
+      The _end values are inclusive range boundaries.
+    TargetsFromRange: Function which returns the sequence of
+      table values for the Unicode code points in one range.
 
   Returns:
-    The Shift-JIS code (integer) corresponding to the
-    Unicode code point, according to the ranges;
-    or None if none of the ranges contains the code point.
+    A pair (base, values) where values[code_point - base] is the
+    value for the code point, or None if no range contains it.
+    None if there are no ranges.
   """
-  uni = int(uni, 16)
-  range = _RangeFromUnicode(ranges, uni)
-  offset = uni - range[0]
-  # Shift the Shift-JIS codes down to JIS X 0208 and back up
-  # so that we get standard row-cell byte values (1..94) and can use RowCell.
-  rc = row_cell.FromShiftJis((range[2] >> 8) - 0x10, range[2] & 0xff) + offset
-  (b1, b2) = rc.ToShiftJis()
-  return ((b1 + 0x10) << 8) | b2
+  if not ranges: return None
+  base = min([one_range[0] for one_range in ranges])
+  end = max([one_range[1] for one_range in ranges])
+  values = [None] * (end - base + 1)
+  for one_range in ranges:
+    values[one_range[0] - base:one_range[1] - base + 1] = (
+        TargetsFromRange(one_range))
+  return (base, tuple(values))
 
 
-def _JisFromUnicode(ranges, uni):
-  """Map a Unicode code point to a JIS X 0208 (ISO-2022-JP) code.
+def _NumbersFromRange(one_range):
+  """Table values for a range of numbers."""
+  return range(one_range[2], one_range[2] + one_range[1] - one_range[0] + 1)
 
-  In a range of JIS codes, only valid codes according to the encoding
-  scheme are counted. For example, after 757E follows 7621.
 
-  Args:
-    ranges: A list of ranges. See _RangeFromUnicode().
-    uni: A Unicode code point (a hex digit string).
+def _ShiftJisStringsFromRange(one_range):
+  """Table values for a range of Shift-JIS codes, as 4-hex-digit strings.
 
-  Returns:
-    The JIS code (integer) corresponding to the
-    Unicode code point, according to the ranges;
-    or None if none of the ranges contains the code point.
+  Only valid codes according to the encoding scheme are counted.
+  For example, after F27E follows F280 because 7F is not a valid trail byte.
+  """
+  start = one_range[2]
+  rc = row_cell.FromShiftJis((start >> 8) - 0x10, start & 0xff)
+  values = []
+  for offset in xrange(one_range[1] - one_range[0] + 1):
+    (b1, b2) = (rc + offset).ToShiftJis()
+    values.append("%02X%02X" % (b1 + 0x10, b2))
+  return values
+
+
+def _JisStringsFromRange(one_range):
+  """Table values for a range of JIS X 0208 (ISO-2022-JP) codes,
+  as 4-hex-digit strings.
+
+  Only valid codes according to the encoding scheme are counted.
+  For example, after 757E follows 7621.
   """
-  uni = int(uni, 16)
-  range = _RangeFromUnicode(ranges, uni)
-  offset = uni - range[0]
-  rc = row_cell.From2022(range[2] >> 8, range[2] & 0xff) + offset
-  (b1, b2) = rc.To2022()
-  return (b1 << 8) | b2
+  start = one_range[2]
+  rc = row_cell.From2022(start >> 8, start & 0xff)
+  values = []
+  for offset in xrange(one_range[1] - one_range[0] + 1):
+    values.append("%02X%02X" % (rc + offset).To2022())
+  return values
+
+
+# Map from range field names to the base of their target values in
+# carriers.xml, a function which maps a target value to a linear offset
+# for checking range lengths, and the function for the table values.
+_RANGE_FIELDS = {
+  "number": (10, _NumberOffset, _NumbersFromRange),
+  "old_number": (10, _NumberOffset, _NumbersFromRange),
+  "shift_jis": (16, _ShiftJisOffset, _ShiftJisStringsFromRange),
+  "jis": (16, _JisOffset, _JisStringsFromRange)
+}
+
+
+def _LookUp(table, code_point):
+  """Returns a value from a _CompileTable() table, or None."""
+  (base, values) = table
+  index = code_point - base
+  if 0 <= index < len(values): return values[index]
+  return None
 
 
 class Symbol(object):
-  """Carrier data for one Emoji symbol."""
+  """Carrier data for one Emoji symbol. Immutable.
+
+  Attributes:
+    uni: Unicode PUA code point, 4..6-hex-digit string
+    number: Carrier-specific Emoji symbol number
+    old_number: Carrier-specific Emoji symbol number (old number system)
+    new_number: Carrier-specific Emoji symbol number (new number system)
+    shift_jis: Shift-JIS code, 4-hex-digit string
+    jis: JIS (ISO-2022-JP) code, 4-hex-digit string
+  Each attribute is None if the symbol does not have that value.
+  """
   __slots__ = ("uni", "number", "old_number", "new_number",
-               "shift_jis", "jis", "_element", "_carrier_data")
+               "shift_jis", "jis", "_name_en", "_name_ja", "_carrier_data")
 
-  def __init__(self):
+  def __init__(self, carrier_data, uni, number, old_number, new_number,
+               shift_jis, jis, name_en, name_ja):
     """Carrier Emoji symbol data.
 
     Constructed by CarrierData.SymbolFromUnicode(). Do not instantiate yourself.
-
-    Attributes:
-      uni: Unicode PUA code point, 4..6-hex-digit string
-      number: Carrier-specific Emoji symbol number
-      old_number: Carrier-specific Emoji symbol number (old number system)
-      new_number: Carrier-specific Emoji symbol number (new number system)
-      shift_jis: Shift-JIS code, 4-hex-digit string
-      jis: JIS (ISO-2022-JP) code, 4-hex-digit string
     """
-    self.uni = None
-    self.number = None
-    self.old_number = None
-    self.new_number = None
-    self.shift_jis = None
-    self.jis = None
-    self._element = None  # <e> XML element
+    init = super(Symbol, self).__setattr__
+    init("_carrier_data", carrier_data)
+    init("uni", uni)
+    init("number", number)
+    init("old_number", old_number)
+    init("new_number", new_number)
+    init("shift_jis", shift_jis)
+    init("jis", jis)
+    init("_name_en", name_en)
+    init("_name_ja", name_ja)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("carrier_data.Symbol is immutable")
+
+  def __delattr__(self, name):
+    raise AttributeError("carrier_data.Symbol is immutable")
 
   def GetEnglishName(self):
     """Get the carrier's English name of this Emoji symbol."""
-    if self._element:
-      return self._element.getAttribute("name_en")
-    else:
-      return ""
+    return self._name_en
 
   def GetJapaneseName(self):
     """Get the carrier's Japanese name of this Emoji symbol."""
-    if self._element:
-      return self._element.getAttribute("name_ja")
-    else:
-      return ""
+    return self._name_ja
 
   def ImageHTML(self):
     """Get HTML for the symbol image, or an empty string."""
     return self._carrier_data._ImageHTML(self.uni, self.number)
 
 
-class _DocomoData(CarrierData):
-  """DoCoMo Emoji symbols data."""
-  _uni_to_number_ranges = [
-      (0xE63E, 0xE6A5, 1, 104),
-      (0xE6A6, 0xE6AB, 177, 182),
-      (0xE6AC, 0xE6AE, 167, 169),
-      (0xE6AF, 0xE6B0, 183, 184),
-      (0xE6B1, 0xE6B3, 170, 172),
-      (0xE6B4, 0xE6B6, 185, 187),
-      (0xE6B7, 0xE6BA, 173, 176),
-      (0xE6BB, 0xE6CD, 188, 206),
-      (0xE6CE, 0xE6EB, 105, 134),
-      (0xE6EC, 0xE70A, 136, 166),
-      (0xE70B, 0xE70B, 135, 135),
-      (0xE70C, 0xE757, 301, 376)]
-  _uni_to_shift_jis_ranges = [(0xE63E, 0xE757, 0xF89F, 0xF9FC)]
-  _uni_to_elements = {}
-
-  def __init__(self):
-    # TODO(mscherer): Add argument for root data folder path.
-    filename = os.path.join(os.path.dirname(__file__),
-                            "..", "data", "docomo", "carrier_data.xml")
-    self._CheckRanges()
-    self._AllUnicodesFromRanges(self._uni_to_shift_jis_ranges)
-    self._ReadXML(filename)
+# Map from (carrier, data folder) to CarrierData objects.
+_carrier_data_cache = {}
 
-  def _ImageHTML(self, uni, number):
-    """Get HTML for the symbol image, or an empty string.
+def GetCarrierData(carrier, data_root=None):
+  """Get the CarrierData for a carrier.
 
-    Called only from Symbol.ImageHTML()."""
-    path = "http://www.nttdocomo.co.jp/service/developer/make/content/pictograph/"
-    if number < 300:
-      return ("<img src=%sbasic/images/%d.gif width=16 height=16>" %
-              (path, number))
-    else:
-      return ("<img src=%sextention/images/%d.gif width=16 height=16>" %
-              (path, number - 300))
-
-
-class _KddiData(CarrierData):
-  """KDDI Emoji symbols data."""
-  _uni_to_shift_jis_ranges = [
-      (0xE468, 0xE5B4, 0xF640, 0xF7D1),
-      (0xE5B5, 0xE5CC, 0xF7E5, 0xF7FC),
-      (0xE5CD, 0xE5DF, 0xF340, 0xF352),
-      (0xEA80, 0xEAFA, 0xF353, 0xF3CE),
-      (0xEAFB, 0xEB0D, 0xF7D2, 0xF7E4),
-      (0xEB0E, 0xEB8E, 0xF3CF, 0xF493)]
-  _uni_to_jis_ranges = [
-      (0xE468, 0xE5B4, 0x7521, 0x7853),
-      (0xE5B5, 0xE5DF, 0x7867, 0x7933),
-      (0xEA80, 0xEAFA, 0x7934, 0x7A50),
-      (0xEAFB, 0xEB0D, 0x7854, 0x7866),
-      (0xEB0E, 0xEB8E, 0x7A51, 0x7B73)]
-  _uni_to_elements = {}
-
-  def __init__(self):
-    # TODO(mscherer): Add argument for root data folder path.
-    filename = os.path.join(os.path.dirname(__file__),
-                            "..", "data", "kddi", "carrier_data.xml")
-    self._CheckRanges()
-    self._AllUnicodesFromRanges(self._uni_to_shift_jis_ranges)
-    self._ReadXML(filename)
+  CarrierData objects are not modified after construction,
+  so there is one shared instance per carrier and data folder.
+  When the carrier's data files have changed since the shared instance
+  was created, a new one is created and shared from then on.
 
-  def _ImageHTML(self, uni, number):
-    """Get HTML for the symbol image, or an empty string.
+  Args:
+    carrier: Lowercase carrier name, for example "docomo".
+    data_root: Path of the data folder with the carriers.xml file
+      and the carrier subfolders.
+      Defaults to the data folder next to this module's folder.
 
-    Called only from Symbol.ImageHTML()."""
-    return ("<img src=http://www001.upp.so-net.ne.jp/hdml/emoji/e/%d.gif>" %
-            number)
-
-
-class _SoftbankData(CarrierData):
-  """SoftBank Emoji symbols data."""
-  _uni_to_old_number_ranges = [
-      (0xE001, 0xE05A, 1, 90),
-      (0xE101, 0xE15A, 91, 180),
-      (0xE201, 0xE25A, 181, 270),
-      (0xE301, 0xE34D, 271, 347),
-      (0xE401, 0xE44C, 348, 423),
-      (0xE501, 0xE53E, 424, 485)]
-  _uni_to_shift_jis_ranges = [
-      (0xE001, 0xE05A, 0xF941, 0xF99B),
-      (0xE101, 0xE15A, 0xF741, 0xF79B),
-      (0xE201, 0xE25A, 0xF7A1, 0xF7FA),
-      (0xE301, 0xE34D, 0xF9A1, 0xF9ED),
-      (0xE401, 0xE44C, 0xFB41, 0xFB8D),
-      (0xE501, 0xE53E, 0xFBA1, 0xFBDE)]
-  _uni_to_elements = {}
-  __animated_img = frozenset([
-      "E101", "E102", "E103", "E104", "E105", "E106", "E107", "E108",
-      "E10D", "E10F",
-      "E113", "E115", "E117", "E11B", "E11D", "E12B", "E130",
-      "E201", "E206", "E219", "E254", "E255", "E256", "E257", "E258",
-      "E259", "E25A",
-      "E30C", "E310", "E311", "E312", "E313", "E317", "E31E", "E31F",
-      "E320", "E325", "E326", "E327", "E328", "E329", "E32E", "E335",
-      "E336", "E337", "E34B",
-      "E409", "E40D", "E412", "E417", "E41C", "E41E", "E41F", "E422",
-      "E423", "E428", "E429", "E42D", "E433", "E437", "E43E", "E440",
-      "E442", "E447", "E44B",
-      "E51F", "E538", "E539", "E53A", "E53B", "E53C", "E53D", "E53E"])
-
-  def __init__(self):
-    # TODO(mscherer): Add argument for root data folder path.
-    filename = os.path.join(os.path.dirname(__file__),
-                            "..", "data", "softbank", "carrier_data.xml")
-    self._CheckRanges()
-    self._AllUnicodesFromRanges(self._uni_to_shift_jis_ranges)
-    self._ReadXML(filename)
+  Returns:
+    The CarrierData object.
+  """
+  if not data_root: data_root = _DEFAULT_DATA_ROOT
+  key = (carrier, os.path.abspath(data_root))
+  one_carrier_data = _carrier_data_cache.get(key)
+  if not one_carrier_data or not one_carrier_data.IsCurrent():
+    one_carrier_data = CarrierData(carrier, data_root)
+    # Concurrent callers might each create an instance; any one will do.
+    _carrier_data_cache[key] = one_carrier_data
+  return one_carrier_data
+
+
+class CarrierDataMap(collections.Mapping):
+  """Read-only map from lowercase carrier name to CarrierData object.
+
+  Loads each carrier's data via GetCarrierData() when it is first looked up,
+  so that code which uses only some of the carriers does not pay for
+  parsing the others.
+  """
+  def __init__(self, carriers, data_root=None):
+    """Initialize the map without loading any carrier data.
 
-  def _ImageHTML(self, uni, number):
-    """Get HTML for the symbol image, or an empty string.
+    Args:
+      carriers: Sequence of lowercase carrier names.
+      data_root: Path of the data folder with the carrier subfolders.
+    """
+    self.__carriers = tuple(carriers)
+    self.__data_root = data_root
+    self.__loaded = {}
 
-    Called only from Symbol.ImageHTML()."""
-    return ("<img src=http://creation.mb.softbank.jp/mc/tech/tech_pic/img/"
-            "%s_20%s.gif>" %
-            (uni,
-             {False: "", True: "_ani"}[uni in self.__animated_img]))
+  def __getitem__(self, carrier):
+    one_carrier_data = self.__loaded.get(carrier)
+    if not one_carrier_data:
+      if carrier not in self.__carriers: raise KeyError(carrier)
+      one_carrier_data = GetCarrierData(carrier, self.__data_root)
+      self.__loaded[carrier] = one_carrier_data
+    return one_carrier_data
 
+  def __iter__(self):
+    return iter(self.__carriers)
 
-class _GoogleData(CarrierData):
-  """Google Emoji symbols data."""
-  pass
+  def IsCurrent(self):
+    """Returns False if the data files of a loaded carrier have changed."""
+    for one_carrier_data in self.__loaded.values():
+      if not one_carrier_data.IsCurrent(): return False
+    return True
 
+  def __len__(self):
+    return len(self.__carriers)
 
-# CarrierData singletons
-_DOCOMO_DATA = None
-_KDDI_DATA = None
-_SOFTBANK_DATA = None
-_GOOGLE_DATA = None
 
 def GetDocomoData():
-  global _DOCOMO_DATA
-  if not _DOCOMO_DATA: _DOCOMO_DATA = _DocomoData()
-  return _DOCOMO_DATA
+  return GetCarrierData("docomo")
 
 
 def GetKddiData():
-  global _KDDI_DATA
-  if not _KDDI_DATA: _KDDI_DATA = _KddiData()
-  return _KDDI_DATA
+  return GetCarrierData("kddi")
 
 
 def GetSoftbankData():
-  global _SOFTBANK_DATA
-  if not _SOFTBANK_DATA: _SOFTBANK_DATA = _SoftbankData()
-  return _SOFTBANK_DATA
+  return GetCarrierData("softbank")
 
 
 def GetGoogleData():
-  global _GOOGLE_DATA
-  if not _GOOGLE_DATA: _GOOGLE_DATA = _GoogleData()
-  return _GOOGLE_DATA
+  return GetCarrierData("google")
@@ -16,8 +16,14 @@
 
 __author__ = "Markus Scherer"
 
+import os
+import os.path
+import shutil
+import tempfile
 import unittest
 import carrier_data
+import row_cell
+import snapshot
 
 class DocomoDataTest(unittest.TestCase):
   def setUp(self):
@@ -32,9 +38,23 @@ class DocomoDataTest(unittest.TestCase):
     self.assertEqual(symbol_e640.GetEnglishName(), "Rain")
     self.assertEqual(symbol_e640.GetJapaneseName(), u"\u96e8")
 
+  def testSharedSymbols(self):
+    symbol = self.__data.SymbolFromUnicode("E640")
+    self.assert_(self.__data.SymbolFromUnicode("E640") is symbol)
+    self.assertRaises(AttributeError, setattr, symbol, "number", 4)
+    self.assertEqual(symbol.number, 3)
+    # Codes outside of the carrier data get new, empty symbols.
+    symbol = self.__data.SymbolFromUnicode("E000")
+    self.assertEqual((symbol.number, symbol.shift_jis, symbol.jis),
+                     (None, None, None))
+    self.failIf(self.__data.SymbolFromUnicode("E000") is symbol)
+
   def testAllUni(self):
     all_uni = self.__data.all_uni
     self.assertEqual(len(all_uni), 282)
+    self.assertEqual(self.__data.code_points.ranges, ((0xE63E, 0xE757),))
+    self.assert_(0xE6FE in self.__data.code_points)
+    self.assertEqual(len(self.__data.code_points), 282)
     self.failIf("E63D" in all_uni)
     self.assert_("E63E" in all_uni)
     self.assert_("E6FE" in all_uni)
@@ -82,6 +102,13 @@ class KddiDataTest(unittest.TestCase):
     self.failIf("EA7F" in all_uni)
     self.assert_("EA88" in all_uni)
     self.assert_("EB8E" in all_uni)
+    self.assertEqual(self.__data.code_points.ranges,
+                     ((0xE468, 0xE5DF), (0xEA80, 0xEB8E)))
+    # Union and intersection across carriers.
+    docomo_code_points = carrier_data.GetDocomoData().code_points
+    self.assertEqual(len(self.__data.code_points | docomo_code_points),
+                     647 + 282)
+    self.failIf(self.__data.code_points & docomo_code_points)
 
   def testLeadBytes(self):
     self.assertEqual(self.__data.GetShiftJISLeadBytes(),
@@ -139,5 +166,273 @@ class GoogleDataTest(unittest.TestCase):
     self.assertEqual(symbol_fe001.GetJapaneseName(), "")
 
 
+def _RangeFromUnicode(ranges, code_point):
+  """Select from a list the range containing the Unicode code point.
+
+  Args:
+    ranges: A list of range tuples. See carrier_data._CompileTable().
+    code_point: A Unicode code point integer.
+
+  Returns:
+    The range tuple where unicode_start <= code_point <= unicode_end,
+    or None if none of the ranges contains the code point.
+  """
+  for one_range in ranges:
+    if one_range[0] <= code_point <= one_range[1]: return one_range
+  return None
+
+
+# Range arithmetic on one range tuple which contains the code point,
+# independent of the compiled tables.
+
+def _NumberFromRange(one_range, code_point):
+  """Map a Unicode code point to its number integer."""
+  return one_range[2] + (code_point - one_range[0])
+
+
+def _ShiftJisFromRange(one_range, code_point):
+  """Map a Unicode code point to its Shift-JIS code integer."""
+  # Shift the Shift-JIS codes down to JIS X 0208 and back up
+  # so that we get standard row-cell byte values (1..94) and can use RowCell.
+  rc = (row_cell.FromShiftJis((one_range[2] >> 8) - 0x10, one_range[2] & 0xff)
+        + (code_point - one_range[0]))
+  (b1, b2) = rc.ToShiftJis()
+  return ((b1 + 0x10) << 8) | b2
+
+
+def _JisFromRange(one_range, code_point):
+  """Map a Unicode code point to its JIS X 0208 (ISO-2022-JP) code integer."""
+  rc = (row_cell.From2022(one_range[2] >> 8, one_range[2] & 0xff) +
+        (code_point - one_range[0]))
+  (b1, b2) = rc.To2022()
+  return (b1 << 8) | b2
+
+
+class DenseTableTest(unittest.TestCase):
+  def testSameAsRanges(self):
+    """The dense tables return the same values as the range arithmetic,
+    for every code point in and around the ranges."""
+    for data in (carrier_data.GetDocomoData(), carrier_data.GetKddiData(),
+                 carrier_data.GetSoftbankData()):
+      for (field, ranges, TargetFromRange, format) in (
+          ("number", data._uni_to_number_ranges, _NumberFromRange, "%d"),
+          ("old_number", data._uni_to_old_number_ranges,
+           _NumberFromRange, "%d"),
+          ("shift_jis", data._uni_to_shift_jis_ranges,
+           _ShiftJisFromRange, "%04X"),
+          ("jis", data._uni_to_jis_ranges, _JisFromRange, "%04X")):
+        if not ranges: continue
+        start = min([one_range[0] for one_range in ranges]) - 2
+        end = max([one_range[1] for one_range in ranges]) + 2
+        for code_point in xrange(start, end + 1):
+          uni = "%04X" % code_point
+          value = getattr(data.SymbolFromUnicode(uni), field)
+          one_range = _RangeFromUnicode(ranges, code_point)
+          if one_range:
+            self.assertEqual(str(value),
+                             format % TargetFromRange(one_range, code_point),
+                             "%s %s" % (field, uni))
+          else:
+            self.assertEqual(value, None, "%s %s" % (field, uni))
+
+
+class ReverseMapTest(unittest.TestCase):
+  def testRoundTrip(self):
+    """Every symbol value maps back to the symbol's code point."""
+    for data in (carrier_data.GetDocomoData(), carrier_data.GetKddiData(),
+                 carrier_data.GetSoftbankData(), carrier_data.GetGoogleData()):
+      lookups = (("number", data.UnicodeFromNumber),
+                 ("old_number", data.UnicodeFromOldNumber),
+                 ("new_number", data.UnicodeFromNewNumber),
+                 ("shift_jis", data.UnicodeFromShiftJis),
+                 ("jis", data.UnicodeFromJis))
+      code_points = set(data.all_uni) | set(data._attributes or ())
+      counts = dict([(field, 0) for (field, UnicodeFrom) in lookups])
+      for uni in code_points:
+        symbol = data.SymbolFromUnicode(uni)
+        for (field, UnicodeFrom) in lookups:
+          value = getattr(symbol, field)
+          if value is None: continue
+          self.assertEqual(UnicodeFrom(value), uni,
+                           "%s %s=%s" % (uni, field, value))
+          counts[field] += 1
+      # No other values map to code points.
+      for (field, UnicodeFrom) in lookups:
+        self.assertEqual(len(data._CarrierData__GetReverseMap(field)),
+                         counts[field])
+
+  def testLookups(self):
+    docomo_data = carrier_data.GetDocomoData()
+    self.assertEqual(docomo_data.UnicodeFromShiftJis("F8A1"), "E640")
+    self.assertEqual(docomo_data.UnicodeFromJis("7545"), "E640")
+    self.assertEqual(docomo_data.UnicodeFromNumber(3), "E640")
+    self.assertEqual(docomo_data.UnicodeFromShiftJis("8140"), None)
+    softbank_data = carrier_data.GetSoftbankData()
+    self.assertEqual(softbank_data.UnicodeFromOldNumber(485), "E53E")
+    self.assertEqual(softbank_data.UnicodeFromNumber(299), "E11C")
+    self.assertEqual(softbank_data.UnicodeFromOldNumber(486), None)
+
+
+class AttributeTableTest(unittest.TestCase):
+  def testTable(self):
+    table = carrier_data._AttributeTable(carrier_data._ParseXML(
+        '<carrier_data>'
+        '<e unicode="E001" number="7" shift_jis="F941" name_en="BOY"/>'
+        '<e unicode="E002" jis="7521" name_en="BOY" name_ja="x"/>'
+        '<e unicode="E003"/>'
+        '</carrier_data>'))
+    self.assertEqual(len(table), 3)
+    self.assertEqual(sorted(table), ["E001", "E002", "E003"])
+    self.assert_("E002" in table)
+    self.failIf("E004" in table)
+    self.assertEqual(table.Values("E001"),
+                     (7, None, None, "F941", None, "BOY", ""))
+    self.assertEqual(table.Values("E002"),
+                     (None, None, None, None, "7521", "BOY", "x"))
+    self.assertEqual(table.Values("E003"),
+                     (None, None, None, None, None, "", ""))
+    self.assertEqual(table.Values("E004"),
+                     (None, None, None, None, None, "", ""))
+    # Equal strings are stored once.
+    self.assert_(table.names_en[0] is table.names_en[1])
+    self.assertEqual(list(table.shift_jis),
+                     [0xF941, carrier_data.UNMAPPED, carrier_data.UNMAPPED])
+
+  def testPerInstance(self):
+    self.assertEqual(carrier_data.CarrierData._attributes, None)
+    self.assert_(carrier_data.GetDocomoData()._attributes is not
+                 carrier_data.GetKddiData()._attributes)
+
+
+class BatchLookupTest(unittest.TestCase):
+  def testSameAsSymbols(self):
+    """LookUpCodePoints() returns the SymbolFromUnicode() values."""
+    for data in (carrier_data.GetDocomoData(), carrier_data.GetKddiData(),
+                 carrier_data.GetSoftbankData(), carrier_data.GetGoogleData()):
+      code_points = set([int(uni, 16) for uni in data.all_uni])
+      code_points.update([int(uni, 16) for uni in data._attributes or ()])
+      if code_points:
+        code_points.update(range(min(code_points) - 2, max(code_points) + 3))
+      code_points.update((0, 0x41, 0x10FFFF))
+      code_points = sorted(code_points)
+      (shift_jis, jis, number) = data.LookUpCodePoints(code_points)
+      self.assertEqual(len(shift_jis), len(code_points))
+      for (i, code_point) in enumerate(code_points):
+        symbol = data.SymbolFromUnicode("%04X" % code_point)
+        expected = []
+        for code in (symbol.shift_jis, symbol.jis):
+          expected.append(code and int(code, 16) or carrier_data.UNMAPPED)
+        if symbol.number is None:
+          expected.append(carrier_data.UNMAPPED)
+        else:
+          expected.append(symbol.number)
+        self.assertEqual([shift_jis[i], jis[i], number[i]], expected,
+                         "%s U+%04X" % (data.carrier, code_point))
+
+  def testEmpty(self):
+    self.assertEqual(
+        [list(values)
+         for values in carrier_data.GetDocomoData().LookUpCodePoints([])],
+        [[], [], []])
+
+  @unittest.skipIf(carrier_data.numpy is None, "NumPy is not installed")
+  def testSameWithoutNumPy(self):
+    numpy = carrier_data.numpy
+    code_points = (range(0xE000, 0xE900) + range(0xFE000, 0xFEC00) +
+                   [0, 0x41, 0x10FFFF])
+    for carrier in ("docomo", "kddi", "softbank", "google"):
+      with_numpy = carrier_data.GetCarrierData(carrier).LookUpCodePoints(
+          numpy.array(code_points))
+      # A new instance, so that it builds its tables without NumPy.
+      data = carrier_data.CarrierData(carrier,
+                                      carrier_data._DEFAULT_DATA_ROOT)
+      carrier_data.numpy = None
+      try:
+        without_numpy = data.LookUpCodePoints(code_points)
+      finally:
+        carrier_data.numpy = numpy
+      for (values, other_values) in zip(with_numpy, without_numpy):
+        self.assertEqual(values.dtype, numpy.int32)
+        self.assertEqual(other_values.typecode, "i")
+        self.assertEqual(list(values), list(other_values))
+
+
+class DefinitionsTest(unittest.TestCase):
+  """A carrier defined only in a data folder's carriers.xml file."""
+  def setUp(self):
+    self.__temp_dir = tempfile.mkdtemp()
+    os.mkdir(os.path.join(self.__temp_dir, "willcom"))
+    self.__WriteFile(("willcom", "carrier_data.xml"),
+                     '<carrier_data>'
+                     '<e unicode="F001" name_en="Sun" new_number="12"/>'
+                     '</carrier_data>')
+    self.__saved_cache_dir = snapshot.GetCacheDirectory()
+    snapshot.SetCacheDirectory(os.path.join(self.__temp_dir, "cache"))
+
+  def tearDown(self):
+    snapshot.SetCacheDirectory(self.__saved_cache_dir)
+    shutil.rmtree(self.__temp_dir)
+
+  def __WriteFile(self, path, contents):
+    file = open(os.path.join(self.__temp_dir, *path), "wb")
+    file.write(contents)
+    file.close()
+
+  def __WriteDefinitions(self, ranges):
+    self.__WriteFile(("carriers.xml",),
+                     '<carriers>'
+                     '<carrier name="willcom" data="willcom/carrier_data.xml">'
+                     '%s'
+                     '<image src="http://example.com/{number}.png" '
+                     'min_number="10" number_offset="-9" width="12"/>'
+                     '<image src="http://example.com/{uni}.png"/>'
+                     '</carrier>'
+                     '</carriers>' % ranges)
+
+  def testNewCarrier(self):
+    self.__WriteDefinitions(
+        '<range field="number" unicode="F001-F00A" target="1-10"/>'
+        '<range field="shift_jis" unicode="F001-F00A" target="F07E-F088"/>')
+    data = carrier_data.GetCarrierData("willcom", self.__temp_dir)
+    self.assertEqual(data.carrier, "willcom")
+    self.assertEqual(len(data.all_uni), 10)
+    symbol = data.SymbolFromUnicode("F001")
+    self.assertEqual((symbol.number, symbol.shift_jis, symbol.new_number),
+                     (1, "F07E", 12))
+    self.assertEqual(symbol.GetEnglishName(), "Sun")
+    self.assertEqual(data.SymbolFromUnicode("F002").shift_jis, "F080")
+    self.assertEqual(data.UnicodeFromShiftJis("F080"), "F002")
+    self.assertEqual(data.UnicodeFromNewNumber(12), "F001")
+    self.assertEqual(data.GetShiftJISLeadBytes(), frozenset([0xf0]))
+    self.assertEqual(symbol.ImageHTML(),
+                     "<img src=http://example.com/F001.png>")
+    self.assertEqual(data.SymbolFromUnicode("F00A").ImageHTML(),
+                     "<img src=http://example.com/1.png width=12>")
+    self.assertRaises(ValueError,
+                      carrier_data.GetCarrierData, "emobile", self.__temp_dir)
+
+  def testBadRange(self):
+    self.__WriteDefinitions(
+        '<range field="number" unicode="F001-F00A" target="1-11"/>')
+    self.assertRaises(ValueError,
+                      carrier_data.GetCarrierData, "willcom", self.__temp_dir)
+    self.__WriteDefinitions(
+        '<range field="name" unicode="F001-F00A" target="1-10"/>')
+    self.assertRaises(ValueError,
+                      carrier_data.GetCarrierData, "willcom", self.__temp_dir)
+
+
+class CarrierDataMapTest(unittest.TestCase):
+  def testMap(self):
+    data_map = carrier_data.CarrierDataMap(("docomo", "google"))
+    self.assertEqual(list(data_map), ["docomo", "google"])
+    self.assertEqual(len(data_map), 2)
+    self.assert_("docomo" in data_map)
+    self.failIf("kddi" in data_map)
+    self.assert_(data_map["docomo"] is carrier_data.GetDocomoData())
+    self.assertEqual(data_map.get("kddi"), None)
+    self.assertRaises(KeyError, lambda: data_map["kddi"])
+
+
 if __name__ == "__main__":
   unittest.main()
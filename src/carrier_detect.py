@@ -0,0 +1,146 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Guess which carrier's Emoji a Shift-JIS byte string contains.
+
+The carriers encode their Emoji in the Shift-JIS user-defined area with
+lead bytes F0..FC, and their lead bytes overlap (for example, F9 for DoCoMo
+and SoftBank), so the detector compares the whole double-byte codes.
+It counts the double-byte characters with lead bytes F0..FC
+in a bounded prefix of the buffer, and scores each carrier by the fraction
+of them which are that carrier's Emoji codes.
+
+Usage:
+  ranked = carrier_detect.Detect(mail_body)
+  if ranked and ranked[0][1] >= 0.9: carrier = ranked[0][0]
+"""
+
+__author__ = "Markus Scherer"
+
+import array
+import re
+import sys
+import carrier_data
+
+try:
+  import numpy
+except ImportError:
+  numpy = None  # The detector works without NumPy, but more slowly.
+
+# Carriers with Shift-JIS Emoji codes.
+_CARRIERS = ("docomo", "kddi", "softbank")
+
+# Number of bytes Detect() inspects by default.
+DEFAULT_MAX_BYTES = 64 * 1024
+
+# Tokenizes Shift-JIS text: Runs of JIS X 0208 double-byte characters,
+# runs of single bytes, and one user-defined-area double-byte character
+# (the only tokens captured by the group).
+# Each token starts at a character boundary, so the tokenization stays
+# in sync with the characters.
+_TOKEN_RE = re.compile(
+    "(?:[\x81-\x9f\xe0-\xef][\x00-\xff])+|"
+    "[^\x81-\x9f\xe0-\xfc]+|"
+    "([\xf0-\xfc][\x00-\xff])")
+
+class CarrierDetector(object):
+  """Scores Shift-JIS byte strings against carriers' Emoji codes.
+
+  Attributes:
+    carriers: Tuple of the lowercase carrier names.
+  """
+  def __init__(self, carriers=_CARRIERS, data_root=None):
+    """Collect the carriers' Shift-JIS Emoji codes.
+
+    Args:
+      carriers: Sequence of lowercase names of carriers
+        with Shift-JIS Emoji codes.
+      data_root: Path of the data folder, see carrier_data.GetCarrierData().
+    """
+    self.carriers = tuple(carriers)
+    # Map from a double-byte code integer to a bit set of the indexes of
+    # the carriers with that code.
+    self.__code_to_carriers = {}
+    for (i, carrier) in enumerate(self.carriers):
+      data = carrier_data.GetCarrierData(carrier, data_root)
+      for shift_jis in data.GetShiftJISCodes():
+        code = int(shift_jis, 16)
+        self.__code_to_carriers[code] = (
+            self.__code_to_carriers.get(code, 0) | (1 << i))
+    if numpy:
+      # Per carrier, an array of its codes, for indexing a histogram.
+      self.__code_arrays = []
+      for i in xrange(len(self.carriers)):
+        codes = [code for (code, bits) in self.__code_to_carriers.iteritems()
+                 if bits & (1 << i)]
+        self.__code_arrays.append(numpy.array(sorted(codes), numpy.intp))
+
+  def Detect(self, buffer, max_bytes=DEFAULT_MAX_BYTES):
+    """Guess which carrier's Emoji the buffer contains.
+
+    Args:
+      buffer: Shift-JIS byte string.
+      max_bytes: Number of bytes at the start of the buffer to inspect.
+
+    Returns:
+      A list of (carrier, confidence) pairs for all carriers,
+      best guess first. The confidence is the fraction of the inspected
+      user-defined-area double-byte characters which are the carrier's
+      Emoji codes, 0.0 if there are none. The result is the same
+      with or without NumPy.
+    """
+    pairs = "".join(_TOKEN_RE.findall(buffer, 0, max_bytes))
+    total = len(pairs) / 2
+    if not total:
+      return [(carrier, 0.0) for carrier in self.carriers]
+    if numpy:
+      codes = numpy.frombuffer(pairs, dtype=">u2")
+      histogram = numpy.bincount(codes, minlength=0x10000)
+      scores = [int(histogram[carrier_codes].sum())
+                for carrier_codes in self.__code_arrays]
+    else:
+      codes = array.array("H", pairs)
+      if sys.byteorder == "little": codes.byteswap()
+      scores = [0] * len(self.carriers)
+      for code in codes:
+        bits = self.__code_to_carriers.get(code, 0)
+        i = 0
+        while bits:
+          if bits & 1: scores[i] += 1
+          bits >>= 1
+          i += 1
+    ranked = [(carrier, float(scores[i]) / total)
+              for (i, carrier) in enumerate(self.carriers)]
+    # Stable sort: Equal confidences keep the carriers order.
+    ranked.sort(key=lambda pair: -pair[1])
+    return ranked
+
+
+_default_detector = None
+
+def GetDefaultDetector():
+  """Returns a shared CarrierDetector for the default carriers and data."""
+  global _default_detector
+  detector = _default_detector
+  if detector is None:
+    # Concurrent callers might each build a detector; any one will do.
+    detector = _default_detector = CarrierDetector()
+  return detector
+
+
+def Detect(buffer, max_bytes=DEFAULT_MAX_BYTES):
+  """Calls Detect() on the default CarrierDetector."""
+  return GetDefaultDetector().Detect(buffer, max_bytes)
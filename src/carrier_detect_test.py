@@ -0,0 +1,87 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = "Markus Scherer"
+
+import unittest
+import carrier_data
+import carrier_detect
+
+def _Emoji(carrier, uni):
+  """Returns the Shift-JIS bytes of a carrier's Emoji symbol."""
+  symbol = carrier_data.GetCarrierData(carrier).SymbolFromUnicode(uni)
+  return symbol.shift_jis.decode("hex")
+
+
+class CarrierDetectTest(unittest.TestCase):
+  def testEachCarrier(self):
+    for (carrier, uni) in (("docomo", "E63E"), ("kddi", "E468"),
+                           ("softbank", "E401")):
+      ranked = carrier_detect.Detect("Hi \x93\x8c\x8b\x9e " +
+                                     _Emoji(carrier, uni) * 2)
+      self.assertEqual(ranked[0], (carrier, 1.0))
+      self.assertEqual(len(ranked), 3)
+
+  def testOverlappingLeadBytes(self):
+    # F9 is a DoCoMo and a SoftBank lead byte,
+    # and SoftBank F941 is also a DoCoMo code.
+    buffer = _Emoji("softbank", "E001") + _Emoji("softbank", "E401")
+    self.assertEqual(buffer, "\xf9\x41\xfb\x41")
+    self.assertEqual(carrier_detect.Detect(buffer),
+                     [("softbank", 1.0), ("docomo", 0.5), ("kddi", 0.0)])
+
+  def testMixed(self):
+    buffer = _Emoji("kddi", "E468") * 3 + _Emoji("docomo", "E63E")
+    self.assertEqual(carrier_detect.Detect(buffer),
+                     [("kddi", 0.75), ("docomo", 0.25), ("softbank", 0.0)])
+
+  def testNoEmoji(self):
+    self.assertEqual(carrier_detect.Detect(""),
+                     [("docomo", 0.0), ("kddi", 0.0), ("softbank", 0.0)])
+    # F8 is the trail byte of the kanji 88F8.
+    ranked = carrier_detect.Detect("\x88\xf8\x9f\x40")
+    self.assertEqual(ranked[0][1], 0.0)
+
+  def testPrefix(self):
+    emoji = _Emoji("docomo", "E63E")
+    buffer = "a" * 100 + emoji
+    self.assertEqual(carrier_detect.Detect(buffer, 102)[0][1], 1.0)
+    self.assertEqual(carrier_detect.Detect(buffer, 101)[0][1], 0.0)
+    self.assertEqual(carrier_detect.Detect(buffer, 100)[0][1], 0.0)
+
+  @unittest.skipIf(carrier_detect.numpy is None, "NumPy is not installed")
+  def testSameWithoutNumPy(self):
+    numpy = carrier_detect.numpy
+    buffer = ("Hi \x93\x8c\x8b\x9e " + _Emoji("docomo", "E63E") * 3 +
+              _Emoji("softbank", "E001") + _Emoji("kddi", "E468") + "\xf0\x40")
+    with_numpy = carrier_detect.CarrierDetector()
+    carrier_detect.numpy = None
+    try:
+      without_numpy = carrier_detect.CarrierDetector()
+      for text in (buffer, "", "abc", "\x88\xf8"):
+        self.assertEqual(without_numpy.Detect(text), with_numpy.Detect(text))
+    finally:
+      carrier_detect.numpy = numpy
+
+  def testCarriers(self):
+    detector = carrier_detect.CarrierDetector(("softbank",))
+    self.assertEqual(detector.carriers, ("softbank",))
+    self.assertEqual(detector.Detect(_Emoji("softbank", "E001")),
+                     [("softbank", 1.0)])
+
+
+if __name__ == "__main__":
+  unittest.main()
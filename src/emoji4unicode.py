@@ -19,151 +19,744 @@
 Reads emoji4unicode.xml, the carrier data files and other files
 and makes the data available.
 
-Also provides a Write() function for writing an XML document in
-the style of emoji4unicode.xml (to minimize diffs).
+An Emoji4UnicodeDatabase holds the data from one data folder.
+Load() and the other module functions work with a default database.
+Loading streams through the XML files and builds the in-memory data directly;
+it does not build or keep a DOM.
 
-Attributes:
+Also provides ReadDocument() and Write() for scripts which edit
+emoji4unicode.xml: ReadDocument() returns the whole document as a tree
+of Element objects, and Write() writes such a tree in the style of
+emoji4unicode.xml (to minimize diffs).
+
+Attributes (of the default database, set by Load()):
   carriers: List of lowercase names of carriers for which we have CarrierData.
   all_carrier_data: Map from lowercase carrier name to CarrierData object.
+    Each carrier's data is loaded when it is first looked up.
   arib_ucm: UCMFile with ARIB-Unicode mappings.
   id_to_symbol: Map from symbol ID to Symbol object.
+
+Reverse lookups from carrier codes, Unicode code points, names and
+glyphRefIDs to symbols use indexes which each database builds;
+see SymbolFromCarrierUnicode() etc.
 """
 
 __author__ = "Markus Scherer"
 
-import codecs
+import gc
 import os.path
+import hashlib
+import marshal
 import re
 import sys
-import xml.dom.minidom
+import threading
+import xml.parsers.expat
 import carrier_data
 import row_cell
+import snapshot
 import standardized_variants
+import symbol_query
 import ucm
 
 _HIGH_UNI = 0x1F300
 _MAX_HIGH_UNI = 0x1F7FF
 
+# Carriers with mappings in emoji4unicode.xml, in the order of
+# Symbol._carrier_unicodes and Symbol._carrier_codes.
+_CARRIERS = ("docomo", "kddi", "softbank", "google")
+_CARRIER_INDEXES = dict([(c, i) for (i, c) in enumerate(_CARRIERS)])
+
+_DEFAULT_DATA_ROOT = os.path.join(os.path.dirname(__file__), "..", "data")
+
+class Emoji4UnicodeDatabase(object):
+  """emoji4unicode.xml and related data, loaded from one data folder.
+
+  A database is not modified after construction.
+  Several databases, for example for different versions of the data files,
+  can be used side by side, and each can be shared among threads
+  without locking.
+
+  The module functions (Load(), GetSymbols() etc.) use a default instance.
+
+  Attributes:
+    data_root: Path of the data folder.
+    carriers: Tuple of lowercase names of carriers for which we have
+      CarrierData.
+    all_carrier_data: Map from lowercase carrier name to CarrierData object.
+    arib_ucm: UCMFile with ARIB-Unicode mappings.
+    id_to_symbol: Map from symbol ID to Symbol object.
+  """
+  def __init__(self, data_root=None, previous=None):
+    """Parse emoji4unicode.xml and prepare to load related data.
+
+    The constructor parses only emoji4unicode.xml.
+    Each carrier's data file is parsed when that carrier's CarrierData
+    is first looked up in all_carrier_data;
+    arib.ucm and StandardizedVariants.txt are parsed when a Symbol first
+    needs them (GetARIB(), UnicodeHasVariationSequence()).
+    Parsed data files are cached in snapshot files, see the snapshot module.
+
+    Args:
+      data_root: Path of the data folder with emoji4unicode.xml,
+        the carrier subfolders etc.
+        Defaults to the data folder next to this module's folder.
+      previous: Internal, for Reload(): An older database for the same
+        data folder. Symbols whose <e> elements have not changed
+        copy their decoded data from it.
+    """
+    if not data_root: data_root = _DEFAULT_DATA_ROOT
+    self.data_root = data_root
+    self.carriers = _CARRIERS
+    self.all_carrier_data = carrier_data.CarrierDataMap(_CARRIERS, data_root)
+    arib_filename = os.path.join(data_root, "arib", "arib.ucm")
+    vs_filename = os.path.join(data_root, "unicode", "StandardizedVariants.txt")
+    e4u_filename = os.path.join(data_root, "emoji4unicode.xml")
+    # Record the file states before reading the files, for IsCurrent().
+    self.__source_states = tuple([
+        (filename, snapshot.GetFileState(filename))
+        for filename in (e4u_filename, arib_filename, vs_filename)])
+    self.arib_ucm = ucm.UCMFile(arib_filename)
+    self.__emoji_vs_code_points = None
+    self.__conversion_tables = None
+    self.__views = {}
+    category_records = snapshot.Load(e4u_filename, _ParseXML, version=2)
+    # Map from <e> record digest to an unchanged Symbol of the previous
+    # database, used only while building the symbol tree.
+    self.__previous_symbols = {}
+    if previous:
+      for symbol in previous.GetSymbols():
+        self.__previous_symbols[symbol._digest] = symbol
+    # Build the category -> subcategory -> symbol tree once.
+    self._categories = tuple([Category(self, record)
+                              for record in category_records])
+    self.__previous_symbols = None  # Do not keep the old database alive.
+    symbols = []
+    for category in self._categories:
+      for subcategory in category.GetSubcategories():
+        symbols.extend(subcategory.GetSymbols())
+    self._symbols = tuple(symbols)
+    # Preprocess the full set of symbols.
+    self.id_to_symbol = {}
+    high_code_point = _HIGH_UNI - 1
+    proposed_code_point = high_code_point
+    for symbol in self._symbols:
+      self.id_to_symbol[symbol.id] = symbol
+      # Read or enumerate proposed Unicode code points.
+      if symbol.in_proposal:
+        (proposed_code_point, high_code_point) = symbol._SetProposedUnicode(
+            proposed_code_point, high_code_point)
+    self._BuildIndexes()
+
+  def _BuildIndexes(self):
+    """Build the maps for the reverse lookup functions."""
+    round_trip_index = {}
+    fallback_lists = {}
+    for carrier in _CARRIERS:
+      round_trip_index[carrier] = {}
+      fallback_lists[carrier] = {}
+    unicode_index = {}
+    code_points_index = {}
+    name_index = {}
+    glyph_index = {}
+    for symbol in self._symbols:
+      for carrier in _CARRIERS:
+        (is_fallback, codes) = symbol.GetCarrierCodes(carrier)
+        if not codes: continue
+        code = "+".join(codes)
+        if is_fallback:
+          fallback_lists[carrier].setdefault(code, []).append(symbol)
+        else:
+          round_trip_index[carrier].setdefault(code, symbol)
+      uni = symbol.GetUnicode() or symbol.GetProposedUnicode()
+      if uni: unicode_index.setdefault(uni, symbol)
+      code_points = (symbol.GetUnicodeCodePoints() or
+                     symbol.GetProposedUnicodeCodePoints())
+      if code_points: code_points_index.setdefault(code_points, symbol)
+      name_index.setdefault(symbol.GetName(), symbol)
+      glyph_id = symbol.GetGlyphRefID()
+      if glyph_id: glyph_index.setdefault(glyph_id, symbol)
+    fallback_index = {}
+    for (carrier, carrier_fallback_lists) in fallback_lists.iteritems():
+      carrier_fallback_index = {}
+      for (code, symbols) in carrier_fallback_lists.iteritems():
+        carrier_fallback_index[code] = tuple(symbols)
+      fallback_index[carrier] = carrier_fallback_index
+    self._carrier_round_trip_index = round_trip_index
+    self._carrier_fallback_index = fallback_index
+    self._unicode_index = unicode_index
+    self._code_points_index = code_points_index
+    self._name_index = name_index
+    self._glyph_index = glyph_index
+
+  def _PreviousSymbol(self, digest):
+    """Internal: Returns the previous database's Symbol for an unchanged
+    <e> record, or None."""
+    return self.__previous_symbols.get(digest)
+
+  def IsCurrent(self):
+    """Returns False if one of the data files has changed since it was read.
+
+    Compares file modification times and sizes, and the contents of files
+    which had been modified just before they were read.
+    See snapshot.IsFileCurrent().
+    Carrier data files are checked only for carriers that have been loaded;
+    the others are read when they are first needed.
+    """
+    for (filename, state) in self.__source_states:
+      if not snapshot.IsFileCurrent(filename, state): return False
+    return self.all_carrier_data.IsCurrent()
+
+  def Reload(self):
+    """Return a database with the current contents of the data files.
+
+    This database is not modified, so that readers which use it continue to
+    see consistent data.
+
+    Returns:
+      This database if none of the data files have changed.
+      Otherwise a new database. Its symbols reuse the decoded data of
+      this database's symbols whose <e> elements have not changed.
+      Unchanged data files are read back from their snapshots,
+      and carrier data for unchanged files is shared.
+    """
+    if self.IsCurrent(): return self
+    return Emoji4UnicodeDatabase(self.data_root, previous=self)
+
+  def LoadAll(self):
+    """Load all data that is otherwise loaded on first use.
+
+    Reads the data for all carriers, the ARIB and variation sequence data,
+    and builds all sorted views, the carrier conversion tables and
+    the SymbolQuery.
+    """
+    for carrier in self.carriers:
+      self.all_carrier_data[carrier]
+      self.GetSymbolsSortedByCarrierUnicode(carrier)
+      self.GetCarrierConversionTable(carrier, carrier)
+    self._SetSymbolARIBCodes()
+    self._SetSymbolVariationSequenceFlags()
+    self.GetSymbolsSortedByUnicode()
+    self.GetSymbolsInProposalSortedByUnicode()
+    self.GetSymbolsGroupedBySubcategory()
+    self.GetQuery()
+
+  def _GetEmojiVSCodePoints(self):
+    """Internal: Get the frozenset of code points with Emoji VS sequences."""
+    code_points = self.__emoji_vs_code_points
+    if code_points is None:
+      # Concurrent callers might each read the file; any result will do.
+      code_points = self.__emoji_vs_code_points = (
+          standardized_variants.ReadSetOfUnicodeWithEmojiVS(self.data_root))
+    return code_points
+
+  def _SetSymbolARIBCodes(self):
+    """Internal: Set the ARIB codes of all symbols, for Symbol.GetARIB()."""
+    from_unicode = self.arib_ucm.from_unicode
+    for symbol in self._symbols:
+      symbol._SetARIB(from_unicode)
+
+  def _SetSymbolVariationSequenceFlags(self):
+    """Internal: Set the flags for Symbol.UnicodeHasVariationSequence()
+    of all symbols."""
+    code_points = self._GetEmojiVSCodePoints()
+    for symbol in self._symbols:
+      symbol._SetHasVariationSequence(code_points)
+
+  def GetCategories(self):
+    """Generator of Category objects."""
+    return iter(self._categories)
+
+  def GetSymbols(self):
+    """Generator of Symbol objects.
+
+    Returns the same Symbol objects on every call,
+    so they can be used as dictionary keys.
+    """
+    return iter(self._symbols)
+
+  def __GetView(self, key, BuildView):
+    """Returns a cached symbol view; builds it on first use."""
+    view = self.__views.get(key)
+    if view is None:
+      # Concurrent callers might each build the view; any one will do.
+      view = self.__views[key] = BuildView()
+    return view
+
+  def GetSymbolsSortedByUnicode(self):
+    """Return all symbols sorted by Unicode.
+
+    The view is built once and then shared by all callers.
+
+    Returns:
+      A tuple of pairs where the first one is the tuple of code point integers
+      for the Unicode code point or sequence, and the second is the symbol
+      object.
+      Symbols that are neither unified nor proposed are sorted by
+      their Google PUA code points.
+    """
+    def BuildView():
+      proposed_symbols = []
+      for symbol in self._symbols:
+        code_points = symbol.GetUnicodeCodePoints()
+        if not code_points:
+          if symbol.in_proposal:
+            code_points = symbol.GetProposedUnicodeCodePoints()
+          else:
+            code_points = symbol.GetCarrierCodePoints("google")[1]
+        proposed_symbols.append((code_points, symbol))
+      return _SortedView(proposed_symbols)
+    return self.__GetView("unicode", BuildView)
+
+  def GetSymbolsInProposalSortedByUnicode(self):
+    """Return the symbols with in_proposal=True sorted by Unicode.
+
+    The view is built once and then shared by all callers.
+
+    Returns:
+      A tuple of pairs where the first one is the tuple of code point integers
+      for the Unicode code point or sequence, and the second is the symbol
+      object.
+    """
+    def BuildView():
+      proposed_symbols = []
+      for symbol in self._symbols:
+        if not symbol.in_proposal: continue
+        code_points = (symbol.GetUnicodeCodePoints() or
+                       symbol.GetProposedUnicodeCodePoints())
+        proposed_symbols.append((code_points, symbol))
+      return _SortedView(proposed_symbols)
+    return self.__GetView("in_proposal", BuildView)
+
+  def GetSymbolsSortedByCarrierUnicode(self, carrier):
+    """Return the symbols with mappings to the carrier, sorted by PUA code.
+
+    The view is built once per carrier and then shared by all callers.
+
+    Args:
+      carrier: Name of a carrier, for example "docomo" or "google".
+
+    Returns:
+      A tuple of pairs where the first one is the tuple of the carrier's
+      PUA code point integers, and the second is the symbol object.
+      Round-trip and fallback mappings are included;
+      for the same PUA code, the round-trip mapping comes first,
+      then the fallbacks in the order of GetSymbols().
+    """
+    index = _CarrierIndex(carrier)
+    def BuildView():
+      carrier_symbols = []
+      for symbol in self._symbols:
+        (is_fallback, code_points) = symbol._carrier_code_points[index]
+        if code_points:
+          carrier_symbols.append((code_points, is_fallback, symbol))
+      # Round-trip mappings sort before fallbacks for the same PUA code.
+      # The sort is stable and does not compare Symbol objects.
+      carrier_symbols.sort(key=lambda triple: triple[:2])
+      return tuple([(code_points, symbol)
+                    for (code_points, is_fallback, symbol) in carrier_symbols])
+    return self.__GetView(("carrier", carrier), BuildView)
+
+  def GetSymbolsGroupedBySubcategory(self):
+    """Return the symbols grouped by subcategory.
+
+    The view is built once and then shared by all callers.
+
+    Returns:
+      A tuple of pairs where the first one is a Subcategory object and
+      the second is the tuple of its symbols, in the order of GetSymbols().
+      Subcategories without symbols are omitted.
+    """
+    def BuildView():
+      groups = []
+      for category in self._categories:
+        for subcategory in category.GetSubcategories():
+          symbols = tuple(subcategory.GetSymbols())
+          if symbols: groups.append((subcategory, symbols))
+      return tuple(groups)
+    return self.__GetView("subcategory", BuildView)
+
+  def GetQuery(self):
+    """Return the symbol_query.SymbolQuery for this database.
+
+    The query's predicate bitsets are computed once, on first use.
+    """
+    return self.__GetView("query", lambda: symbol_query.SymbolQuery(self))
+
+  def GetCarrierConversionTable(self, source, target):
+    """Return the conversion table from one carrier's codes to another's.
+
+    The tables for all pairs of carriers are built together on first use.
+    Do not modify a table.
+
+    Args:
+      source: Name of the source carrier, for example "docomo".
+      target: Name of the target carrier, for example "softbank" or "google".
+
+    Returns:
+      A dictionary mapping each source carrier code with a round-trip
+      mapping to a symbol (hex digit string, or a "+"-joined sequence of them)
+      to a tuple (is_fallback, codes, text_fallback) for that symbol.
+      codes is the tuple of target carrier code hex digit strings, and
+      is_fallback is True if the symbol has only a fallback (one-way) mapping
+      to the target carrier. text_fallback is empty.
+      If the symbol has no mapping to the target carrier, then codes is empty,
+      is_fallback is True, and text_fallback is the symbol's
+      GetTextFallback().
+    """
+    tables = self.__conversion_tables
+    if tables is None:
+      # Concurrent callers might each build the tables; any result will do.
+      tables = self.__conversion_tables = self.__BuildConversionTables()
+    try:
+      return tables[(source, target)]
+    except KeyError:
+      _CarrierIndex(source)  # Raises ValueError for an unknown carrier.
+      _CarrierIndex(target)
+      raise
+
+  def __BuildConversionTables(self):
+    tables = {}
+    for (target_index, target) in enumerate(_CARRIERS):
+      # The conversion result for each symbol, shared by all source carriers.
+      conversions = {}
+      for symbol in self._symbols:
+        (is_fallback, codes) = symbol._carrier_codes[target_index]
+        if codes:
+          conversions[symbol] = (is_fallback, codes, "")
+        else:
+          conversions[symbol] = (True, (), symbol._text_fallback)
+      for source in _CARRIERS:
+        table = {}
+        for (code, symbol) in (
+            self._carrier_round_trip_index[source].iteritems()):
+          table[code] = conversions[symbol]
+        tables[(source, target)] = table
+    return tables
+
+  def SymbolFromCarrierUnicode(self, carrier, uni):
+    """Get the symbol with a round-trip mapping to the carrier code.
+
+    Args:
+      carrier: Name of a carrier, for example "docomo" or "google".
+      uni: Carrier Unicode PUA code point, as a hex digit string.
+
+    Returns:
+      The Symbol object, or None if no symbol has a round-trip mapping
+      to the carrier code point.
+    """
+    try:
+      return self._carrier_round_trip_index[carrier].get(uni)
+    except KeyError:
+      raise ValueError("unknown carrier \"%s\"" % carrier)
+
+  def SymbolsWithCarrierFallback(self, carrier, uni):
+    """Get the symbols with fallback (one-way) mappings to the carrier code.
+
+    Args:
+      carrier: Name of a carrier, for example "docomo" or "google".
+      uni: Carrier Unicode PUA code point, as a hex digit string,
+        or a sequence of them with "+" separators.
+
+    Returns:
+      A tuple of Symbol objects in the order of GetSymbols().
+      The tuple is empty if no symbol has a fallback mapping to the carrier
+      code.
+    """
+    try:
+      return self._carrier_fallback_index[carrier].get(uni, ())
+    except KeyError:
+      raise ValueError("unknown carrier \"%s\"" % carrier)
+
+  def ConvertCarrierUnicode(self, source, target, uni):
+    """Convert a carrier code to another carrier via the Emoji symbol.
+
+    Args:
+      source: Name of the source carrier, for example "docomo".
+      target: Name of the target carrier, for example "softbank" or "google".
+      uni: Source carrier Unicode PUA code point, as a hex digit string,
+        or a sequence of them with "+" separators.
+
+    Returns:
+      A tuple (is_fallback, codes, text_fallback),
+      see GetCarrierConversionTable().
+      None if no symbol has a round-trip mapping to the source carrier code.
+    """
+    return self.GetCarrierConversionTable(source, target).get(uni)
+
+  def SymbolFromUnicode(self, uni):
+    """Get the symbol for a Unicode code point or sequence.
+
+    Args:
+      uni: A string with one or more 4..6-hex-digit code points with "+"
+        separators, as returned by Symbol.GetUnicode() or
+        Symbol.GetProposedUnicode().
+
+    Returns:
+      The Symbol object which is unified with the Unicode code point or
+      sequence, or which has it as its proposed code point or sequence;
+      or None if there is no such symbol.
+    """
+    return self._unicode_index.get(uni)
+
+  def SymbolFromUnicodeCodePoints(self, code_points):
+    """Get the symbol for a Unicode code point sequence.
+
+    Like SymbolFromUnicode() but without parsing hex strings.
+
+    Args:
+      code_points: A tuple of code point integers, as returned by
+        Symbol.GetUnicodeCodePoints() or
+        Symbol.GetProposedUnicodeCodePoints().
+
+    Returns:
+      The Symbol object, or None if there is no such symbol.
+    """
+    return self._code_points_index.get(code_points)
+
+  def SymbolFromName(self, name):
+    """Get the symbol with the character name, or None if there is none."""
+    return self._name_index.get(name)
+
+  def SymbolFromGlyphRefID(self, glyph_id):
+    """Get the symbol with the font glyphRefID integer, or None."""
+    return self._glyph_index.get(glyph_id)
+
+  def CarrierImageHTML(self, carrier, symbol):
+    """Get the carrier's image HTML for the symbol.
+
+    Args:
+      carrier: Name of a carrier.
+      symbol: The carrier_data.Symbol instance.
+
+    Returns:
+      An HTML string for the symbol's image, or an empty string if
+      there is none.
+    """
+    if carrier == "kddi":
+      e4u_symbol = self.SymbolFromCarrierUnicode("kddi", symbol.uni)
+      if e4u_symbol:
+        # Use images hosted by Google rather than another non-KDDI site.
+        google_uni = e4u_symbol.GetCarrierUnicode("google")
+        if google_uni and not google_uni.startswith(">"):
+          return ("<img src=http://mail.google.com/mail/e/ezweb_ne_jp/%s>" %
+                  google_uni[-3:])
+    return symbol.ImageHTML()
+
+
+# The default database, and its data for backward compatibility.
+_default_database = None
 all_carrier_data = {}
 
+# Serializes Load() and Reload().
+_load_lock = threading.Lock()
+
 def Load():
-  """Parse emoji4unicode.xml and load related data."""
-  # TODO(mscherer): Add argument for root data folder path.
-  global carriers, all_carrier_data, arib_ucm, id_to_symbol
-  global _kddi_to_google, _doc, _root, _id_to_proposed_uni
-  if all_carrier_data: return  # Already loaded.
-  carriers = ["docomo", "kddi", "softbank", "google"]
-  all_carrier_data = {
-    "docomo": carrier_data.GetDocomoData(),
-    "kddi": carrier_data.GetKddiData(),
-    "softbank": carrier_data.GetSoftbankData(),
-    "google": carrier_data.GetGoogleData()
-  }
-  here = os.path.dirname(__file__)
-  arib_filename = os.path.join(here, "..", "data", "arib", "arib.ucm")
-  arib_ucm = ucm.UCMFile(arib_filename)
-  e4u_filename = os.path.join(here, "..", "data", "emoji4unicode.xml")
-  _doc = xml.dom.minidom.parse(e4u_filename)
-  _root = _doc.documentElement
-  # Preprocess the full set of symbols.
-  id_to_symbol = {}
-  high_uni = "%04X" % (_HIGH_UNI - 1)
-  proposed_uni = high_uni
-  _id_to_proposed_uni = {}
-  _kddi_to_google = {}
-  for symbol in GetSymbols():
-    id_to_symbol[symbol.id] = symbol
-    # Read or enumerate proposed Unicode code points.
-    if symbol.in_proposal:
-      (proposed_uni, high_uni) = symbol._SetProposedUnicode(proposed_uni,
-                                                            high_uni)
-    # Map from KDDI to Google for Google-hosted symbol.CarrierImageHTML().
-    kddi_uni = symbol.GetCarrierUnicode("kddi")
-    if kddi_uni and not kddi_uni.startswith(">"):
-      google_uni = symbol.GetCarrierUnicode("google")
-      if google_uni: _kddi_to_google[kddi_uni] = google_uni
-  standardized_variants.Load()
+  """Parse emoji4unicode.xml into the default database.
+
+  Related data files are loaded on first use,
+  see Emoji4UnicodeDatabase.__init__().
+  """
+  if _default_database: return  # Already loaded.
+  _load_lock.acquire()
+  try:
+    if not _default_database: _SetDefaultDatabase(Emoji4UnicodeDatabase())
+  finally:
+    _load_lock.release()
+
+def Reload():
+  """Reload changed data files into a new default database.
+
+  Swaps in the new database with a single assignment:
+  Each module function call uses either the old or the new database.
+  For a consistent view across several calls, use the object returned by
+  GetDefaultDatabase().
+  See Emoji4UnicodeDatabase.Reload().
+
+  Returns:
+    True if a data file had changed and the default database was replaced.
+  """
+  _load_lock.acquire()
+  try:
+    if not _default_database:
+      _SetDefaultDatabase(Emoji4UnicodeDatabase())
+      return True
+    database = _default_database.Reload()
+    if database is _default_database: return False
+    _SetDefaultDatabase(database)
+    return True
+  finally:
+    _load_lock.release()
+
+def PreloadForFork():
+  """Load the default database completely, before forking worker processes.
+
+  Call this in a pre-forking server before starting the workers.
+  Loads all data that would otherwise be loaded on first use in each worker,
+  see Emoji4UnicodeDatabase.LoadAll(), so that the workers share it
+  instead of each building their own copies.
+  Then runs a full garbage collection, which frees the temporary objects
+  from loading.
+
+  This does not freeze the data: The Symbol objects and the containers
+  which refer to them stay tracked by the garbage collector,
+  and reference count updates in the workers still copy the pages
+  they touch.
+  """
+  Load()
+  _default_database.LoadAll()
+  gc.collect()
+
+def _SetDefaultDatabase(database):
+  global _default_database, carriers, all_carrier_data, arib_ucm, id_to_symbol
+  carriers = list(database.carriers)
+  all_carrier_data = database.all_carrier_data
+  arib_ucm = database.arib_ucm
+  id_to_symbol = database.id_to_symbol
+  # Last, so that Load() callers see the other attributes set.
+  _default_database = database
+
+def GetDefaultDatabase():
+  """Returns the default Emoji4UnicodeDatabase. Loads it if necessary."""
+  Load()
+  return _default_database
 
 def GetCategories():
   """Generator of Category objects."""
-  global _root
-  for element in _root.getElementsByTagName("category"):
-    yield Category(element)
+  return _default_database.GetCategories()
 
 def GetSymbols():
-  """Generator of Symbol objects."""
-  for category in GetCategories():
-    for subcategory in category.GetSubcategories():
-      for symbol in subcategory.GetSymbols():
-        yield symbol
-
-def _UnicodeSequenceToList(uni):
-  """Turns the Unicode code point sequence string into an integer list."""
-  code_points = uni.split("+")
-  for i in range(len(code_points)):
-    code_points[i] = int(code_points[i], 16)
-  return code_points
+  """Generator of Symbol objects.
+
+  Returns the same Symbol objects on every call,
+  so they can be used as dictionary keys.
+  """
+  return _default_database.GetSymbols()
 
 def GetSymbolsSortedByUnicode():
   """Return all symbols sorted by Unicode.
 
-  Returns:
-    A list of pairs where the first one is the list of code point integers
-    for the Unicode code point or sequence, and the second is the symbol object.
+  See Emoji4UnicodeDatabase.GetSymbolsSortedByUnicode().
   """
-  proposed_symbols = []
-  for symbol in GetSymbols():
-    uni = symbol.GetUnicode()
-    if not uni:
-      if symbol.in_proposal:
-        uni = symbol.GetProposedUnicode()
-      else:
-        uni = symbol.GetCarrierUnicode("google")
-        if uni.startswith(">"): uni = uni[1:]
-    proposed_symbols.append((_UnicodeSequenceToList(uni), symbol))
-  proposed_symbols.sort()
-  return proposed_symbols
+  return _default_database.GetSymbolsSortedByUnicode()
 
 def GetSymbolsInProposalSortedByUnicode():
   """Return the symbols with in_proposal=True sorted by Unicode.
 
-  Returns:
-    A list of pairs where the first one is the list of code point integers
-    for the Unicode code point or sequence, and the second is the symbol object.
+  See Emoji4UnicodeDatabase.GetSymbolsInProposalSortedByUnicode().
+  """
+  return _default_database.GetSymbolsInProposalSortedByUnicode()
+
+def GetSymbolsSortedByCarrierUnicode(carrier):
+  """Return the symbols with mappings to the carrier, sorted by PUA code.
+
+  See Emoji4UnicodeDatabase.GetSymbolsSortedByCarrierUnicode().
+  """
+  return _default_database.GetSymbolsSortedByCarrierUnicode(carrier)
+
+def GetSymbolsGroupedBySubcategory():
+  """Return the symbols grouped by subcategory.
+
+  See Emoji4UnicodeDatabase.GetSymbolsGroupedBySubcategory().
   """
-  proposed_symbols = []
-  for symbol in GetSymbols():
-    if not symbol.in_proposal: continue
-    uni = symbol.GetUnicode()
-    if not uni: uni = symbol.GetProposedUnicode()
-    proposed_symbols.append((_UnicodeSequenceToList(uni), symbol))
-  proposed_symbols.sort()
-  return proposed_symbols
+  return _default_database.GetSymbolsGroupedBySubcategory()
+
+def GetQuery():
+  """Return the symbol_query.SymbolQuery for the default database."""
+  return _default_database.GetQuery()
+
+def GetCarrierConversionTable(source, target):
+  """Return the conversion table from one carrier's codes to another's.
+
+  See Emoji4UnicodeDatabase.GetCarrierConversionTable().
+  """
+  return _default_database.GetCarrierConversionTable(source, target)
+
+def SymbolFromCarrierUnicode(carrier, uni):
+  """Get the symbol with a round-trip mapping to the carrier code.
+
+  See Emoji4UnicodeDatabase.SymbolFromCarrierUnicode().
+  """
+  return _default_database.SymbolFromCarrierUnicode(carrier, uni)
+
+def SymbolsWithCarrierFallback(carrier, uni):
+  """Get the symbols with fallback (one-way) mappings to the carrier code.
+
+  See Emoji4UnicodeDatabase.SymbolsWithCarrierFallback().
+  """
+  return _default_database.SymbolsWithCarrierFallback(carrier, uni)
+
+def ConvertCarrierUnicode(source, target, uni):
+  """Convert a carrier code to another carrier via the Emoji symbol.
+
+  See Emoji4UnicodeDatabase.ConvertCarrierUnicode().
+  """
+  return _default_database.ConvertCarrierUnicode(source, target, uni)
+
+def SymbolFromUnicode(uni):
+  """Get the symbol for a Unicode code point or sequence.
+
+  See Emoji4UnicodeDatabase.SymbolFromUnicode().
+  """
+  return _default_database.SymbolFromUnicode(uni)
+
+def SymbolFromUnicodeCodePoints(code_points):
+  """Get the symbol for a tuple of Unicode code point integers.
+
+  See Emoji4UnicodeDatabase.SymbolFromUnicodeCodePoints().
+  """
+  return _default_database.SymbolFromUnicodeCodePoints(code_points)
+
+def SymbolFromName(name):
+  """Get the symbol with the character name, or None if there is none."""
+  return _default_database.SymbolFromName(name)
+
+def SymbolFromGlyphRefID(glyph_id):
+  """Get the symbol with the font glyphRefID integer, or None."""
+  return _default_database.SymbolFromGlyphRefID(glyph_id)
+
+def _SortedView(pairs):
+  """Sorts (code points, symbol) pairs by code points, into a tuple.
+
+  Does not compare Symbol objects: The sort is stable.
+  """
+  pairs.sort(key=lambda pair: pair[0])
+  return tuple(pairs)
+
+
+def _CodePointsFromString(uni):
+  """Turns the Unicode code point sequence string into an integer tuple."""
+  if not uni: return ()
+  return tuple([int(code, 16) for code in uni.split("+")])
+
 
 class Category(object):
   """A category of Emoji symbols.
 
   Mostly a name string, and a container for subcategories.
   """
-  def __init__(self, element):
+  def __init__(self, database, record):
     """Initialize from the Emoji4Unicode object and a <category> element.
 
     Do not instantiate directly: Use Emoji4Unicode.GetCategories().
 
     Args:
-      element: <category> DOM element
+      database: Emoji4UnicodeDatabase object
+      record: parsed <category> element, see _ParseXML()
 
     Raises:
       ValueError: If the element contains unexpected data.
     """
-    self.__element = element
-    self.name = element.getAttribute("name")
-    self.in_proposal = _InProposal(element, True)
+    (attributes, subcategory_records) = record
+    self.database = database
+    self.name = attributes.get("name", "")
+    self.in_proposal = _InProposal(attributes, True)
+    self.__subcategories = tuple(
+        [Subcategory(self, subcategory_record)
+         for subcategory_record in subcategory_records])
 
   def GetSubcategories(self):
     """Generator of Subcategory objects."""
-    for element in self.__element.getElementsByTagName("subcategory"):
-      yield Subcategory(self, element)
+    return iter(self.__subcategories)
 
 
 class Subcategory(object):
@@ -171,55 +764,145 @@ class Subcategory(object):
 
   Mostly a name string, and a container for symbols.
   """
-  def __init__(self, category, element):
+  def __init__(self, category, record):
     """Initialize from the Emoji4Unicode object and a <category> element.
 
     Do not instantiate directly: Use Emoji4Unicode.GetCategories().
 
     Args:
       category: Category object
-      element: <subcategory> DOM element
+      record: parsed <subcategory> element, see _ParseXML()
     """
-    self.__element = element
-    self.name = element.getAttribute("name")
+    (attributes, symbol_records) = record
+    self.name = attributes.get("name", "")
     self.category = category
-    self.in_proposal = _InProposal(element, category.in_proposal)
+    self.in_proposal = _InProposal(attributes, category.in_proposal)
+    self.__symbols = tuple([Symbol(self, symbol_record)
+                            for symbol_record in symbol_records])
 
   def GetSymbols(self):
     """Generator of Symbol objects."""
-    for element in self.__element.getElementsByTagName("e"):
-      yield Symbol(self, element)
+    return iter(self.__symbols)
 
 
 class Symbol(object):
   """An Emoji symbol and its data.
 
+  Symbol objects are immutable.
+  All of the symbol's data is decoded once, when the object is created,
+  so that the Get...() methods are simple attribute reads.
+
   Attributes:
     id: Symbol ID as defined by and used for the Unicode encoding proposal.
   """
-  __slots__ = "__element", "id", "subcategory", "in_proposal"
-
-  def __init__(self, subcategory, element):
+  __slots__ = ("id", "subcategory", "in_proposal", "_database",
+               "_proposed_uni", "_proposed_code_points",
+               "_arib", "_has_variation_sequence",
+               "_name", "_old_name", "_img_from", "_text_repr",
+               "_annotations", "_description", "_design", "_glyph_ref_id",
+               "_unicode_attribute", "_unicode", "_unicode_code_points",
+               "_prop", "_carrier_unicodes", "_carrier_codes",
+               "_carrier_code_points", "_text_fallback", "_digest")
+
+  # Slots with data decoded from the <e> element alone,
+  # which a reloaded database can copy from an unchanged symbol.
+  _DECODED_SLOTS = ("_name", "_old_name", "_img_from", "_text_repr",
+                    "_annotations", "_description", "_design",
+                    "_glyph_ref_id", "_unicode_attribute", "_unicode",
+                    "_unicode_code_points", "_prop", "_carrier_unicodes",
+                    "_carrier_codes", "_carrier_code_points",
+                    "_text_fallback", "_digest")
+
+  def __init__(self, subcategory, record):
     """Initialize from the Emoji4Unicode object and an <e> element.
 
     Do not instantiate directly: Use Emoji4Unicode.GetSymbols() or
     Subcategory.GetSymbols().
 
     Args:
-      element: <e> DOM element
+      record: parsed <e> element, see _ParseXML()
     """
-    self.__element = element
-    self.id = element.getAttribute("id")
-    self.subcategory = subcategory
-    self.in_proposal = _InProposal(element, subcategory.in_proposal)
+    (attributes, annotations, desc, design, digest) = record
+    init = super(Symbol, self).__setattr__
+    database = subcategory.category.database
+    init("id", attributes.get("id", ""))
+    init("subcategory", subcategory)
+    init("_database", database)
+    init("in_proposal", _InProposal(attributes, subcategory.in_proposal))
+    # Set by the database for symbols in the proposal.
+    init("_proposed_uni", u"")
+    init("_proposed_code_points", ())
+    # _arib and _has_variation_sequence are set on first use,
+    # for all symbols at once.
+    previous = database._PreviousSymbol(digest)
+    if previous:
+      # Reloading, and this <e> element has not changed.
+      for name in Symbol._DECODED_SLOTS: init(name, getattr(previous, name))
+      return
+    init("_digest", digest)
+    init("_name", attributes.get("name", ""))
+    init("_old_name", attributes.get("oldname", ""))
+    init("_img_from", attributes.get("img_from", ""))
+    init("_text_repr", attributes.get("text_repr", ""))
+    init("_annotations", tuple(annotations))
+    # We expect at most a single <desc> and a single <design> element
+    # with a text node.
+    if desc is None:
+      init("_description", "")
+    else:
+      init("_description", _ReduceWhitespace(desc))
+    if design is None:
+      init("_design", "")
+    else:
+      init("_design", _ReduceWhitespace(design))
+    glyph_ref_id = attributes.get("glyphRefID")
+    if glyph_ref_id:
+      init("_glyph_ref_id", int(glyph_ref_id))
+    else:
+      init("_glyph_ref_id", 0)
+    uni = attributes.get("unicode", "")
+    init("_unicode_attribute", uni)
+    if uni.startswith("+"):
+      uni = u""
+    elif uni.startswith("*"):
+      uni = uni[1:]
+    init("_unicode", uni)
+    init("_unicode_code_points", _CodePointsFromString(uni))
+    init("_prop", attributes.get("prop", ""))
+    # Per-carrier data, indexed like _CARRIERS.
+    carrier_unicodes = []
+    carrier_codes = []
+    carrier_code_points = []
+    for carrier in _CARRIERS:
+      carrier_uni = attributes.get(carrier, "")
+      carrier_unicodes.append(carrier_uni)
+      is_fallback = carrier_uni.startswith(">")
+      if is_fallback: carrier_uni = carrier_uni[1:]
+      if carrier_uni:
+        codes = tuple(carrier_uni.split("+"))
+      else:
+        codes = ()
+      carrier_codes.append((is_fallback, codes))
+      carrier_code_points.append(
+          (is_fallback, tuple([int(code, 16) for code in codes])))
+    init("_carrier_unicodes", tuple(carrier_unicodes))
+    init("_carrier_codes", tuple(carrier_codes))
+    init("_carrier_code_points", tuple(carrier_code_points))
+    init("_text_fallback", attributes.get("text_fallback", ""))
+
+  def __setattr__(self, name, value):
+    raise AttributeError("emoji4unicode.Symbol is immutable")
+
+  def __delattr__(self, name):
+    raise AttributeError("emoji4unicode.Symbol is immutable")
 
   def GetName(self):
     """Get the symbol's character name."""
-    return self.__element.getAttribute("name")
+    return self._name
 
   def GetOldName(self):
     """Get the symbol's previously proposed character name."""
-    return self.__element.getAttribute("oldname")
+    return self._old_name
 
   def ImageHTML(self):
     """Get the symbol's image HTML.
@@ -228,10 +911,9 @@ class Symbol(object):
       An HTML string for the symbol's image, or an empty string if
       there is none.
     """
-    img_from = self.__element.getAttribute("img_from")
+    img_from = self._img_from
     if img_from:
-      global all_carrier_data
-      from_carrier_data = all_carrier_data[img_from]
+      from_carrier_data = self._database.all_carrier_data[img_from]
       carrier_uni = self.GetCarrierUnicode(img_from)
       if carrier_uni.startswith(u'>'):
         sys.stderr.write((u"e-%s img_from='%s' does not have a roundtrip " +
@@ -239,7 +921,7 @@ class Symbol(object):
                          (self.id, img_from, carrier_uni))
       else:
         from_carrier_symbol = from_carrier_data.SymbolFromUnicode(carrier_uni)
-        return CarrierImageHTML(img_from, from_carrier_symbol)
+        return self._database.CarrierImageHTML(img_from, from_carrier_symbol)
     return ""
 
   def ImageFromWhichCarrier(self):
@@ -248,7 +930,7 @@ class Symbol(object):
     Returns:
       "docomo", "kddi", "softbank", "google" or an empty string.
     """
-    return self.__element.getAttribute("img_from")
+    return self._img_from
 
   def GetTextRepresentation(self):
     """Get this symbol's text representation.
@@ -256,7 +938,7 @@ class Symbol(object):
     Returns:
       The text representation string, or an empty string if there is none.
     """
-    return self.__element.getAttribute("text_repr")
+    return self._text_repr
 
   def GetAnnotations(self):
     """Get the symbol's annotation lines.
@@ -265,29 +947,18 @@ class Symbol(object):
     Unicode's NamesList.txt file.
 
     Returns:
-      A list of strings, one per annotation line.
-      The list may be empty.
+      A tuple of strings, one per annotation line.
+      The tuple may be empty.
     """
-    annotations = []
-    for element in self.__element.getElementsByTagName("ann"):
-      annotations.append(element.firstChild.nodeValue.strip())
-    return annotations
+    return self._annotations
 
   def GetDescription(self):
     """Get the description text (may be empty)."""
-    desc = self.__element.getElementsByTagName("desc")
-    if desc:
-      # We expect at most a single <desc> element with a text node.
-      return _ReduceWhitespace(desc[0].firstChild.nodeValue)
-    return ""
+    return self._description
 
   def GetDesign(self):
     """Get the font design instructions text (may be empty)."""
-    design = self.__element.getElementsByTagName("design")
-    if design:
-      # We expect at most a single <design> element with a text node.
-      return _ReduceWhitespace(design[0].firstChild.nodeValue)
-    return ""
+    return self._design
 
   def GetGlyphRefID(self):
     """Get the font glyphRefID for this Emoji symbol.
@@ -295,11 +966,7 @@ class Symbol(object):
     Returns:
       The font glyphRefID integer, or 0 if there is none.
     """
-    glyphRefID = self.__element.getAttribute("glyphRefID")
-    if glyphRefID:
-      return int(glyphRefID)
-    else:
-      return 0
+    return self._glyph_ref_id
 
   def GetFontUnicode(self):
     """Get the font Unicode code point for this Emoji symbol.
@@ -317,18 +984,40 @@ class Symbol(object):
       or an empty string if this symbol has not been unified with an existing
       character.
     """
-    uni = self.__element.getAttribute("unicode")
-    if uni.startswith("+"): return u""
-    if uni.startswith("*"): uni = uni[1:]
-    return uni
+    return self._unicode
+
+  def GetUnicodeCodePoints(self):
+    """Get the Unicode code points with which this symbol is unified.
+
+    Returns:
+      A tuple of code point integers, or an empty tuple if this symbol
+      has not been unified with an existing character.
+    """
+    return self._unicode_code_points
 
   def UnicodeHasVariationSequence(self):
     """Does the Unicode representation have a variation selector sequence?"""
     # Get the standard Unicode code point or sequence.
-    uni = self.GetUnicode()
-    if not uni: return False
-    first = int(uni.split("+")[0], 16)  # The first Unicode code point.
-    return first in standardized_variants.GetSetOfUnicodeWithEmojiVS()
+    code_points = self._unicode_code_points
+    if not code_points: return False
+    try:
+      return self._has_variation_sequence
+    except AttributeError:
+      self._database._SetSymbolVariationSequenceFlags()
+      return self._has_variation_sequence
+
+  def _SetHasVariationSequence(self, emoji_vs_code_points):
+    """Internal: Set the UnicodeHasVariationSequence() flag.
+
+    Args:
+      emoji_vs_code_points: The set of code points with Emoji
+        variation selector sequences.
+    """
+    # Check the first Unicode code point.
+    code_points = self._unicode_code_points
+    super(Symbol, self).__setattr__(
+        "_has_variation_sequence",
+        bool(code_points) and code_points[0] in emoji_vs_code_points)
 
   def IsUnifiedWithUpcomingCharacter(self):
     """Is this symbol unified with an upcoming character?
@@ -339,7 +1028,7 @@ class Symbol(object):
     Returns:
       True if the unified code point is for an upcoming character.
     """
-    return self.__element.getAttribute("unicode").startswith("*")
+    return self._unicode_attribute.startswith("*")
 
   def GetProposedUnicode(self):
     """Get the proposed Unicode code point or sequence for this new symbol.
@@ -348,9 +1037,16 @@ class Symbol(object):
       A string with one or more 4..6-hex-digit code points with "+" separators,
       or an empty string if this symbol has no proposed code point or sequence.
     """
-    uni = _id_to_proposed_uni.get(self.id)
-    if uni: return uni
-    return u""
+    return self._proposed_uni
+
+  def GetProposedUnicodeCodePoints(self):
+    """Get the proposed Unicode code points for this new symbol.
+
+    Returns:
+      A tuple of code point integers, or an empty tuple if this symbol
+      has no proposed code point or sequence.
+    """
+    return self._proposed_code_points
 
   def GetProposedProperties(self):
     """Get the proposed Unicode character properties for this new symbol.
@@ -359,30 +1055,45 @@ class Symbol(object):
       A string with semicolon-separated prop=value pairs,
       or an empty string if no special properties are proposed.
     """
-    return self.__element.getAttribute("prop")
+    return self._prop
+
+  def _SetProposedUnicode(self, prev_proposed_code_point, prev_high_code_point):
+    """Internal: Set the proposed Unicode code point or sequence.
+
+    Args:
+      prev_proposed_code_point: The previous symbol's proposed code point
+        integer (the last one of a sequence).
+      prev_high_code_point: The last proposed code point integer
+        in the _HIGH_UNI.._MAX_HIGH_UNI range.
 
-  def _SetProposedUnicode(self, prev_proposed_uni, prev_high_uni):
-    """Internal: Set the proposed Unicode code point or sequence."""
-    uni = self.__element.getAttribute("unicode")
+    Returns:
+      The pair of the new prev_proposed_code_point and prev_high_code_point.
+    """
+    uni = self._unicode_attribute
     if uni == u"+":
       # Continue after the previous high Unicode code point.
       # (Does not work for code point sequences.)
-      proposed_uni = "%04X" % (int(prev_high_uni, 16) + 1)
+      code_points = (prev_high_code_point + 1,)
+      proposed_uni = "%04X" % code_points[0]
     elif uni.startswith(u"+"):
       proposed_uni = uni[1:]
+      code_points = _CodePointsFromString(proposed_uni)
     elif uni:
       # Unified with another character.
       # Do not set a proposed code point.
-      return (prev_proposed_uni, prev_high_uni)
+      return (prev_proposed_code_point, prev_high_code_point)
     else:
       # Increment the proposed Unicode code point.
       # (Does not work for code point sequences.)
-      proposed_uni = "%04X" % (int(prev_proposed_uni, 16) + 1)
-    _id_to_proposed_uni[self.id] = proposed_uni
-    if (not u"+" in proposed_uni and
-        _HIGH_UNI <= int(proposed_uni, 16) <= _MAX_HIGH_UNI):
-      prev_high_uni = proposed_uni
-    return (proposed_uni, prev_high_uni)
+      code_points = (prev_proposed_code_point + 1,)
+      proposed_uni = "%04X" % code_points[0]
+    init = super(Symbol, self).__setattr__
+    init("_proposed_uni", proposed_uni)
+    init("_proposed_code_points", code_points)
+    if (len(code_points) == 1 and
+        _HIGH_UNI <= code_points[0] <= _MAX_HIGH_UNI):
+      prev_high_code_point = code_points[0]
+    return (code_points[-1], prev_high_code_point)
 
   def GetARIB(self):
     """Get the code of the ARIB symbol corresponding to this Emoji symbol.
@@ -391,14 +1102,24 @@ class Symbol(object):
       The ARIB code as a 4-decimal-digit string,
       or None if there is no corresponding ARIB symbol.
     """
-    uni = self.GetUnicode()
-    if uni:
-      global arib_ucm
-      arib = arib_ucm.from_unicode.get(uni)
-      if arib:
-        return row_cell.FromShiftJisString(arib).ToDecimalString()
-      else:
-        return None
+    try:
+      return self._arib
+    except AttributeError:
+      self._database._SetSymbolARIBCodes()
+      return self._arib
+
+  def _SetARIB(self, arib_from_unicode):
+    """Internal: Set the GetARIB() value.
+
+    Args:
+      arib_from_unicode: ucm.UCMFile.from_unicode of the ARIB mapping table
+    """
+    arib = None
+    if self._unicode:
+      shift_jis = arib_from_unicode.get(self._unicode)
+      if shift_jis:
+        arib = row_cell.FromShiftJisString(shift_jis).ToDecimalString()
+    super(Symbol, self).__setattr__("_arib", arib)
 
   def GetCarrierUnicode(self, carrier):
     """Get the carrier's Unicode PUA code point for this Emoji symbol.
@@ -409,10 +1130,26 @@ class Symbol(object):
       The string may contain a '>' prefix for a fallback (one-way) mapping,
       in which case it may contain multiple codes separated by '+'.
     """
-    global carriers
-    if carrier not in carriers:
-      raise ValueError("unknown carrier \"%s\"" % carrier)
-    return self.__element.getAttribute(carrier)
+    return self._carrier_unicodes[_CarrierIndex(carrier)]
+
+  def GetCarrierCodes(self, carrier):
+    """Get the carrier's Unicode PUA code points for this Emoji symbol.
+
+    Returns:
+      A pair (is_fallback, codes) where is_fallback is True for a fallback
+      (one-way) mapping, and codes is a tuple of 4..6-hex-digit strings.
+      The tuple is empty if there is no mapping.
+    """
+    return self._carrier_codes[_CarrierIndex(carrier)]
+
+  def GetCarrierCodePoints(self, carrier):
+    """Get the carrier's Unicode PUA code points for this Emoji symbol.
+
+    Returns:
+      A pair (is_fallback, code_points) like GetCarrierCodes() but
+      with a tuple of code point integers.
+    """
+    return self._carrier_code_points[_CarrierIndex(carrier)]
 
   def GetTextFallback(self):
     """Get the text fallback for this Emoji symbol.
@@ -420,10 +1157,92 @@ class Symbol(object):
     Returns:
       The text fallback string,or an empty string if there is none.
     """
-    return self.__element.getAttribute("text_fallback")
+    return self._text_fallback
+
 
+def _ParseXML(contents):
+  """Parse the contents of emoji4unicode.xml.
 
-def _InProposal(element, parent_in_proposal):
+  Streams through the XML with expat and builds the records directly,
+  without a DOM.
+  The result contains only builtin types so that it can be cached by the
+  snapshot module.
+
+  Returns:
+    A list of category records.
+    A category record is a pair of the <category> attributes dictionary and
+    a list of subcategory records.
+    A subcategory record is a pair of the <subcategory> attributes dictionary
+    and a list of symbol records.
+    A symbol record is a 5-tuple of the <e> attributes dictionary,
+    the list of stripped <ann> texts,
+    the <desc> and <design> texts (None if there is no such element),
+    and a digest string of the other four values.
+  """
+  handler = _XMLHandler()
+  parser = xml.parsers.expat.ParserCreate()
+  parser.buffer_text = True
+  parser.StartElementHandler = handler.StartElement
+  parser.EndElementHandler = handler.EndElement
+  parser.CharacterDataHandler = handler.CharacterData
+  parser.Parse(contents, True)
+  return handler.category_records
+
+
+class _XMLHandler(object):
+  """expat callbacks for _ParseXML()."""
+  def __init__(self):
+    self.category_records = []
+    self.__subcategory_records = None
+    self.__symbol_records = None
+    self.__symbol_attributes = None
+    self.__annotations = None
+    self.__texts = None  # Map from "desc"/"design" to the element text.
+    self.__text = None  # List of text pieces inside <ann>/<desc>/<design>.
+
+  def StartElement(self, name, attributes):
+    if name == "e":
+      self.__symbol_attributes = attributes
+      self.__annotations = []
+      self.__texts = {}
+    elif name == "ann" or name == "desc" or name == "design":
+      self.__text = []
+    elif name == "subcategory":
+      self.__symbol_records = []
+      self.__subcategory_records.append((attributes, self.__symbol_records))
+    elif name == "category":
+      self.__subcategory_records = []
+      self.category_records.append((attributes, self.__subcategory_records))
+
+  def EndElement(self, name):
+    if name == "e":
+      record = (self.__symbol_attributes, self.__annotations,
+                self.__texts.get("desc"), self.__texts.get("design"))
+      # Reload() compares digests to find unchanged <e> elements.
+      digest = hashlib.md5(marshal.dumps(
+          (sorted(record[0].items()),) + record[1:])).digest()
+      self.__symbol_records.append(record + (digest,))
+    elif name == "ann":
+      self.__annotations.append(u"".join(self.__text).strip())
+      self.__text = None
+    elif name == "desc" or name == "design":
+      # We expect at most a single <desc> and a single <design> element.
+      if name not in self.__texts: self.__texts[name] = u"".join(self.__text)
+      self.__text = None
+
+  def CharacterData(self, data):
+    if self.__text is not None: self.__text.append(data)
+
+
+def _CarrierIndex(carrier):
+  """Returns the index of the carrier in _CARRIERS."""
+  try:
+    return _CARRIER_INDEXES[carrier]
+  except KeyError:
+    raise ValueError("unknown carrier \"%s\"" % carrier)
+
+
+def _InProposal(attributes, parent_in_proposal):
   """Determine if a (sub)category or symbol is in the Unicode proposal.
 
   If the element node has an in_proposal attribute of "yes" or "no",
@@ -431,13 +1250,13 @@ def _InProposal(element, parent_in_proposal):
   Otherwise inherit the value from the parent.
 
   Args:
-    element: XML element for the (sub)category or symbol node
+    attributes: XML attributes for the (sub)category or symbol node
     parent_in_proposal: the parent's in_proposal value
 
   Returns:
     The resulting in_proposal value for this node
   """
-  in_proposal_string = element.getAttribute("in_proposal")
+  in_proposal_string = attributes.get("in_proposal")
   if in_proposal_string:
     if in_proposal_string == "yes":
       in_proposal = True
@@ -460,32 +1279,16 @@ def _ReduceWhitespace(s):
 def CarrierImageHTML(carrier, symbol):
   """Get the carrier's image HTML for the symbol.
 
-  Args:
-    carrier: Name of a carrier.
-    symbol: The carrier_data.Symbol instance.
-
-  Returns:
-    An HTML string for the symbol's image, or an empty string if
-    there is none.
+  See Emoji4UnicodeDatabase.CarrierImageHTML().
   """
-  if carrier == "kddi" and symbol.uni in _kddi_to_google:
-    # Use images hosted by Google rather than another non-KDDI site.
-    google_uni = _kddi_to_google[symbol.uni]
-    if google_uni and not google_uni.startswith(">"):
-      return ("<img src=http://mail.google.com/mail/e/ezweb_ne_jp/%s>" %
-              google_uni[-3:])
-  return symbol.ImageHTML()
+  return _default_database.CarrierImageHTML(carrier, symbol)
 
 
 
-# The Writer class escapes characters that are neither Latin-1 nor Japanese.
+# Write() escapes characters that are neither Latin-1 nor Japanese.
 _escape_re = re.compile(u"[^\0-\u007E\u00A1-\u00FF" +
                         u"\u3040-\u30FF\u4E00-\u9FFF\uFF01-\uFFEE]+")
 
-# The head of an element with text contents but no attributes,
-# like <ann>, <desc> or <design>.
-_simple_element_head_re = re.compile(u"<([a-zA-Z0-9_]+)>")
-
 def _EscapeChars(match):
   s = match.group(0)
   result = []
@@ -496,74 +1299,200 @@ def _EscapeChars(match):
   return "".join(result)
 
 
-class _Writer(object):
-  """Minimizes emoji4unicode.xml changes when used in writexml()."""
-  def __init__(self, filename):
-    self.__out_file = codecs.open(filename, "w", "UTF-8")
-    self.__line = u""
-
-  def close(self):
-    self._WriteLine(self.__line)
-    self.__out_file.close()
-
-  def write(self, s):
-    # Append the new piece to the current line.
-    if self.__line: s = self.__line + s
-    # Keep a simple element with single-line text contents on one line.
-    if s.endswith(u"\n"):
-      head_match = _simple_element_head_re.match(s)
-      if head_match:
-        if len(s) == head_match.end() + 1:
-          # s == head + "\n"
-          s = head_match.group()  # Remove the trailing \n.
-        elif s[head_match.end()] == u"<":
-          # The element contains another element: Split the lines.
-          self._WriteLine(head_match.group())
-          s = s[head_match.end():]
-        else:
-          tail = u"</" + head_match.group(1) + u">\n"
-          if s.endswith(tail):
-            text = s[head_match.end():-len(tail)].strip()
-            if u"\n" in text:
-              # The element has multi-line contents: Split the lines.
-              self._WriteLine(head_match.group())
-              self._WriteLine(text)
-              self._WriteLine(tail[:-1])  # Remove the trailing \n.
-              s = u""
-          else:
-            text = s[head_match.end():].strip()
-            if u"\n" in text:
-              # The element has multi-line contents: Split the lines.
-              self._WriteLine(head_match.group())
-              self._WriteLine(text)
-              s = u""
-            else:
-              s = head_match.group() + text  # Strip the contents.
-    # Look for line ending.
-    # Look for only one, to not remove empty lines inside a multi-line value.
-    eol_index = s.rfind("\n")
-    if eol_index >= 0:
-      self.__line = s[eol_index + 1:]
-      self._WriteLine(s[:eol_index].strip())
+def _EscapeXML(s):
+  """Escapes markup characters in text and attribute values like minidom."""
+  return s.replace(u"&", u"&amp;").replace(u"<", u"&lt;").replace(
+      u"\"", u"&quot;").replace(u">", u"&gt;")
+
+
+def _FormatLine(line):
+  """Changes the escaping in lines other than <e> start tags.
+
+  In particular, keeps unescaped text in <e text_fallback="...">.
+  """
+  if line.startswith(u"<e "): return line
+  # Turn &quot; into real " for better readability.
+  line = line.replace(u"&quot;", u'"')
+  # Escape non-Latin-1, non-Japanese characters.
+  return _escape_re.sub(_EscapeChars, line)
+
+
+class Element(object):
+  """An element of an XML document read by ReadDocument().
+
+  Scripts edit the attributes and children directly.
+
+  Attributes:
+    name: Element name string.
+    attributes: Map from attribute name to value string.
+    children: List of child nodes: Element objects, text strings
+      and Comment objects.
+  """
+  def __init__(self, name, attributes=None, children=None):
+    self.name = name
+    if attributes is None: attributes = {}
+    self.attributes = attributes
+    if children is None: children = []
+    self.children = children
+
+  def GetElements(self, name):
+    """Generator of the descendant elements with the name, in order."""
+    for child in self.children:
+      if isinstance(child, Element):
+        if child.name == name: yield child
+        for element in child.GetElements(name): yield element
+
+  def GetText(self):
+    """Returns the concatenated text of the element's text children."""
+    return u"".join([child for child in self.children
+                     if isinstance(child, basestring)])
+
+
+class Comment(object):
+  """A comment in an XML document read by ReadDocument().
+
+  Attributes:
+    data: The comment text between <!-- and -->.
+  """
+  def __init__(self, data):
+    self.data = data
+
+
+class Document(object):
+  """An XML document read by ReadDocument().
+
+  Attributes:
+    children: List of the top-level nodes: Comment objects
+      and the root Element.
+  """
+  def __init__(self):
+    self.children = []
+
+  @property
+  def root(self):
+    """The root Element."""
+    for child in self.children:
+      if isinstance(child, Element): return child
+
+
+def ReadDocument(filename):
+  """Reads an XML document like emoji4unicode.xml into an editable tree.
+
+  Keeps the elements, attributes, text and comments, for Write().
+
+  Args:
+    filename: Path/filename of the XML file
+
+  Returns:
+    A Document object.
+  """
+  in_file = open(filename, "rb")
+  try:
+    contents = in_file.read()
+  finally:
+    in_file.close()
+  document = Document()
+  stack = [document]
+  def StartElement(name, attributes):
+    element = Element(name, attributes)
+    stack[-1].children.append(element)
+    stack.append(element)
+  def EndElement(name):
+    stack.pop()
+  def CharacterData(data):
+    children = stack[-1].children
+    if children and isinstance(children[-1], basestring):
+      children[-1] += data
+    elif len(stack) > 1:  # Ignore whitespace outside of the root element.
+      children.append(data)
+  def CommentHandler(data):
+    stack[-1].children.append(Comment(data))
+  parser = xml.parsers.expat.ParserCreate()
+  parser.buffer_text = True
+  parser.StartElementHandler = StartElement
+  parser.EndElementHandler = EndElement
+  parser.CharacterDataHandler = CharacterData
+  parser.CommentHandler = CommentHandler
+  parser.Parse(contents, True)
+  return document
+
+
+def _TextElementLines(head, tail, text, has_attributes):
+  """Returns the lines for an element whose only child is text.
+
+  Keeps single-line text on the element's line.
+  Multi-line text of an element without attributes, like <desc>,
+  goes on lines of its own if it starts or ends with a line break.
+  Otherwise the start tag and end tag stay on the first and last lines
+  of the text.
+
+  Args:
+    head: The start tag.
+    tail: The end tag.
+    text: The escaped text contents.
+    has_attributes: True if the start tag has attributes.
+  """
+  if u"\n" not in text: return [head + text + tail]
+  if not has_attributes and text.endswith(u"\n"):
+    stripped = text.strip()
+    if not stripped: return [head, tail]
+    if u"\n" in stripped: return [head, stripped, tail]
+    return [head + stripped + tail]
+  last_line_start = text.rfind(u"\n") + 1
+  return [(head + text[:last_line_start]).rstrip(),
+          (text[last_line_start:] + tail).strip()]
+
+
+def _NodeLines(node):
+  """Yields the unformatted lines for a document node and its descendants.
+
+  The layout minimizes emoji4unicode.xml changes:
+  Each start tag, end tag and comment is on its own line without indentation,
+  and whitespace-only text between elements is dropped.
+  An element with only text contents is on one line, unless the text
+  spans multiple lines, see _TextElementLines().
+  """
+  if isinstance(node, Element):
+    attributes = node.attributes
+    head = [u"<", node.name]
+    for name in sorted(attributes.keys()):
+      head.extend((u" ", name, u'="', _EscapeXML(attributes[name]), u'"'))
+    head = u"".join(head)
+    children = node.children
+    if not children:
+      yield head + u"/>"
+    elif len(children) == 1 and isinstance(children[0], basestring):
+      for line in _TextElementLines(head + u">", u"</%s>" % node.name,
+                                    _EscapeXML(children[0]),
+                                    bool(attributes)):
+        yield line
     else:
-      self.__line = s
-
-  def _WriteLine(self, line):
-    # Skip empty lines.
-    if line:
-      # Change escaping in elements other than <e>.
-      # (In particular, keep unescaped text in <e text_fallback="...">.)
-      if not line.startswith(u"<e "):
-        # Turn &quot; into real " for better readability.
-        line = line.replace(u"&quot;", u'"')
-        # Escape non-Latin-1, non-Japanese characters.
-        line = _escape_re.sub(_EscapeChars, line)
-      self.__out_file.write(line)
-      self.__out_file.write(u"\n")
-
-
-def Write(doc, filename):
-  """Writes an XML document in the style of emoji4unicode.xml."""
-  writer = _Writer(filename)
-  doc.writexml(writer, encoding="UTF-8", newl="\n")
-  writer.close()
+      yield head + u">"
+      for child in children:
+        for line in _NodeLines(child): yield line
+      yield u"</%s>" % node.name
+  elif isinstance(node, basestring):
+    text = _EscapeXML(node).strip()
+    if text: yield text
+  elif isinstance(node, Comment):
+    yield u"<!--%s-->" % node.data
+  else:
+    yield u'<?xml version="1.0" encoding="UTF-8"?>'
+    for child in node.children:
+      for line in _NodeLines(child): yield line
+
+
+def Write(document, filename):
+  """Writes an XML document in the style of emoji4unicode.xml.
+
+  Args:
+    document: Document object, for example from ReadDocument()
+    filename: Path/filename of the output file
+  """
+  out_file = open(filename, "wb")
+  try:
+    for line in _NodeLines(document):
+      out_file.write(_FormatLine(line).encode("UTF-8"))
+      out_file.write("\n")
+  finally:
+    out_file.close()
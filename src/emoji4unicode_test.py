@@ -16,12 +16,47 @@
 
 __author__ = "Markus Scherer"
 
+import codecs
+import os
 import os.path
 import re
+import shutil
+import tempfile
 import unittest
+import xml.dom.minidom
 import emoji4unicode
+import snapshot
 import ucm
 
+def MakeDataFolder(edit_xml):
+  """Make a temporary data folder with a modified copy of emoji4unicode.xml.
+
+  Args:
+    edit_xml: Function which takes the contents of emoji4unicode.xml
+      and returns the modified contents.
+
+  Returns:
+    The path of the new folder. The caller removes it.
+  """
+  here = os.path.dirname(__file__)
+  data_root = os.path.join(here, "..", "data")
+  temp_dir = tempfile.mkdtemp()
+  for name in ("arib", "docomo", "kddi", "softbank"):
+    shutil.copytree(os.path.join(data_root, name),
+                    os.path.join(temp_dir, name))
+  shutil.copy(os.path.join(data_root, "carriers.xml"), temp_dir)
+  os.mkdir(os.path.join(temp_dir, "unicode"))
+  shutil.copy(os.path.join(data_root, "unicode", "StandardizedVariants.txt"),
+              os.path.join(temp_dir, "unicode"))
+  e4u_file = open(os.path.join(data_root, "emoji4unicode.xml"), "rb")
+  contents = e4u_file.read()
+  e4u_file.close()
+  e4u_file = open(os.path.join(temp_dir, "emoji4unicode.xml"), "wb")
+  e4u_file.write(edit_xml(contents))
+  e4u_file.close()
+  return temp_dir
+
+
 class Emoji4UnicodeTest(unittest.TestCase):
   def setUp(self):
     emoji4unicode.Load()
@@ -111,6 +146,457 @@ class Emoji4UnicodeTest(unittest.TestCase):
     self.assert_(glyph_ids == full_set,
                  "Missing glyph IDs: %s" % (full_set - glyph_ids))
 
+  def testSymbolFields(self):
+    """Verify the data decoded into a Symbol."""
+    symbol = emoji4unicode.id_to_symbol["000"]
+    self.assertEqual(symbol.GetName(), "BLACK SUN WITH RAYS")
+    self.assertEqual(symbol.GetUnicode(), "2600")
+    self.assertEqual(symbol.GetDescription(),
+                     "clear weather for Japanese mobile carriers, "
+                     "usually in red color")
+    self.assertEqual(symbol.GetAnnotations(), ())
+    self.assertEqual(symbol.GetCarrierUnicode("docomo"), "E63E")
+    self.assertEqual(symbol.GetCarrierCodes("docomo"), (False, ("E63E",)))
+    symbol = emoji4unicode.id_to_symbol["005"]
+    self.assertEqual(symbol.GetUnicode(), "")
+    self.assertEqual(symbol.GetGlyphRefID(), 4)
+    self.assertEqual(symbol.GetAnnotations(), ("= typhoon, hurricane",))
+    symbol = emoji4unicode.id_to_symbol["009"]
+    self.assertEqual(symbol.GetCarrierUnicode("docomo"), ">E63E")
+    self.assertEqual(symbol.GetCarrierCodes("docomo"), (True, ("E63E",)))
+    self.assertEqual(emoji4unicode.id_to_symbol["006"].GetCarrierCodes(
+                         "softbank"), (False, ()))
+    self.assertRaises(ValueError, symbol.GetCarrierUnicode, "willcom")
+    self.assertRaises(AttributeError, setattr, symbol, "id", "FFF")
+
+  def testCodePoints(self):
+    """Verify that the code point tuples match the code point strings."""
+    symbol = emoji4unicode.id_to_symbol["000"]
+    self.assertEqual(symbol.GetUnicodeCodePoints(), (0x2600,))
+    self.assertEqual(symbol.GetProposedUnicodeCodePoints(), ())
+    self.assertEqual(symbol.GetCarrierCodePoints("docomo"), (False, (0xE63E,)))
+    symbol = emoji4unicode.id_to_symbol["005"]
+    self.assertEqual(symbol.GetUnicodeCodePoints(), ())
+    self.assertEqual(symbol.GetProposedUnicodeCodePoints(), (0x1F300,))
+    self.assert_(emoji4unicode.SymbolFromUnicodeCodePoints((0x1F300,))
+                 is symbol)
+    def ToString(code_points):
+      return "+".join(["%04X" % code_point for code_point in code_points])
+    for symbol in emoji4unicode.GetSymbols():
+      self.assertEqual(ToString(symbol.GetUnicodeCodePoints()),
+                       symbol.GetUnicode())
+      self.assertEqual(ToString(symbol.GetProposedUnicodeCodePoints()),
+                       symbol.GetProposedUnicode())
+      for carrier in emoji4unicode.carriers:
+        (is_fallback, code_points) = symbol.GetCarrierCodePoints(carrier)
+        self.assertEqual((is_fallback, ToString(code_points)),
+                         (symbol.GetCarrierCodes(carrier)[0],
+                          "+".join(symbol.GetCarrierCodes(carrier)[1])))
+
+  def testSortedViews(self):
+    """Verify the cached sorted and grouped views."""
+    view = emoji4unicode.GetSymbolsSortedByUnicode()
+    self.assert_(isinstance(view, tuple))
+    self.assert_(emoji4unicode.GetSymbolsSortedByUnicode() is view)
+    self.assertEqual(len(view), len(emoji4unicode.id_to_symbol))
+    keys = [code_points for (code_points, symbol) in view]
+    self.assertEqual(keys, sorted(keys))
+    view = emoji4unicode.GetSymbolsInProposalSortedByUnicode()
+    self.assert_(emoji4unicode.GetSymbolsInProposalSortedByUnicode() is view)
+    for (code_points, symbol) in view:
+      self.assert_(symbol.in_proposal)
+    # DoCoMo E63E: round-trip mapping from e-000 first, then fallbacks.
+    view = emoji4unicode.GetSymbolsSortedByCarrierUnicode("docomo")
+    self.assert_(emoji4unicode.GetSymbolsSortedByCarrierUnicode("docomo")
+                 is view)
+    self.assertEqual(view[0][0], (0xE63E,))
+    self.assertEqual(view[0][1].id, "000")
+    self.assertEqual(view[1][0], (0xE63E,))
+    self.assertEqual(view[1][1].GetCarrierCodes("docomo")[0], True)
+    groups = emoji4unicode.GetSymbolsGroupedBySubcategory()
+    symbols = []
+    for (subcategory, subcategory_symbols) in groups:
+      for symbol in subcategory_symbols:
+        self.assert_(symbol.subcategory is subcategory)
+      symbols.extend(subcategory_symbols)
+    self.assertEqual(symbols, list(emoji4unicode.GetSymbols()))
+
+  def testSymbolIdentity(self):
+    """Verify that the symbol tree is built once."""
+    symbols = list(emoji4unicode.GetSymbols())
+    self.assertEqual(len(symbols), len(emoji4unicode.id_to_symbol))
+    for (symbol, again) in zip(symbols, emoji4unicode.GetSymbols()):
+      self.assert_(symbol is again)
+      self.assert_(emoji4unicode.id_to_symbol[symbol.id] is symbol)
+    categories = list(emoji4unicode.GetCategories())
+    for (category, again) in zip(categories, emoji4unicode.GetCategories()):
+      self.assert_(category is again)
+
+  def testReverseLookups(self):
+    """Verify the reverse lookup indexes."""
+    cloud = emoji4unicode.id_to_symbol["001"]
+    self.assert_(emoji4unicode.SymbolFromCarrierUnicode("docomo", "E63F")
+                 is cloud)
+    self.assert_(emoji4unicode.SymbolFromCarrierUnicode("google", "FE001")
+                 is cloud)
+    self.assert_(emoji4unicode.SymbolFromUnicode("2601") is cloud)
+    self.assert_(emoji4unicode.SymbolFromName("CLOUD") is cloud)
+    cyclone = emoji4unicode.id_to_symbol["005"]
+    self.assert_(emoji4unicode.SymbolFromGlyphRefID(4) is cyclone)
+    self.assert_(emoji4unicode.SymbolFromUnicode("1F300") is cyclone)
+    # DoCoMo E63E has a round-trip mapping with e-000 and
+    # fallback mappings from e-009 and others.
+    self.assertEqual(
+        emoji4unicode.SymbolFromCarrierUnicode("docomo", "E63E").id, "000")
+    fallbacks = emoji4unicode.SymbolsWithCarrierFallback("docomo", "E63E")
+    self.assert_(emoji4unicode.id_to_symbol["009"] in fallbacks)
+    self.failIf(emoji4unicode.id_to_symbol["000"] in fallbacks)
+    self.assertEqual(emoji4unicode.SymbolFromCarrierUnicode("docomo", "0041"),
+                     None)
+    self.assertEqual(emoji4unicode.SymbolsWithCarrierFallback("kddi", "0041"),
+                     ())
+    self.assertEqual(emoji4unicode.SymbolFromName("NO SUCH NAME"), None)
+    self.assertRaises(ValueError,
+                      emoji4unicode.SymbolFromCarrierUnicode, "willcom", "E63E")
+    # Every round-trip mapping finds its symbol.
+    for symbol in emoji4unicode.GetSymbols():
+      for carrier in emoji4unicode.carriers:
+        (is_fallback, codes) = symbol.GetCarrierCodes(carrier)
+        if codes and not is_fallback:
+          self.assert_(emoji4unicode.SymbolFromCarrierUnicode(
+                           carrier, "+".join(codes)) is symbol)
+
+
+  def testCarrierConversion(self):
+    Convert = emoji4unicode.ConvertCarrierUnicode
+    self.assertEqual(Convert("docomo", "softbank", "E63E"),
+                     (False, ("E04A",), ""))
+    # SoftBank E04D (e-009) has only a fallback mapping to DoCoMo.
+    self.assertEqual(Convert("softbank", "docomo", "E04D"),
+                     (True, ("E63E",), ""))
+    # e-00F has a fallback mapping to a SoftBank sequence.
+    self.assertEqual(Convert("kddi", "softbank", "E48E"),
+                     (True, ("E04A", "E049"), ""))
+    # e-006 FOGGY has no SoftBank mapping.
+    self.assertEqual(Convert("docomo", "softbank", "E644"),
+                     (True, (), u"[\u9727]"))
+    self.assertEqual(Convert("docomo", "google", "0041"), None)
+    self.assertRaises(ValueError, Convert, "docomo", "willcom", "E63E")
+    # The tables agree with resolving via the symbols.
+    for source in emoji4unicode.carriers:
+      for target in emoji4unicode.carriers:
+        table = emoji4unicode.GetCarrierConversionTable(source, target)
+        for (code, conversion) in table.iteritems():
+          symbol = emoji4unicode.SymbolFromCarrierUnicode(source, code)
+          (is_fallback, codes) = symbol.GetCarrierCodes(target)
+          if codes:
+            self.assertEqual(conversion, (is_fallback, codes, ""))
+          else:
+            self.assertEqual(conversion,
+                             (True, (), symbol.GetTextFallback()))
+
+
+class Emoji4UnicodeDatabaseTest(unittest.TestCase):
+  def setUp(self):
+    self.__temp_dir = MakeDataFolder(
+        lambda contents: contents.replace('name="CLOUD"', 'name="RAIN CLOUD"'))
+    # Do not leave snapshots of the temporary files in the real cache.
+    self.__saved_cache_dir = snapshot.GetCacheDirectory()
+    snapshot.SetCacheDirectory(os.path.join(self.__temp_dir, "cache"))
+
+  def tearDown(self):
+    snapshot.SetCacheDirectory(self.__saved_cache_dir)
+    shutil.rmtree(self.__temp_dir)
+
+  def testSideBySide(self):
+    emoji4unicode.Load()
+    default_database = emoji4unicode.GetDefaultDatabase()
+    database = emoji4unicode.Emoji4UnicodeDatabase(self.__temp_dir)
+    self.assertEqual(default_database.id_to_symbol["001"].GetName(), "CLOUD")
+    self.assertEqual(database.id_to_symbol["001"].GetName(), "RAIN CLOUD")
+    self.assertEqual(database.SymbolFromName("RAIN CLOUD").id, "001")
+    self.assertEqual(database.SymbolFromName("CLOUD"), None)
+    self.assertEqual(emoji4unicode.SymbolFromName("CLOUD").id, "001")
+    self.assert_(emoji4unicode.GetSymbols().next() is
+                 default_database.GetSymbols().next())
+    # Symbols use the data of their own database.
+    self.assertEqual(database.id_to_symbol["005"].GetProposedUnicode(),
+                     default_database.id_to_symbol["005"].GetProposedUnicode())
+    self.assert_(database.id_to_symbol["000"].UnicodeHasVariationSequence())
+
+  def testLazyQuery(self):
+    # The query loads the variation sequence data on first use.
+    os.remove(os.path.join(self.__temp_dir, "unicode",
+                           "StandardizedVariants.txt"))
+    query = emoji4unicode.Emoji4UnicodeDatabase(self.__temp_dir).GetQuery()
+    self.assert_(query.new)
+    self.assertRaises(IOError, lambda: query.has_variation_sequence)
+
+  def testLazyLoading(self):
+    # Data files are read only when they are needed.
+    shutil.rmtree(os.path.join(self.__temp_dir, "kddi"))
+    os.remove(os.path.join(self.__temp_dir, "arib", "arib.ucm"))
+    database = emoji4unicode.Emoji4UnicodeDatabase(self.__temp_dir)
+    symbol = database.SymbolFromName("RAIN CLOUD")
+    self.assertEqual(symbol.GetCarrierUnicode("kddi"), "E48D")
+    self.assert_(symbol.UnicodeHasVariationSequence())
+    self.assertEqual(database.all_carrier_data["docomo"].
+                     SymbolFromUnicode("E63F").uni, "E63F")
+    self.assertRaises(IOError, lambda: database.all_carrier_data["kddi"])
+    self.assertRaises(IOError, symbol.GetARIB)
+
+  def testLoadAll(self):
+    # After LoadAll(), no more data files are read.
+    database = emoji4unicode.Emoji4UnicodeDatabase(self.__temp_dir)
+    database.LoadAll()
+    for name in ("arib", "docomo", "kddi", "softbank", "unicode"):
+      shutil.rmtree(os.path.join(self.__temp_dir, name))
+    symbol = database.SymbolFromName("RAIN CLOUD")
+    self.assert_(symbol.UnicodeHasVariationSequence())
+    self.assertEqual(symbol.GetARIB(), "9365")
+    for carrier in database.carriers:
+      database.all_carrier_data[carrier]
+    self.assertEqual(database.all_carrier_data["docomo"].
+                     SymbolFromUnicode("E63F").GetEnglishName(), "Cloudy")
+    self.assert_(database.GetSymbolsSortedByUnicode() is
+                 database.GetSymbolsSortedByUnicode())
+
+  def __ReplaceInFile(self, path, old, new):
+    filename = os.path.join(self.__temp_dir, *path)
+    file = open(filename, "rb")
+    contents = file.read()
+    file.close()
+    self.assert_(old in contents)
+    file = open(filename, "wb")
+    file.write(contents.replace(old, new))
+    file.close()
+
+  def testReload(self):
+    database = emoji4unicode.Emoji4UnicodeDatabase(self.__temp_dir)
+    self.assert_(database.Reload() is database)
+    self.assertEqual(database.all_carrier_data["docomo"].
+                     SymbolFromUnicode("E63F").GetEnglishName(), "Cloudy")
+    self.__ReplaceInFile(("emoji4unicode.xml",),
+                         'name="UMBRELLA WITH RAIN DROPS"',
+                         'name="UMBRELLA WITH RAINDROPS"')
+    self.__ReplaceInFile(("docomo", "carrier_data.xml"),
+                         'name_en="Cloudy"', 'name_en="Overcast"')
+    reloaded = database.Reload()
+    self.failIf(reloaded is database)
+    self.assert_(reloaded.Reload() is reloaded)
+    self.assertEqual(reloaded.SymbolFromName("UMBRELLA WITH RAINDROPS").id,
+                     "002")
+    self.assertEqual(reloaded.all_carrier_data["docomo"].
+                     SymbolFromUnicode("E63F").GetEnglishName(), "Overcast")
+    # The old database is unchanged.
+    self.assertEqual(database.SymbolFromName("UMBRELLA WITH RAINDROPS"), None)
+    self.assertEqual(database.all_carrier_data["docomo"].
+                     SymbolFromUnicode("E63F").GetEnglishName(), "Cloudy")
+    # Unchanged symbols reuse the previously decoded data.
+    old_cloud = database.id_to_symbol["001"]
+    cloud = reloaded.id_to_symbol["001"]
+    self.failIf(cloud is old_cloud)
+    self.assert_(cloud._database is reloaded)
+    self.assert_(cloud.GetCarrierCodes("docomo") is
+                 old_cloud.GetCarrierCodes("docomo"))
+    self.failIf(reloaded.id_to_symbol["002"].GetCarrierCodes("docomo") is
+                database.id_to_symbol["002"].GetCarrierCodes("docomo"))
+    self.assertEqual(cloud.GetProposedUnicode(), old_cloud.GetProposedUnicode())
+
+
+# The head of an element with text contents but no attributes,
+# like <ann>, <desc> or <design>.
+_simple_element_head_re = re.compile(u"<([a-zA-Z0-9_]+)>")
+
+class _WritexmlWriter(object):
+  """The writer of the previous emoji4unicode.Write(), for comparison.
+
+  Reassembles the line fragments from minidom's writexml().
+  """
+  def __init__(self, filename):
+    self.__out_file = codecs.open(filename, "w", "UTF-8")
+    self.__line = u""
+
+  def close(self):
+    self._WriteLine(self.__line)
+    self.__out_file.close()
+
+  def write(self, s):
+    # Append the new piece to the current line.
+    if self.__line: s = self.__line + s
+    # Keep a simple element with single-line text contents on one line.
+    if s.endswith(u"\n"):
+      head_match = _simple_element_head_re.match(s)
+      if head_match:
+        if len(s) == head_match.end() + 1:
+          # s == head + "\n"
+          s = head_match.group()  # Remove the trailing \n.
+        elif s[head_match.end()] == u"<":
+          # The element contains another element: Split the lines.
+          self._WriteLine(head_match.group())
+          s = s[head_match.end():]
+        else:
+          tail = u"</" + head_match.group(1) + u">\n"
+          if s.endswith(tail):
+            text = s[head_match.end():-len(tail)].strip()
+            if u"\n" in text:
+              # The element has multi-line contents: Split the lines.
+              self._WriteLine(head_match.group())
+              self._WriteLine(text)
+              self._WriteLine(tail[:-1])  # Remove the trailing \n.
+              s = u""
+          else:
+            text = s[head_match.end():].strip()
+            if u"\n" in text:
+              # The element has multi-line contents: Split the lines.
+              self._WriteLine(head_match.group())
+              self._WriteLine(text)
+              s = u""
+            else:
+              s = head_match.group() + text  # Strip the contents.
+    # Look for line ending.
+    # Look for only one, to not remove empty lines inside a multi-line value.
+    eol_index = s.rfind("\n")
+    if eol_index >= 0:
+      self.__line = s[eol_index + 1:]
+      self._WriteLine(s[:eol_index].strip())
+    else:
+      self.__line = s
+
+  def _WriteLine(self, line):
+    # Skip empty lines.
+    if line:
+      # Change escaping in elements other than <e>.
+      # (In particular, keep unescaped text in <e text_fallback="...">.)
+      if not line.startswith(u"<e "):
+        # Turn &quot; into real " for better readability.
+        line = line.replace(u"&quot;", u'"')
+        # Escape non-Latin-1, non-Japanese characters.
+        line = emoji4unicode._escape_re.sub(emoji4unicode._EscapeChars, line)
+      self.__out_file.write(line)
+      self.__out_file.write(u"\n")
+
+
+def WriteWithWritexml(doc, filename):
+  """The previous emoji4unicode.Write(), for comparison.
+
+  Args:
+    doc: xml.dom.minidom Document
+    filename: Path/filename of the output file
+  """
+  writer = _WritexmlWriter(filename)
+  doc.writexml(writer, encoding="UTF-8", newl="\n")
+  writer.close()
+
+
+class WriteTest(unittest.TestCase):
+  def setUp(self):
+    self.__temp_dir = tempfile.mkdtemp()
+    self.__filename = os.path.join(self.__temp_dir, "emoji4unicode.xml")
+
+  def tearDown(self):
+    shutil.rmtree(self.__temp_dir)
+
+  def __Read(self, filename):
+    in_file = open(filename, "rb")
+    contents = in_file.read()
+    in_file.close()
+    return contents
+
+  def __ReadDocument(self, contents):
+    in_filename = os.path.join(self.__temp_dir, "in.xml")
+    in_file = open(in_filename, "wb")
+    in_file.write(contents)
+    in_file.close()
+    return emoji4unicode.ReadDocument(in_filename)
+
+  def __Write(self, document):
+    emoji4unicode.Write(document, self.__filename)
+    return self.__Read(self.__filename)
+
+  def testRoundTrip(self):
+    """Writing the read data file reproduces it byte for byte."""
+    here = os.path.dirname(__file__)
+    e4u_filename = os.path.join(here, "..", "data", "emoji4unicode.xml")
+    self.assertEqual(self.__Write(emoji4unicode.ReadDocument(e4u_filename)),
+                     self.__Read(e4u_filename))
+
+  def testSameAsWritexml(self):
+    """Write() writes an edited data file like the previous writer."""
+    here = os.path.dirname(__file__)
+    contents = self.__Read(os.path.join(here, "..", "data",
+                                        "emoji4unicode.xml"))
+    # Hand-edited text layouts.
+    for (old, new) in (
+        ("<desc>clear weather", "<desc>\nclear weather"),
+        ("<ann>= typhoon, hurricane</ann>",
+         "<ann>= typhoon, hurricane\n</ann><desc>  two\nlines  </desc>\n"
+         '<design x="1">\ntrailing only</design>'),
+        ("(Project issue 92.)\n</desc>", "(Project issue 92.)</desc>")):
+      self.assertEqual(contents.count(old), 1, old)
+      contents = contents.replace(old, new)
+    document = self.__ReadDocument(contents)
+    doc = xml.dom.minidom.parseString(contents)
+    # Edits like those of the update_e4u_* scripts.
+    for (symbol, element) in zip(doc.getElementsByTagName("e"),
+                                 document.root.GetElements("e")):
+      id = element.attributes["id"]
+      if id.endswith("1"):
+        symbol.setAttribute("oldname", u"OLD")
+        element.attributes["oldname"] = u"OLD"
+      if id.endswith("2"):
+        symbol.removeAttribute("name")
+        del element.attributes["name"]
+      if id.endswith("3"):
+        text = u"= e-%s & \u2603" % id
+        ann = symbol.appendChild(doc.createElement("ann"))
+        ann.appendChild(doc.createTextNode(text))
+        element.children.append(emoji4unicode.Element("ann", children=[text]))
+    WriteWithWritexml(doc, self.__filename)
+    doc.unlink()
+    self.assertEqual(self.__Write(document), self.__Read(self.__filename))
+
+  def testLayout(self):
+    document = self.__ReadDocument(
+        '<!-- top -->\n<emoji4unicode>\n<!-- data -->\n'
+        '<category name="Q &quot;1&quot; \xe2\x98\x83">\n'
+        '<e id="001" text_fallback="&quot;\xe2\x98\x83&quot;"/>\n'
+        '<e name="B" id="002">\n<desc>\none\n\ntwo \n</desc>\n'
+        '<design>\n</design>\n<ann>\ntrailing only</ann>\n</e>\n'
+        '</category>\n</emoji4unicode>\n')
+    symbol = document.root.GetElements("e").next()
+    symbol.attributes["oldname"] = u"OLD"
+    symbol.children.append(
+        emoji4unicode.Element("ann", children=[u"= <x> & \u2603"]))
+    self.assertEqual(
+        self.__Write(document),
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!-- top -->\n'
+        '<emoji4unicode>\n'
+        '<!-- data -->\n'
+        '<category name="Q "1" &#x2603;">\n'
+        '<e id="001" oldname="OLD" text_fallback="&quot;\xe2\x98\x83&quot;">\n'
+        '<ann>= &lt;x&gt; &amp; &#x2603;</ann>\n'
+        '</e>\n'
+        '<e id="002" name="B">\n'
+        '<desc>\none\n\ntwo\n</desc>\n'
+        '<design>\n</design>\n'
+        '<ann>\ntrailing only</ann>\n'
+        '</e>\n'
+        '</category>\n'
+        '</emoji4unicode>\n')
+
+  def testElements(self):
+    document = self.__ReadDocument(
+        '<r><e id="1"><ann>a</ann><ann>b<!-- c -->c</ann></e>'
+        '<x><e id="2"/></x></r>')
+    self.assertEqual([e.attributes["id"]
+                      for e in document.root.GetElements("e")], [u"1", u"2"])
+    self.assertEqual([ann.GetText()
+                      for ann in document.root.GetElements("ann")],
+                     [u"a", u"bc"])
+    self.assertEqual(document.root.name, u"r")
+
 
 if __name__ == "__main__":
   unittest.main()
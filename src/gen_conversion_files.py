@@ -51,16 +51,15 @@ def _WriteMappings(writer, carrier, for_sjis):
   writer.write(u"# Mappings for Unicode Standard Emoji symbols.\n")
   symbols = emoji4unicode.GetSymbolsSortedByUnicode()
   for (cp_list, symbol) in symbols:
-    code = symbol.GetCarrierUnicode(carrier)
-    if not code: continue
-    if code.startswith(">"):
-      code = code[1:]
+    (is_fallback, codes) = symbol.GetCarrierCodes(carrier)
+    if not codes: continue
+    if is_fallback:
       precision = "|1"  # fallback mapping
     else:
       precision = "|0"  # roundtrip mapping
     b = ""
     complete = True
-    for one_code in code.split("+"):
+    for one_code in codes:
       carrier_symbol = carrier_data.SymbolFromUnicode(one_code)
       one_code_bytes =  _CarrierSymbolToBytes(carrier_symbol, for_sjis)
       if one_code_bytes:
@@ -90,7 +89,7 @@ def _WriteMappings(writer, carrier, for_sjis):
       writer.write(u"%s %s %s\n" % (uni, b, non_emoji_style_precision))
       # Add fallback mappings from "text style" and "emoji style"
       # Variation Selector sequences.
-      vs_list = cp_list
+      vs_list = list(cp_list)  # The sorted view is shared and immutable.
       # Insert the variation selector before a combining mark,
       # in particular before the U+20E3 Combining Enclosing Keycap.
       # Given the current mappings, the variation selector is always
@@ -169,17 +168,17 @@ def _WriteGooglePUATransformFile(writer):
 """)
   symbols = emoji4unicode.GetSymbolsSortedByUnicode()
   for (cp_list, symbol) in symbols:
-    google_uni = symbol.GetCarrierUnicode("google")
+    (is_fallback, google_code_points) = symbol.GetCarrierCodePoints("google")
     # Ignore symbols that have no Google PUA mapping,
     # or only a fallback to one.
-    if not google_uni or google_uni.startswith(">"): continue
+    if not google_code_points or is_fallback: continue
     # Ignore symbols that have only a Google PUA mapping (not standard Unicode).
     if cp_list[0] >= 0xf0000: continue
-    gpua = int(google_uni, 16)
+    gpua = google_code_points[0]
     if len(cp_list) > 2:
       uni = "+".join([u"<U%04X>" % cp for cp in cp_list])
-      raise ValueError("Google PUA U+%s mapping to %s too long" %
-          (google_uni, uni))
+      raise ValueError("Google PUA U+%04X mapping to %s too long" %
+          (gpua, uni))
     value = cp_list[0]
     if len(cp_list) == 2:
       second = cp_list[1]
@@ -190,13 +189,13 @@ def _WriteGooglePUATransformFile(writer):
       else:
         uni = "+".join([u"<U%04X>" % cp for cp in cp_list])
         raise ValueError(
-            "Google PUA U+%s mapping to %s " +
+            "Google PUA U+%04X mapping to %s " +
             "contains an unencodable second code point" %
-            (google_uni, uni))
+            (gpua, uni))
     if symbol.UnicodeHasVariationSequence():
       value |= (1<<30)
     if gpua in gpua_map:
-      raise ValueError("Google PUA U+%s maps to multiple symbols" % google_uni)
+      raise ValueError("Google PUA U+%04X maps to multiple symbols" % gpua)
     gpua_map[gpua] = value
     gpua_per16[(gpua - 0xfe000) >> 4] = True
     gpua_index[(gpua - 0xfe000) >> 6] = 0
@@ -296,7 +296,7 @@ def _WriteEmojiDataHTML(writer):
   subcategory_symbols = []
   all_symbols = emoji4unicode.GetSymbolsSortedByUnicode()
   for symbol in all_symbols:
-    symbol = symbol[1]  # Discard the Unicode code point list.
+    symbol = symbol[1]  # Discard the Unicode code point tuple.
     if not symbol.in_proposal and _only_in_proposal:
       continue  # Skip this symbol.
     if symbol.GetUnicode():
@@ -411,7 +411,7 @@ def _WriteProposedEmojiHTML(writer):
   writer.write(_PROPOSED_EMOJI_HEADER)
   prev_subcategory_name = ""
   for proposed_symbol in proposed_symbols:
-    symbol = proposed_symbol[1]  # Discard the Unicode code point list.
+    symbol = proposed_symbol[1]  # Discard the Unicode code point tuple.
     if symbol.GetUnicode(): continue  # Filter out unified symbols.
     number_symbols_new += 1
     subcategory_name = symbol.subcategory.name
@@ -450,12 +450,15 @@ def _WriteFullSymbolTableHTML(writer, symbols):
 def _RepresentationHTML(e4u_symbol):
   """Return HTML with the symbol representation."""
   uni = e4u_symbol.GetUnicode()
+  code_points = e4u_symbol.GetUnicodeCodePoints()
   # Begin "proposal was accepted into Unicode 6.0"
   # The proposal was accepted, the Emoji symbols were added to Unicode 6.0.
   # These are minor changes to show Emoji symbols
   # as "unified" rather than "proposed",
   # so that we need not modify the .xml data file.
-  if not uni and e4u_symbol.in_proposal: uni = e4u_symbol.GetProposedUnicode()
+  if not uni and e4u_symbol.in_proposal:
+    uni = e4u_symbol.GetProposedUnicode()
+    code_points = e4u_symbol.GetProposedUnicodeCodePoints()
   # End "proposal was accepted into Unicode 6.0"
   if uni:
     if _show_real_chars:
@@ -469,7 +472,7 @@ def _RepresentationHTML(e4u_symbol):
       repr = font_img + u"<br>U+" + uni.replace("+", " U+")
     else:
       repr = _UnicodeHTML(uni, u"unified")
-    age = unicode_age.GetAge(uni)
+    age = unicode_age.GetAgeOfCodePoints(code_points)
     if age:
       s = u"encoded" if age >= "6.0" else u"unified"
       return (repr + u"<br><span class='status'>" + s +
@@ -65,17 +65,20 @@ _FOOTER = """
 def _WriteSourcesFile(writer):
   writer.write(_HEADER)
   symbols = emoji4unicode.GetSymbolsInProposalSortedByUnicode()
+  query = emoji4unicode.GetQuery()
+  # Symbols with round-trip mappings to at least one Japanese carrier.
+  with_mappings = (query.RoundTrip("docomo") | query.RoundTrip("kddi") |
+                   query.RoundTrip("softbank"))
   for symbol in symbols:
     symbol = symbol[1]
+    if symbol not in with_mappings: continue
     uni = symbol.GetUnicode()
     if not uni: uni = symbol.GetProposedUnicode()
     if uni == "27BF": continue  # Omit DOUBLE CURLY LOOP from sources file.
     fields = [uni.replace("+", " ")]
-    has_mappings = False
     for carrier in ("docomo", "kddi", "softbank"):
-      code = symbol.GetCarrierUnicode(carrier)
-      if code and not code.startswith(">"):
-        has_mappings = True
+      if symbol in query.RoundTrip(carrier):
+        code = symbol.GetCarrierUnicode(carrier)
         one_carrier_data = emoji4unicode.all_carrier_data[carrier]
         carrier_symbol = one_carrier_data.SymbolFromUnicode(code)
         if carrier_symbol.shift_jis:
@@ -84,7 +87,7 @@ def _WriteSourcesFile(writer):
           fields.append("Missing Shift-JIS code")
       else:
         fields.append("")
-    if has_mappings: writer.write(u";".join(fields) + u"\n")
+    writer.write(u";".join(fields) + u"\n")
   writer.write(_FOOTER)
   writer.close()
 
@@ -93,10 +93,10 @@ def main():
   for symbol in emoji4unicode.GetSymbols():
     if symbol.UnicodeHasVariationSequence():
       # Get the Google Private Use Area code point.
-      pua = symbol.GetCarrierUnicode("google")
-      if not pua.startswith("<"):
+      (is_fallback, pua) = symbol.GetCarrierCodePoints("google")
+      if pua and not is_fallback:
         # Round-trip, must be a single code point.
-        pua_vs_code_points.add(int(pua, 16))
+        pua_vs_code_points.add(pua[0])
   print
   print ("Google PUA code points corresponding to Unicode Standard " +
       "code points with emoji-style Variation Selector sequences:")
@@ -0,0 +1,116 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Immutable sets of integers stored as sorted lists of ranges.
+
+A RangeSet stores a set of integers (for example, Unicode code points)
+as a sorted tuple of disjoint (start, end) ranges. Membership is a binary
+search over the range starts; the ranges tuple is small and can be
+marshaled or pickled, and RangeSet(ranges) rebuilds the set.
+
+Usage:
+  emoji = range_set.RangeSet([(0xE63E, 0xE757)])
+  if 0xE640 in emoji | other_emoji: ...
+"""
+
+__author__ = "Markus Scherer"
+
+import bisect
+
+class RangeSet(object):
+  """Immutable set of integers, stored as ranges.
+
+  Attributes:
+    ranges: Tuple of (start, end) pairs with inclusive ends, sorted,
+      with gaps between the ranges.
+  """
+  __slots__ = ("ranges", "_starts", "_length")
+
+  def __init__(self, ranges=()):
+    """Build the set from ranges.
+
+    Args:
+      ranges: Iterable of (start, end) pairs of integers with inclusive ends,
+        in any order. Overlapping and adjacent ranges are merged.
+    """
+    merged = []
+    for (start, end) in sorted(ranges):
+      if start > end: raise ValueError("range start %d > end %d" % (start, end))
+      if merged and start <= merged[-1][1] + 1:
+        if end > merged[-1][1]: merged[-1] = (merged[-1][0], end)
+      else:
+        merged.append((start, end))
+    self.ranges = tuple(merged)
+    self._starts = [start for (start, end) in merged]
+    self._length = sum([end - start + 1 for (start, end) in merged])
+
+  def __contains__(self, value):
+    i = bisect.bisect_right(self._starts, value) - 1
+    return i >= 0 and value <= self.ranges[i][1]
+
+  def __iter__(self):
+    """Yields the integers in ascending order."""
+    for (start, end) in self.ranges:
+      for value in xrange(start, end + 1):
+        yield value
+
+  def __len__(self):
+    return self._length
+
+  def __nonzero__(self):
+    return bool(self.ranges)
+
+  def __or__(self, other):
+    return RangeSet(self.ranges + other.ranges)
+
+  def __and__(self, other):
+    intersection = []
+    (i, j) = (0, 0)
+    while i < len(self.ranges) and j < len(other.ranges):
+      (start1, end1) = self.ranges[i]
+      (start2, end2) = other.ranges[j]
+      start = max(start1, start2)
+      end = min(end1, end2)
+      if start <= end: intersection.append((start, end))
+      # Advance past the range which ends first.
+      if end1 < end2:
+        i += 1
+      else:
+        j += 1
+    return RangeSet(intersection)
+
+  def __eq__(self, other):
+    return isinstance(other, RangeSet) and other.ranges == self.ranges
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash(self.ranges)
+
+  def __repr__(self):
+    return "RangeSet(%r)" % (self.ranges,)
+
+
+def FromIntegers(values):
+  """Returns the RangeSet of an iterable of integers."""
+  ranges = []
+  for value in sorted(set(values)):
+    if ranges and value == ranges[-1][1] + 1:
+      ranges[-1][1] = value
+    else:
+      ranges.append([value, value])
+  return RangeSet(ranges)
@@ -0,0 +1,59 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = "Markus Scherer"
+
+import marshal
+import random
+import unittest
+import range_set
+
+class RangeSetTest(unittest.TestCase):
+  def testRanges(self):
+    s = range_set.RangeSet([(10, 12), (1, 3), (4, 5), (11, 20), (30, 30)])
+    self.assertEqual(s.ranges, ((1, 5), (10, 20), (30, 30)))
+    self.assertEqual(len(s), 17)
+    self.assertEqual(list(s), range(1, 6) + range(10, 21) + [30])
+    for value in (1, 5, 10, 20, 30):
+      self.assert_(value in s)
+    for value in (0, 6, 9, 21, 29, 31):
+      self.failIf(value in s)
+    self.failIf(range_set.RangeSet())
+    self.failIf(5 in range_set.RangeSet())
+    self.assertRaises(ValueError, range_set.RangeSet, [(3, 2)])
+
+  def testSetOperations(self):
+    random.seed(2)
+    for i in range(200):
+      values1 = set(random.sample(xrange(100), random.randint(0, 60)))
+      values2 = set(random.sample(xrange(100), random.randint(0, 60)))
+      s1 = range_set.FromIntegers(values1)
+      s2 = range_set.FromIntegers(values2)
+      self.assertEqual(list(s1), sorted(values1))
+      self.assertEqual(list(s1 | s2), sorted(values1 | values2))
+      self.assertEqual(list(s1 & s2), sorted(values1 & values2))
+      self.assertEqual(s1 | s2, range_set.FromIntegers(values1 | values2))
+
+  def testSerialization(self):
+    s = range_set.RangeSet([(0xE63E, 0xE757), (0xE001, 0xE05A)])
+    copy = range_set.RangeSet(marshal.loads(marshal.dumps(s.ranges)))
+    self.assertEqual(copy, s)
+    self.assertEqual(hash(copy), hash(s))
+    self.assertNotEqual(copy, range_set.RangeSet([(0xE63E, 0xE757)]))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -32,35 +32,27 @@ import utf
 def main():
   emoji4unicode.Load()
   docomo_data = emoji4unicode.all_carrier_data["docomo"]
-  img_from_counts = {"docomo":0, "kddi":0, "softbank":0, "google":0}
+  query = emoji4unicode.GetQuery()
+  img_from_counts = {}
+  for carrier in ("docomo", "kddi", "softbank", "google"):
+    img_from_counts[carrier] = len(query.new & query.ImageFrom(carrier))
   docomo_exp = 0
   only_docomo_exp = 0
-  for symbol in emoji4unicode.GetSymbols():
-    if not symbol.in_proposal: continue
-    if symbol.GetUnicode(): continue
-    img_from = symbol.ImageFromWhichCarrier()
-    img_from_counts[img_from] += 1
-    if img_from == "docomo":
-      docomo_uni = symbol.GetCarrierUnicode("docomo")
-      docomo_symbol = docomo_data.SymbolFromUnicode(docomo_uni)
-      if docomo_symbol.number >= 300:  # Expansion Pictogram
-        docomo_exp += 1
-        has_kddi = False
-        kddi_uni = symbol.GetCarrierUnicode("kddi")
-        if kddi_uni and not kddi_uni.startswith(">"):
-          has_kddi = True
-        has_softbank = False
-        softbank_uni = symbol.GetCarrierUnicode("softbank")
-        if softbank_uni and not softbank_uni.startswith(">"):
-          has_softbank = True
-        msg = "e-%s img_from=docomo" % symbol.id
-        if not has_kddi and not has_softbank:
-          msg += " Expansion Pictogram only"
-          only_docomo_exp += 1
-        else:
-          if has_kddi: msg += ", kddi available"
-          if has_softbank: msg += ", softbank available"
-        print msg
+  for symbol in query.new & query.ImageFrom("docomo"):
+    docomo_uni = symbol.GetCarrierUnicode("docomo")
+    docomo_symbol = docomo_data.SymbolFromUnicode(docomo_uni)
+    if docomo_symbol.number >= 300:  # Expansion Pictogram
+      docomo_exp += 1
+      has_kddi = symbol in query.RoundTrip("kddi")
+      has_softbank = symbol in query.RoundTrip("softbank")
+      msg = "e-%s img_from=docomo" % symbol.id
+      if not has_kddi and not has_softbank:
+        msg += " Expansion Pictogram only"
+        only_docomo_exp += 1
+      else:
+        if has_kddi: msg += ", kddi available"
+        if has_softbank: msg += ", softbank available"
+      print msg
   print "Number of symbol images from which carrier:"
   print img_from_counts
   print ("Number of symbol images from DoCoMo Expansion Pictograms: %d" %
@@ -0,0 +1,237 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Binary snapshot cache for parsed data files.
+
+Parsing emoji4unicode.xml, the carrier data files etc. takes much longer than
+reading the same data back from a marshal dump.
+Load() runs a parser function on a data file and caches the parser's result
+in a snapshot file which is keyed on the data file's content hash.
+When the data file has not changed, the snapshot is loaded instead.
+
+Stale snapshots (data file or parser version changed) and corrupt snapshots
+(truncated, overwritten, from another Python version) are detected
+and rebuilt automatically.
+The cache is best-effort: If the snapshot directory is not writable,
+then the data files are simply parsed every time.
+
+GetFileState() and IsFileCurrent() tell whether a data file has changed
+since it was read.
+"""
+
+__author__ = "Markus Scherer"
+
+import hashlib
+import marshal
+import os
+import os.path
+import struct
+import sys
+import time
+
+# Directory for snapshot files. None disables the cache.
+_cache_dir = os.path.join(os.path.dirname(__file__),
+                          "..", "generated", "cache")
+
+# Changes when the snapshot file layout changes.
+_MAGIC = "E4USNAP1"
+
+# A file modified less than this many seconds before its GetFileState()
+# might change again without changing its modification time,
+# depending on the file system's timestamp resolution.
+_RACY_SECONDS = 2
+
+# The marshal format is not compatible across Python versions.
+_PYTHON_VERSION = "%d.%d/%d" % (sys.version_info[0], sys.version_info[1],
+                                marshal.version)
+
+def GetCacheDirectory():
+  """Returns the snapshot directory, or None if the cache is disabled."""
+  return _cache_dir
+
+
+def SetCacheDirectory(path):
+  """Sets the snapshot directory. None disables the cache."""
+  global _cache_dir
+  _cache_dir = path
+
+
+def Load(filename, parser, version=1):
+  """Returns the parsed contents of a data file, from a snapshot if possible.
+
+  Args:
+    filename: Path/filename of the data file.
+    parser: Function which takes the data file contents (a byte string)
+      and returns the parsed data.
+      The parsed data must contain only types supported by the marshal module
+      (no class instances).
+    version: Version of the parser's output.
+      Increment it when the parser changes, so that old snapshots are rebuilt.
+
+  Returns:
+    The parser function's result for the data file contents.
+  """
+  contents = _ReadFile(filename)
+  key = "%s;%s;%d;%s" % (_PYTHON_VERSION, _ParserName(parser), version,
+                         _Digest(contents))
+  snapshot_filename = _SnapshotFilename(filename, parser)
+  if snapshot_filename:
+    data = _ReadSnapshot(snapshot_filename, key)
+    if data is not None: return data[0]
+  data = parser(contents)
+  if snapshot_filename: _WriteSnapshot(snapshot_filename, key, data)
+  return data
+
+
+def GetFileStamp(filename):
+  """Returns a cheap indicator for whether a file has changed.
+
+  Args:
+    filename: Path/filename of a data file.
+
+  Returns:
+    The pair (modification time, size), or None if the file does not exist.
+    Record it before reading the file, and compare it with a later call.
+  """
+  try:
+    stat = os.stat(filename)
+  except OSError:
+    return None
+  return (stat.st_mtime, stat.st_size)
+
+
+def GetFileState(filename):
+  """Returns an indicator for IsFileCurrent().
+
+  The file stamp alone cannot tell a file which was modified again within
+  the same timestamp step with the same size from the file as it was read.
+  For a file modified within the last few seconds, the state also holds
+  the content digest, the same one that Load() uses for the snapshot key.
+
+  Args:
+    filename: Path/filename of a data file.
+
+  Returns:
+    A pair (stamp, digest) with the GetFileStamp() result and the SHA-1
+    hex digest of the contents, or None for a file which was not modified
+    recently. Record it before reading the file.
+  """
+  stamp = GetFileStamp(filename)
+  digest = None
+  if stamp and stamp[0] > time.time() - _RACY_SECONDS:
+    digest = _Digest(_ReadFile(filename))
+  return (stamp, digest)
+
+
+def IsFileCurrent(filename, state):
+  """Returns False if a file has changed since GetFileState() returned state.
+
+  Compares the file stamps, and when they match and the state has
+  a content digest, the digests.
+  """
+  (stamp, digest) = state
+  if GetFileStamp(filename) != stamp: return False
+  if digest is None: return True
+  try:
+    return _Digest(_ReadFile(filename)) == digest
+  except IOError:
+    return False
+
+
+def _Digest(contents):
+  return hashlib.sha1(contents).hexdigest()
+
+
+def _ReadFile(filename):
+  file = open(filename, "rb")
+  try:
+    return file.read()
+  finally:
+    file.close()
+
+
+def _ParserName(parser):
+  return "%s.%s" % (parser.__module__, parser.__name__)
+
+
+def _SnapshotFilename(filename, parser):
+  """Returns the snapshot filename for the data file and parser, or None."""
+  if not _cache_dir: return None
+  # Different data folders must not share snapshots even if they contain
+  # files with the same names.
+  source = os.path.abspath(filename) + "\0" + _ParserName(parser)
+  return os.path.join(_cache_dir, "%s-%s.snapshot" %
+                      (os.path.basename(filename),
+                       hashlib.sha1(source).hexdigest()[:16]))
+
+
+def _ReadSnapshot(snapshot_filename, key):
+  """Reads a snapshot file.
+
+  Returns:
+    A 1-tuple with the snapshot data, or None if the snapshot file is missing,
+    stale or corrupt.
+  """
+  try:
+    snapshot = _ReadFile(snapshot_filename)
+  except (IOError, OSError):
+    return None
+  # Layout: magic, header length, header, payload.
+  # The header is a marshal dump of (key, payload length, payload MD5).
+  start = len(_MAGIC) + 4
+  if len(snapshot) < start or not snapshot.startswith(_MAGIC): return None
+  try:
+    (header_length,) = struct.unpack("<I", snapshot[len(_MAGIC):start])
+    header = marshal.loads(snapshot[start:start + header_length])
+    (snapshot_key, payload_length, payload_md5) = header
+    if snapshot_key != key: return None  # Stale.
+    payload = snapshot[start + header_length:]
+    if (len(payload) != payload_length or
+        hashlib.md5(payload).digest() != payload_md5):
+      return None
+    return (marshal.loads(payload),)
+  except (EOFError, TypeError, ValueError, struct.error):
+    return None
+
+
+def _WriteSnapshot(snapshot_filename, key, data):
+  """Writes a snapshot file, replacing any previous one.
+
+  Silently ignores errors: The cache is an optimization only.
+  """
+  payload = marshal.dumps(data)
+  header = marshal.dumps((key, len(payload), hashlib.md5(payload).digest()))
+  temp_filename = "%s.%d.tmp" % (snapshot_filename, os.getpid())
+  try:
+    directory = os.path.dirname(snapshot_filename)
+    if not os.path.isdir(directory): os.makedirs(directory)
+    file = open(temp_filename, "wb")
+    try:
+      file.write(_MAGIC)
+      file.write(struct.pack("<I", len(header)))
+      file.write(header)
+      file.write(payload)
+    finally:
+      file.close()
+    # Write-then-rename so that concurrent readers never see a partial file.
+    if os.name == "nt" and os.path.exists(snapshot_filename):
+      os.remove(snapshot_filename)
+    os.rename(temp_filename, snapshot_filename)
+  except (IOError, OSError):
+    try:
+      os.remove(temp_filename)
+    except OSError:
+      pass
@@ -0,0 +1,128 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = "Markus Scherer"
+
+import os
+import os.path
+import shutil
+import tempfile
+import time
+import unittest
+import snapshot
+
+_parse_count = 0
+
+def _ParseLines(contents):
+  global _parse_count
+  _parse_count += 1
+  return {"lines": contents.splitlines()}
+
+
+class SnapshotTest(unittest.TestCase):
+  def setUp(self):
+    global _parse_count
+    _parse_count = 0
+    self.__saved_cache_dir = snapshot.GetCacheDirectory()
+    self.__temp_dir = tempfile.mkdtemp()
+    self.__cache_dir = os.path.join(self.__temp_dir, "cache")
+    snapshot.SetCacheDirectory(self.__cache_dir)
+    self.__filename = os.path.join(self.__temp_dir, "data.txt")
+    self.__WriteData("one\ntwo\n")
+
+  def tearDown(self):
+    snapshot.SetCacheDirectory(self.__saved_cache_dir)
+    shutil.rmtree(self.__temp_dir)
+
+  def __WriteData(self, contents):
+    file = open(self.__filename, "wb")
+    file.write(contents)
+    file.close()
+
+  def __SnapshotFilename(self):
+    names = os.listdir(self.__cache_dir)
+    self.assertEqual(len(names), 1)
+    return os.path.join(self.__cache_dir, names[0])
+
+  def testLoadFromSnapshot(self):
+    data = snapshot.Load(self.__filename, _ParseLines)
+    self.assertEqual(data, {"lines": ["one", "two"]})
+    self.assertEqual(_parse_count, 1)
+    self.assertEqual(snapshot.Load(self.__filename, _ParseLines), data)
+    self.assertEqual(_parse_count, 1)
+
+  def testStaleSnapshot(self):
+    snapshot.Load(self.__filename, _ParseLines)
+    self.__WriteData("three\n")
+    data = snapshot.Load(self.__filename, _ParseLines)
+    self.assertEqual(data, {"lines": ["three"]})
+    self.assertEqual(_parse_count, 2)
+    # A new parser version invalidates the snapshot as well.
+    snapshot.Load(self.__filename, _ParseLines, version=2)
+    self.assertEqual(_parse_count, 3)
+
+  def testCorruptSnapshot(self):
+    data = snapshot.Load(self.__filename, _ParseLines)
+    snapshot_filename = self.__SnapshotFilename()
+    file = open(snapshot_filename, "rb")
+    contents = file.read()
+    file.close()
+    for corrupt in (contents[:-3],  # truncated
+                    contents[:-1] + chr(ord(contents[-1]) ^ 1),  # modified
+                    "",
+                    "garbage"):
+      file = open(snapshot_filename, "wb")
+      file.write(corrupt)
+      file.close()
+      self.assertEqual(snapshot.Load(self.__filename, _ParseLines), data)
+    self.assertEqual(_parse_count, 5)
+    # The last Load() rebuilt a good snapshot.
+    snapshot.Load(self.__filename, _ParseLines)
+    self.assertEqual(_parse_count, 5)
+
+  def testCacheDisabled(self):
+    snapshot.SetCacheDirectory(None)
+    snapshot.Load(self.__filename, _ParseLines)
+    snapshot.Load(self.__filename, _ParseLines)
+    self.assertEqual(_parse_count, 2)
+    self.failIf(os.path.exists(self.__cache_dir))
+
+
+  def testFileState(self):
+    # Just written: The state has a digest, which catches a same-size edit
+    # that the file system records with the same modification time.
+    now = int(time.time())
+    os.utime(self.__filename, (now, now))
+    state = snapshot.GetFileState(self.__filename)
+    self.assert_(state[1])
+    self.assert_(snapshot.IsFileCurrent(self.__filename, state))
+    self.__WriteData("six\ntwo\n")
+    os.utime(self.__filename, (now, now))
+    self.assertEqual(snapshot.GetFileStamp(self.__filename), state[0])
+    self.failIf(snapshot.IsFileCurrent(self.__filename, state))
+    # Modified long ago: The stamp alone decides.
+    os.utime(self.__filename, (1000000000, 1000000000))
+    state = snapshot.GetFileState(self.__filename)
+    self.assertEqual(state[1], None)
+    self.assert_(snapshot.IsFileCurrent(self.__filename, state))
+    self.__WriteData("one\n")
+    self.failIf(snapshot.IsFileCurrent(self.__filename, state))
+    os.remove(self.__filename)
+    self.failIf(snapshot.IsFileCurrent(self.__filename, state))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -19,6 +19,7 @@
 __author__ = "Markus Scherer"
 
 import os.path
+import snapshot
 
 # Code points with Emoji variation selector sequences.
 _emoji_vs_code_points = set()
@@ -26,11 +27,33 @@ _emoji_vs_code_points = set()
 def Load():
   """Loads Unicode Standardized Variants data."""
   if _emoji_vs_code_points: return  # Already loaded.
-  # TODO(mscherer): Add argument for root data folder path.
-  filename = os.path.join(os.path.dirname(__file__),
-                          "..", "data", "unicode", "StandardizedVariants.txt")
-  file = open(filename, "r")
-  for line in file:
+  _emoji_vs_code_points.update(ReadSetOfUnicodeWithEmojiVS())
+
+
+def ReadSetOfUnicodeWithEmojiVS(data_root=None):
+  """Reads the code points with Emoji variation selector sequences.
+
+  Args:
+    data_root: Path of the data folder.
+      Defaults to the data folder next to this module's folder.
+
+  Returns:
+    A frozenset of code point integers.
+  """
+  if not data_root:
+    data_root = os.path.join(os.path.dirname(__file__), "..", "data")
+  filename = os.path.join(data_root, "unicode", "StandardizedVariants.txt")
+  return frozenset(snapshot.Load(filename, _ParseEmojiVS))
+
+
+def _ParseEmojiVS(contents):
+  """Parse StandardizedVariants.txt contents.
+
+  Returns:
+    A list of code points with Emoji variation selector sequences.
+  """
+  emoji_vs_code_points = []
+  for line in contents.splitlines():
     line = line.strip()  # Remove trailing newlines etc.
     index = line.find("#")  # Remove comments.
     if index >= 0: line = line[:index].rstrip()
@@ -51,7 +74,8 @@ def Load():
     if len(code_points) != 2:
       raise ValueError("current limitation: emoji style sequences must be " +
                        "one code point plus VS16")
-    _emoji_vs_code_points.add(code_points[0])
+    emoji_vs_code_points.append(code_points[0])
+  return emoji_vs_code_points
 
 
 def GetSetOfUnicodeWithEmojiVS():
@@ -0,0 +1,221 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bitset queries over the Emoji symbols of an Emoji4UnicodeDatabase.
+
+A SymbolQuery precomputes one bitset per predicate (in_proposal, unified,
+round-trip mapping to a carrier etc.), with bit i for the i-th symbol
+in GetSymbols() order.
+Predicates combine with & | - ^ ~ into new SymbolSet objects,
+and len() of a SymbolSet is a popcount, without looping over symbols
+in Python.
+
+Usage:
+  query = emoji4unicode.GetQuery()
+  print len(query.new & query.ImageFrom("docomo"))
+  for symbol in query.new & ~query.RoundTrip("kddi"): ...
+"""
+
+__author__ = "Markus Scherer"
+
+class SymbolSet(object):
+  """Immutable set of symbols of one database, stored as an integer bitset.
+
+  Attributes:
+    bits: The bitset integer. Bit i is set if the set contains
+      the i-th symbol of the database.
+  """
+  __slots__ = ("_query", "bits")
+
+  def __init__(self, query, bits):
+    """Do not instantiate directly: Use SymbolQuery attributes and methods."""
+    self._query = query
+    self.bits = bits
+
+  def __Check(self, other):
+    if not isinstance(other, SymbolSet) or other._query is not self._query:
+      raise ValueError("SymbolSet operands must be from the same SymbolQuery")
+
+  def __and__(self, other):
+    self.__Check(other)
+    return SymbolSet(self._query, self.bits & other.bits)
+
+  def __or__(self, other):
+    self.__Check(other)
+    return SymbolSet(self._query, self.bits | other.bits)
+
+  def __xor__(self, other):
+    self.__Check(other)
+    return SymbolSet(self._query, self.bits ^ other.bits)
+
+  def __sub__(self, other):
+    self.__Check(other)
+    return SymbolSet(self._query, self.bits & ~other.bits)
+
+  def __invert__(self):
+    return SymbolSet(self._query, self._query.all.bits & ~self.bits)
+
+  def __eq__(self, other):
+    return (isinstance(other, SymbolSet) and other._query is self._query and
+            other.bits == self.bits)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash(self.bits)
+
+  def __len__(self):
+    """Returns the number of symbols in the set (popcount)."""
+    return bin(self.bits).count("1")
+
+  def __nonzero__(self):
+    return self.bits != 0
+
+  def __contains__(self, symbol):
+    index = self._query._IndexOf(symbol)
+    return index is not None and (self.bits >> index) & 1 == 1
+
+  def __iter__(self):
+    """Yields the symbols in the set, in GetSymbols() order."""
+    symbols = self._query._symbols
+    bits = self.bits
+    while bits:
+      lowest = bits & -bits
+      yield symbols[len(bin(lowest)) - 3]  # Index of the lowest set bit.
+      bits ^= lowest
+
+
+class SymbolQuery(object):
+  """Precomputed predicate bitsets over the symbols of one database.
+
+  Do not instantiate directly: Use Emoji4UnicodeDatabase.GetQuery() or
+  emoji4unicode.GetQuery(), which build one SymbolQuery per database.
+
+  Attributes:
+    carriers: Tuple of the carrier names for RoundTrip() etc.
+
+  SymbolSet attributes:
+    all: All symbols.
+    none: The empty set.
+    in_proposal: Symbols with in_proposal=True.
+    unified: Symbols unified with an existing or upcoming Unicode character
+      (GetUnicode() is not empty).
+    new: Symbols in the proposal which are not unified.
+    upcoming: Symbols unified with an upcoming character.
+    has_text_fallback: Symbols with a text fallback.
+    has_glyph: Symbols with a font glyphRefID.
+    has_variation_sequence: Symbols whose Unicode character has an
+      Emoji variation selector sequence.
+      Computed on first use, because it needs the variation sequence data.
+  """
+  def __init__(self, database):
+    """Compute the predicate bitsets in one pass over the symbols.
+
+    Does not load data files which the symbols load on first use.
+
+    Args:
+      database: emoji4unicode.Emoji4UnicodeDatabase object
+    """
+    self.carriers = tuple(database.carriers)
+    self._symbols = tuple(database.GetSymbols())
+    self.__indexes = dict([(symbol, i)
+                           for (i, symbol) in enumerate(self._symbols)])
+    in_proposal = unified = upcoming = has_text_fallback = has_glyph = 0
+    round_trip = dict([(carrier, 0) for carrier in self.carriers])
+    fallback = dict(round_trip)
+    img_from = dict(round_trip)
+    for (i, symbol) in enumerate(self._symbols):
+      bit = 1 << i
+      if symbol.in_proposal: in_proposal |= bit
+      if symbol.GetUnicode(): unified |= bit
+      if symbol.IsUnifiedWithUpcomingCharacter(): upcoming |= bit
+      if symbol.GetTextFallback(): has_text_fallback |= bit
+      if symbol.GetGlyphRefID(): has_glyph |= bit
+      for carrier in self.carriers:
+        (is_fallback, codes) = symbol.GetCarrierCodes(carrier)
+        if codes:
+          if is_fallback:
+            fallback[carrier] |= bit
+          else:
+            round_trip[carrier] |= bit
+      carrier = symbol.ImageFromWhichCarrier()
+      if carrier in img_from: img_from[carrier] |= bit
+    self.all = SymbolSet(self, (1 << len(self._symbols)) - 1)
+    self.none = SymbolSet(self, 0)
+    self.in_proposal = SymbolSet(self, in_proposal)
+    self.unified = SymbolSet(self, unified)
+    self.new = SymbolSet(self, in_proposal & ~unified)
+    self.upcoming = SymbolSet(self, upcoming)
+    self.has_text_fallback = SymbolSet(self, has_text_fallback)
+    self.has_glyph = SymbolSet(self, has_glyph)
+    self.__has_variation_sequence = None
+    self.__round_trip = self.__ToSets(round_trip)
+    self.__fallback = self.__ToSets(fallback)
+    self.__img_from = self.__ToSets(img_from)
+
+  @property
+  def has_variation_sequence(self):
+    symbols = self.__has_variation_sequence
+    if symbols is None:
+      bits = 0
+      for (i, symbol) in enumerate(self._symbols):
+        if symbol.UnicodeHasVariationSequence(): bits |= 1 << i
+      # Concurrent callers might each build the set; any one will do.
+      symbols = self.__has_variation_sequence = SymbolSet(self, bits)
+    return symbols
+
+  def __ToSets(self, carrier_bits):
+    sets = {}
+    for (carrier, bits) in carrier_bits.iteritems():
+      sets[carrier] = SymbolSet(self, bits)
+    return sets
+
+  def __CarrierSet(self, sets, carrier):
+    try:
+      return sets[carrier]
+    except KeyError:
+      raise ValueError("unknown carrier \"%s\"" % carrier)
+
+  def RoundTrip(self, carrier):
+    """Symbols with a round-trip mapping to the carrier."""
+    return self.__CarrierSet(self.__round_trip, carrier)
+
+  def Fallback(self, carrier):
+    """Symbols with a fallback (one-way) mapping to the carrier."""
+    return self.__CarrierSet(self.__fallback, carrier)
+
+  def Mapped(self, carrier):
+    """Symbols with any mapping to the carrier."""
+    return self.RoundTrip(carrier) | self.Fallback(carrier)
+
+  def ImageFrom(self, carrier):
+    """Symbols whose representative image is from the carrier."""
+    return self.__CarrierSet(self.__img_from, carrier)
+
+  def FromSymbols(self, symbols):
+    """Returns the SymbolSet with the given symbols of this database."""
+    bits = 0
+    for symbol in symbols:
+      index = self._IndexOf(symbol)
+      if index is None:
+        raise ValueError("symbol e-%s is not from this database" % symbol.id)
+      bits |= 1 << index
+    return SymbolSet(self, bits)
+
+  def _IndexOf(self, symbol):
+    """Internal: Returns the symbol's bit index, or None."""
+    return self.__indexes.get(symbol)
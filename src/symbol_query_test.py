@@ -0,0 +1,83 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = "Markus Scherer"
+
+import unittest
+import emoji4unicode
+import symbol_query
+
+class SymbolQueryTest(unittest.TestCase):
+  def setUp(self):
+    emoji4unicode.Load()
+    self.__query = emoji4unicode.GetQuery()
+    self.__symbols = list(emoji4unicode.GetSymbols())
+
+  def __Filter(self, predicate):
+    return [symbol for symbol in self.__symbols if predicate(symbol)]
+
+  def testPredicates(self):
+    """Each predicate set has the same symbols as a loop over GetSymbols()."""
+    query = self.__query
+    self.assert_(emoji4unicode.GetQuery() is query)
+    self.assertEqual(list(query.all), self.__symbols)
+    self.assertEqual(len(query.all), len(self.__symbols))
+    self.assertEqual(list(query.none), [])
+    self.failIf(query.none)
+    self.assertEqual(list(query.in_proposal),
+                     self.__Filter(lambda symbol: symbol.in_proposal))
+    self.assertEqual(list(query.new),
+                     self.__Filter(lambda symbol: symbol.in_proposal and
+                                                  not symbol.GetUnicode()))
+    self.assertEqual(list(query.has_text_fallback),
+                     self.__Filter(lambda symbol: symbol.GetTextFallback()))
+    for carrier in query.carriers:
+      self.assertEqual(list(query.RoundTrip(carrier)), self.__Filter(
+          lambda symbol: symbol.GetCarrierUnicode(carrier) and
+                         not symbol.GetCarrierUnicode(carrier).startswith(">")))
+      self.assertEqual(list(query.Fallback(carrier)), self.__Filter(
+          lambda symbol: symbol.GetCarrierUnicode(carrier).startswith(">")))
+      self.assertEqual(list(query.ImageFrom(carrier)), self.__Filter(
+          lambda symbol: symbol.ImageFromWhichCarrier() == carrier))
+    self.assertRaises(ValueError, query.RoundTrip, "willcom")
+
+  def testOperations(self):
+    query = self.__query
+    unified = query.unified
+    kddi = query.RoundTrip("kddi")
+    self.assertEqual(list(unified & kddi), self.__Filter(
+        lambda symbol: symbol in unified and symbol in kddi))
+    self.assertEqual(len(unified | kddi),
+                     len(self.__Filter(
+                         lambda symbol: symbol in unified or symbol in kddi)))
+    self.assertEqual(unified - kddi, unified & ~kddi)
+    self.assertEqual(unified ^ kddi, (unified | kddi) - (unified & kddi))
+    self.assertEqual(~query.all, query.none)
+    self.assertEqual(~~kddi, kddi)
+    cloud = emoji4unicode.id_to_symbol["001"]
+    self.assertEqual(list(query.FromSymbols([cloud])), [cloud])
+    self.assert_(cloud in query.all)
+    self.failIf(cloud in query.none)
+
+  def testOtherDatabase(self):
+    other_query = symbol_query.SymbolQuery(
+        emoji4unicode.GetDefaultDatabase())
+    self.assertRaises(ValueError,
+                      lambda: self.__query.all & other_query.all)
+
+
+if __name__ == "__main__":
+  unittest.main()
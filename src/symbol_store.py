@@ -0,0 +1,438 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memory-mapped, column-oriented binary store of the Emoji symbols table.
+
+Write() exports the symbols of an Emoji4UnicodeDatabase into a file.
+SymbolStore memory-maps such a file and serves the emoji4unicode.Symbol
+accessor API directly from the mapped bytes, without building per-symbol
+objects up front.
+Many worker processes can open the same file: They share one copy of it
+in the operating system's page cache, and opening it takes no parsing.
+
+Usage: ./symbol_store.py [filename]
+Writes ../generated/emoji4unicode.symbols by default.
+
+File layout (all integers are little-endian uint32):
+  _MAGIC
+  header: symbol count, string count, sequence count, code point count,
+    string bytes length
+  one column per _COLUMNS entry, each with one value per symbol
+  id order: symbol indexes sorted by symbol ID
+  string offsets: string count + 1 offsets into the string bytes
+  sequence offsets: sequence count + 1 offsets into the code points
+  code points
+  string bytes: UTF-8
+
+String and sequence columns store indexes into the string and sequence
+tables. Equal values are stored once; index 0 is the empty string or
+the empty sequence.
+String list columns store indexes of sequences of string indexes.
+"""
+
+__author__ = "Markus Scherer"
+
+import mmap
+import os
+import os.path
+import struct
+import sys
+import emoji4unicode
+
+# Changes when the file layout or the _COLUMNS change.
+_MAGIC = "E4USTOR2"
+
+# The carriers of the Symbol data, in the same order.
+_CARRIERS = emoji4unicode._CARRIERS
+_CARRIER_INDEXES = emoji4unicode._CARRIER_INDEXES
+
+# Column name and value type: "s" string, "l" tuple of strings,
+# "q" code point sequence, "i" integer.
+_COLUMNS = (
+    ("id", "s"),
+    ("name", "s"),
+    ("old_name", "s"),
+    ("img_from", "s"),
+    ("text_repr", "s"),
+    ("annotations", "l"),
+    ("description", "s"),
+    ("design", "s"),
+    ("prop", "s"),
+    ("text_fallback", "s"),
+    ("arib", "s"),
+    ("unicode", "q"),
+    ("proposed", "q"),
+    ("docomo", "q"),
+    ("kddi", "q"),
+    ("softbank", "q"),
+    ("google", "q"),
+    ("glyph_ref_id", "i"),
+    ("flags", "i"))
+_COLUMN_INDEXES = dict([(column[0], i) for (i, column) in enumerate(_COLUMNS)])
+
+# Bits in the flags column.
+_IN_PROPOSAL = 1
+_HAS_VARIATION_SEQUENCE = 2
+_UPCOMING = 4
+_CARRIER_FALLBACK_SHIFT = 3  # One fallback bit per carrier from here.
+
+_UINT32 = struct.Struct("<I")
+_HEADER = struct.Struct("<5I")
+
+class _Tables(object):
+  """Collects deduplicated strings and code point sequences for Write()."""
+  def __init__(self):
+    self.strings = [""]
+    self.sequences = [()]
+    self.__string_indexes = {"": 0}
+    self.__sequence_indexes = {(): 0}
+
+  def AddString(self, s):
+    s = unicode(s)
+    index = self.__string_indexes.get(s)
+    if index is None:
+      index = self.__string_indexes[s] = len(self.strings)
+      self.strings.append(s)
+    return index
+
+  def AddSequence(self, code_points):
+    index = self.__sequence_indexes.get(code_points)
+    if index is None:
+      index = self.__sequence_indexes[code_points] = len(self.sequences)
+      self.sequences.append(code_points)
+    return index
+
+
+def Write(database, filename):
+  """Writes the symbols of the database into a symbol store file.
+
+  Replaces an existing file atomically, so that workers which have it open
+  keep their old, consistent view.
+
+  Args:
+    database: emoji4unicode.Emoji4UnicodeDatabase object
+    filename: Path/filename of the output file.
+  """
+  tables = _Tables()
+  symbols = list(database.GetSymbols())
+  columns = [[] for column in _COLUMNS]
+  def Set(name, value):
+    columns[_COLUMN_INDEXES[name]].append(value)
+  for symbol in symbols:
+    Set("id", tables.AddString(symbol.id))
+    Set("name", tables.AddString(symbol.GetName()))
+    Set("old_name", tables.AddString(symbol.GetOldName()))
+    Set("img_from", tables.AddString(symbol.ImageFromWhichCarrier()))
+    Set("text_repr", tables.AddString(symbol.GetTextRepresentation()))
+    Set("annotations",
+        tables.AddSequence(tuple([tables.AddString(annotation)
+                                  for annotation in symbol.GetAnnotations()])))
+    Set("description", tables.AddString(symbol.GetDescription()))
+    Set("design", tables.AddString(symbol.GetDesign()))
+    Set("prop", tables.AddString(symbol.GetProposedProperties()))
+    Set("text_fallback", tables.AddString(symbol.GetTextFallback()))
+    Set("arib", tables.AddString(symbol.GetARIB() or ""))
+    Set("unicode", tables.AddSequence(symbol.GetUnicodeCodePoints()))
+    Set("proposed", tables.AddSequence(symbol.GetProposedUnicodeCodePoints()))
+    flags = 0
+    if symbol.in_proposal: flags |= _IN_PROPOSAL
+    if symbol.UnicodeHasVariationSequence(): flags |= _HAS_VARIATION_SEQUENCE
+    if symbol.IsUnifiedWithUpcomingCharacter(): flags |= _UPCOMING
+    for (i, carrier) in enumerate(_CARRIERS):
+      (is_fallback, code_points) = symbol.GetCarrierCodePoints(carrier)
+      Set(carrier, tables.AddSequence(code_points))
+      if is_fallback: flags |= 1 << (_CARRIER_FALLBACK_SHIFT + i)
+    Set("glyph_ref_id", symbol.GetGlyphRefID())
+    Set("flags", flags)
+  id_order = sorted(range(len(symbols)), key=lambda i: symbols[i].id)
+  string_bytes = []
+  string_offsets = [0]
+  length = 0
+  for s in tables.strings:
+    utf8 = s.encode("UTF-8")
+    string_bytes.append(utf8)
+    length += len(utf8)
+    string_offsets.append(length)
+  sequence_offsets = [0]
+  code_points = []
+  for sequence in tables.sequences:
+    code_points.extend(sequence)
+    sequence_offsets.append(len(code_points))
+  def PackUInt32s(values):
+    return struct.pack("<%dI" % len(values), *values)
+  temp_filename = "%s.%d.tmp" % (filename, os.getpid())
+  file = open(temp_filename, "wb")
+  try:
+    file.write(_MAGIC)
+    file.write(_HEADER.pack(len(symbols), len(tables.strings),
+                            len(tables.sequences), len(code_points), length))
+    for column in columns: file.write(PackUInt32s(column))
+    file.write(PackUInt32s(id_order))
+    file.write(PackUInt32s(string_offsets))
+    file.write(PackUInt32s(sequence_offsets))
+    file.write(PackUInt32s(code_points))
+    file.write("".join(string_bytes))
+  finally:
+    file.close()
+  if os.name == "nt" and os.path.exists(filename): os.remove(filename)
+  os.rename(temp_filename, filename)
+
+
+class SymbolStore(object):
+  """Read-only, memory-mapped symbol store file.
+
+  Serves StoreSymbol objects with the emoji4unicode.Symbol accessor API.
+  Values are read from the mapped file on each access, which makes
+  each call slower than with an in-memory Symbol but keeps the data
+  in shared pages.
+  """
+  def __init__(self, filename):
+    """Memory-map a symbol store file.
+
+    Args:
+      filename: Path/filename of a file written by Write().
+
+    Raises:
+      ValueError: If the file is not a symbol store file of this version.
+    """
+    file = open(filename, "rb")
+    try:
+      self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+      file.close()  # The mapping stays valid.
+    data = self.__map
+    if data[:len(_MAGIC)] != _MAGIC:
+      raise ValueError("%s is not a symbol store file of this version" %
+                       filename)
+    (self.__count, string_count, sequence_count, code_point_count,
+     string_bytes_length) = _HEADER.unpack_from(data, len(_MAGIC))
+    offset = len(_MAGIC) + _HEADER.size
+    # Map from column name to (column offset, value type).
+    self.__columns = {}
+    for (name, type) in _COLUMNS:
+      self.__columns[name] = (offset, type)
+      offset += 4 * self.__count
+    self.__id_order_offset = offset
+    offset += 4 * self.__count
+    self.__string_offsets_offset = offset
+    offset += 4 * (string_count + 1)
+    self.__sequence_offsets_offset = offset
+    offset += 4 * (sequence_count + 1)
+    self.__code_points_offset = offset
+    offset += 4 * code_point_count
+    self.__string_bytes_offset = offset
+    if offset + string_bytes_length != len(data):
+      raise ValueError("%s is truncated or corrupt" % filename)
+
+  def close(self):
+    """Unmaps the file. The store and its symbols must not be used after."""
+    self.__map.close()
+
+  def __len__(self):
+    return self.__count
+
+  def GetSymbol(self, index):
+    """Get the StoreSymbol at the index, in the order of GetSymbols()."""
+    if not 0 <= index < self.__count: raise IndexError(index)
+    return StoreSymbol(self, index)
+
+  def GetSymbols(self):
+    """Generator of StoreSymbol objects, in emoji4unicode.xml order."""
+    for index in xrange(self.__count):
+      yield StoreSymbol(self, index)
+
+  def SymbolFromId(self, id):
+    """Get the StoreSymbol with the symbol ID, or None if there is none."""
+    # Binary search in the id order.
+    start = 0
+    limit = self.__count
+    while start < limit:
+      i = (start + limit) / 2
+      index = self._UInt32(self.__id_order_offset + 4 * i)
+      symbol_id = self._Value(index, "id")
+      if id < symbol_id:
+        limit = i
+      elif id > symbol_id:
+        start = i + 1
+      else:
+        return StoreSymbol(self, index)
+    return None
+
+  def _UInt32(self, offset):
+    return _UINT32.unpack_from(self.__map, offset)[0]
+
+  def _RawValue(self, index, column):
+    """Internal: Get a symbol's raw integer value from a column."""
+    return _UINT32.unpack_from(self.__map,
+                               self.__columns[column][0] + 4 * index)[0]
+
+  def _Value(self, index, column):
+    """Internal: Get a symbol's decoded value from a column."""
+    (offset, type) = self.__columns[column]
+    value = _UINT32.unpack_from(self.__map, offset + 4 * index)[0]
+    if type == "s":
+      return self.__String(value)
+    elif type == "l":
+      return tuple([self.__String(string_index)
+                    for string_index in self.__Sequence(value)])
+    elif type == "q":
+      return self.__Sequence(value)
+    else:
+      return value
+
+  def __String(self, string_index):
+    if not string_index: return ""
+    (start, limit) = struct.unpack_from(
+        "<2I", self.__map, self.__string_offsets_offset + 4 * string_index)
+    start += self.__string_bytes_offset
+    limit += self.__string_bytes_offset
+    return self.__map[start:limit].decode("UTF-8")
+
+  def __Sequence(self, sequence_index):
+    if not sequence_index: return ()
+    (start, limit) = struct.unpack_from(
+        "<2I", self.__map, self.__sequence_offsets_offset + 4 * sequence_index)
+    return struct.unpack_from("<%dI" % (limit - start), self.__map,
+                              self.__code_points_offset + 4 * start)
+
+
+def _CodePointsToString(code_points):
+  return "+".join(["%04X" % code_point for code_point in code_points])
+
+
+class StoreSymbol(object):
+  """An Emoji symbol in a SymbolStore.
+
+  Provides the emoji4unicode.Symbol accessor API except for the
+  subcategory attribute and ImageHTML(), which need the full database.
+  Two StoreSymbol objects for the same symbol compare equal.
+  """
+  __slots__ = ("_store", "_index")
+
+  def __init__(self, store, index):
+    """Do not instantiate directly: Use SymbolStore.GetSymbols() etc."""
+    self._store = store
+    self._index = index
+
+  def __eq__(self, other):
+    return (isinstance(other, StoreSymbol) and self._store is other._store and
+            self._index == other._index)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return self._index
+
+  def __Get(self, column):
+    return self._store._Value(self._index, column)
+
+  def __Flags(self):
+    return self._store._RawValue(self._index, "flags")
+
+  @property
+  def id(self):
+    return self.__Get("id")
+
+  @property
+  def in_proposal(self):
+    return bool(self.__Flags() & _IN_PROPOSAL)
+
+  def GetName(self):
+    return self.__Get("name")
+
+  def GetOldName(self):
+    return self.__Get("old_name")
+
+  def ImageFromWhichCarrier(self):
+    return self.__Get("img_from")
+
+  def GetTextRepresentation(self):
+    return self.__Get("text_repr")
+
+  def GetAnnotations(self):
+    return self.__Get("annotations")
+
+  def GetDescription(self):
+    return self.__Get("description")
+
+  def GetDesign(self):
+    return self.__Get("design")
+
+  def GetGlyphRefID(self):
+    return self.__Get("glyph_ref_id")
+
+  def GetFontUnicode(self):
+    return "E" + self.id
+
+  def GetUnicode(self):
+    return _CodePointsToString(self.__Get("unicode"))
+
+  def GetUnicodeCodePoints(self):
+    return self.__Get("unicode")
+
+  def UnicodeHasVariationSequence(self):
+    return bool(self.__Flags() & _HAS_VARIATION_SEQUENCE)
+
+  def IsUnifiedWithUpcomingCharacter(self):
+    return bool(self.__Flags() & _UPCOMING)
+
+  def GetProposedUnicode(self):
+    return _CodePointsToString(self.__Get("proposed"))
+
+  def GetProposedUnicodeCodePoints(self):
+    return self.__Get("proposed")
+
+  def GetProposedProperties(self):
+    return self.__Get("prop")
+
+  def GetARIB(self):
+    return self.__Get("arib") or None
+
+  def GetCarrierCodePoints(self, carrier):
+    index = _CARRIER_INDEXES.get(carrier)
+    if index is None: raise ValueError("unknown carrier \"%s\"" % carrier)
+    is_fallback = bool(self.__Flags() &
+                       (1 << (_CARRIER_FALLBACK_SHIFT + index)))
+    return (is_fallback, self.__Get(carrier))
+
+  def GetCarrierCodes(self, carrier):
+    (is_fallback, code_points) = self.GetCarrierCodePoints(carrier)
+    return (is_fallback,
+            tuple(["%04X" % code_point for code_point in code_points]))
+
+  def GetCarrierUnicode(self, carrier):
+    (is_fallback, code_points) = self.GetCarrierCodePoints(carrier)
+    uni = _CodePointsToString(code_points)
+    if is_fallback: uni = ">" + uni
+    return uni
+
+  def GetTextFallback(self):
+    return self.__Get("text_fallback")
+
+
+def main():
+  if len(sys.argv) > 1:
+    filename = sys.argv[1]
+  else:
+    filename = os.path.join(os.path.dirname(__file__),
+                            "..", "generated", "emoji4unicode.symbols")
+  emoji4unicode.Load()
+  Write(emoji4unicode.GetDefaultDatabase(), filename)
+
+
+if __name__ == "__main__":
+  main()
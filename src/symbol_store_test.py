@@ -0,0 +1,118 @@
+#!/usr/bin/python2.6
+#
+# Copyright 2012 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = "Markus Scherer"
+
+import os.path
+import shutil
+import tempfile
+import unittest
+import emoji4unicode
+import emoji4unicode_test
+import snapshot
+import symbol_store
+
+class SymbolStoreTest(unittest.TestCase):
+  def setUp(self):
+    emoji4unicode.Load()
+    self.__temp_dir = tempfile.mkdtemp()
+    self.__filename = os.path.join(self.__temp_dir, "test.symbols")
+    symbol_store.Write(emoji4unicode.GetDefaultDatabase(), self.__filename)
+    self.__store = symbol_store.SymbolStore(self.__filename)
+
+  def tearDown(self):
+    self.__store.close()
+    shutil.rmtree(self.__temp_dir)
+
+  def testSameAsDatabase(self):
+    """Every accessor returns the same values as the parsed database."""
+    symbols = list(emoji4unicode.GetSymbols())
+    self.assertEqual(len(self.__store), len(symbols))
+    for (symbol, stored) in zip(symbols, self.__store.GetSymbols()):
+      self.assertEqual(stored.id, symbol.id)
+      self.assertEqual(stored.in_proposal, symbol.in_proposal)
+      for name in ("GetName", "GetOldName", "ImageFromWhichCarrier",
+                   "GetTextRepresentation", "GetAnnotations",
+                   "GetDescription", "GetDesign", "GetGlyphRefID",
+                   "GetFontUnicode", "GetUnicode", "GetUnicodeCodePoints",
+                   "UnicodeHasVariationSequence",
+                   "IsUnifiedWithUpcomingCharacter", "GetProposedUnicode",
+                   "GetProposedUnicodeCodePoints", "GetProposedProperties",
+                   "GetARIB", "GetTextFallback"):
+        self.assertEqual(getattr(stored, name)(), getattr(symbol, name)(),
+                         "e-%s %s()" % (symbol.id, name))
+      for carrier in emoji4unicode.carriers:
+        self.assertEqual(stored.GetCarrierUnicode(carrier),
+                         symbol.GetCarrierUnicode(carrier))
+        self.assertEqual(stored.GetCarrierCodes(carrier),
+                         symbol.GetCarrierCodes(carrier))
+        self.assertEqual(stored.GetCarrierCodePoints(carrier),
+                         symbol.GetCarrierCodePoints(carrier))
+
+  def testSymbolFromId(self):
+    for symbol in emoji4unicode.GetSymbols():
+      self.assertEqual(self.__store.SymbolFromId(symbol.id).GetName(),
+                       symbol.GetName())
+    self.assertEqual(self.__store.SymbolFromId("FFF"), None)
+    self.assertEqual(self.__store.SymbolFromId("001"),
+                     self.__store.SymbolFromId("001"))
+    self.assertRaises(ValueError,
+                      self.__store.GetSymbol(0).GetCarrierUnicode, "willcom")
+
+  def testBadFile(self):
+    bad_filename = os.path.join(self.__temp_dir, "bad.symbols")
+    contents = open(self.__filename, "rb").read()
+    for bad in ("garbage" * 4, contents[:-1]):
+      file = open(bad_filename, "wb")
+      file.write(bad)
+      file.close()
+      self.assertRaises(ValueError, symbol_store.SymbolStore, bad_filename)
+
+
+class SymbolStoreAnnotationsTest(unittest.TestCase):
+  def setUp(self):
+    """Make a data folder with unusual annotations in emoji4unicode.xml."""
+    self.__temp_dir = emoji4unicode_test.MakeDataFolder(
+        lambda contents: contents.replace(
+            "<ann>= typhoon, hurricane</ann>",
+            "<ann>= typhoon, hurricane</ann>\n<ann></ann>\n"
+            "<ann>line1\nline2</ann>"))
+    # Do not leave snapshots of the temporary files in the real cache.
+    self.__saved_cache_dir = snapshot.GetCacheDirectory()
+    snapshot.SetCacheDirectory(os.path.join(self.__temp_dir, "cache"))
+
+  def tearDown(self):
+    snapshot.SetCacheDirectory(self.__saved_cache_dir)
+    shutil.rmtree(self.__temp_dir)
+
+  def testEmptyAndMultiLineAnnotations(self):
+    database = emoji4unicode.Emoji4UnicodeDatabase(self.__temp_dir)
+    filename = os.path.join(self.__temp_dir, "test.symbols")
+    symbol_store.Write(database, filename)
+    store = symbol_store.SymbolStore(filename)
+    try:
+      for id in ("001", "005"):
+        self.assertEqual(store.SymbolFromId(id).GetAnnotations(),
+                         database.id_to_symbol[id].GetAnnotations())
+      self.assertEqual(store.SymbolFromId("005").GetAnnotations(),
+                       (u"= typhoon, hurricane", u"", u"line1\nline2"))
+      self.assertEqual(store.SymbolFromId("001").GetAnnotations(), ())
+    finally:
+      store.close()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -25,6 +25,8 @@ It assumes well-formed .ucm files.
 
 __author__ = "Markus Scherer"
 
+import snapshot
+
 class UCMFile(object):
   """Parse and represent a .ucm Unicode conversion mapping file.
 
@@ -37,28 +39,57 @@ class UCMFile(object):
         to strings.
   """
   def __init__(self, filename):
-    """Parse a .ucm file.
+    """Prepare to parse a .ucm file.
+
+    The file is parsed when one of the attributes is first read.
 
     Args:
       filename: Path/filename of the .ucm file.
     """
-    self.round_trip_code_points = set()
-    self.from_unicode = {}
-    file = open(filename, "r")
-    for line in file:
-      line = line.strip()  # Remove trailing newlines etc.
-      index = line.find("#")  # Remove comments.
-      if index >= 0: line = line[:index].rstrip()
-      if not line: continue  # Skip empty lines.
-      if line.startswith("<U"):
-        uni, bytes, precision = line.split()
-        uni = _RemoveMappingSyntax(uni)
-        bytes = _RemoveMappingSyntax(bytes)
-        if precision == "|0":
-          self.round_trip_code_points.add(uni)
-        if precision == "|0" or precision == "|1":
-          self.from_unicode[uni] = bytes
-    self.round_trip_code_points = frozenset(self.round_trip_code_points)
+    self.__filename = filename
+    self.__data = None
+
+  def __GetData(self):
+    data = self.__data
+    if data is None:
+      (round_trip_code_points, from_unicode) = snapshot.Load(self.__filename,
+                                                             _ParseUCM)
+      # Concurrent callers might each parse the file; any result will do.
+      data = self.__data = (frozenset(round_trip_code_points), from_unicode)
+    return data
+
+  @property
+  def round_trip_code_points(self):
+    return self.__GetData()[0]
+
+  @property
+  def from_unicode(self):
+    return self.__GetData()[1]
+
+
+def _ParseUCM(contents):
+  """Parse the contents of a .ucm file.
+
+  Returns:
+    A pair of the list of round-trip code points and
+    the from_unicode dictionary.
+  """
+  round_trip_code_points = []
+  from_unicode = {}
+  for line in contents.splitlines():
+    line = line.strip()  # Remove trailing newlines etc.
+    index = line.find("#")  # Remove comments.
+    if index >= 0: line = line[:index].rstrip()
+    if not line: continue  # Skip empty lines.
+    if line.startswith("<U"):
+      uni, bytes, precision = line.split()
+      uni = _RemoveMappingSyntax(uni)
+      bytes = _RemoveMappingSyntax(bytes)
+      if precision == "|0":
+        round_trip_code_points.append(uni)
+      if precision == "|0" or precision == "|1":
+        from_unicode[uni] = bytes
+  return (round_trip_code_points, from_unicode)
 
 
 _MAPPING_CHARS = frozenset("0123456789ABCDEF+")
@@ -66,9 +66,17 @@ def GetAge(uni):
   plus-separated input code point string,
   or empty string if all code points are unassigned.
   """
+  return GetAgeOfCodePoints([int(code_point, 16)
+                             for code_point in uni.split('+') if code_point])
+
+
+def GetAgeOfCodePoints(code_points):
+  """Returns age string for newest character in
+  the sequence of code point integers,
+  or empty string if all code points are unassigned.
+  """
   age = u""
-  for code_point in uni.split('+'):
-    if code_point:
-      cp_age = _FindAge(int(code_point, 16))
-      if cp_age and cp_age > age: age = cp_age
+  for code_point in code_points:
+    cp_age = _FindAge(code_point)
+    if cp_age and cp_age > age: age = cp_age
   return age
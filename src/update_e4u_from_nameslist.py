@@ -26,18 +26,16 @@ and writes a modified XML file to ../generated/emoji4unicode.xml.
 __author__ = "Markus Scherer"
 
 import os.path
-import xml.dom.minidom
 import emoji4unicode
 import nameslist
 
 def main():
   here = os.path.dirname(__file__)
   e4u_filename = os.path.join(here, "..", "data", "emoji4unicode.xml")
-  doc = xml.dom.minidom.parse(e4u_filename)
-  root = doc.documentElement
+  document = emoji4unicode.ReadDocument(e4u_filename)
   id_to_symbol = {}
-  for symbol in root.getElementsByTagName("e"):
-    id_to_symbol[symbol.getAttribute("id")] = symbol
+  for symbol in document.root.GetElements("e"):
+    id_to_symbol[symbol.attributes.get("id", u"")] = symbol
   nameslist_filename = os.path.join(here, "..", "data",
                                     "unicode", "uc60-a-FDAM8-SanJose.lst")
   for record in nameslist.Read(nameslist_filename):
@@ -48,11 +46,12 @@ def main():
       continue
     # Extract the old data from the emoji4unicode.xml <e> symbol element.
     symbol = id_to_symbol[id]
-    old_uni = symbol.getAttribute("unicode")
-    old_name = symbol.getAttribute("name")
+    attributes = symbol.attributes
+    old_uni = attributes.get("unicode", u"")
+    old_name = attributes.get("name", u"")
     old_annotations = []
-    for element in symbol.getElementsByTagName("ann"):
-      old_annotations.append(element.firstChild.nodeValue.strip())
+    for element in symbol.GetElements("ann"):
+      old_annotations.append(element.GetText().strip())
     # Extract the new data from the NamesList record.
     new_uni = record["uni"]
     new_name = record["name"]
@@ -62,25 +61,22 @@ def main():
       print ("*** e-%s: setting proposed code point %s but " +
              "old %s was not proposed" %
              (id, new_uni, old_uni))
-    symbol.setAttribute("unicode", u"+" + new_uni)
+    attributes["unicode"] = u"+" + new_uni
     # Update the proposed character name.
     # Keep the previous name in an oldname attribute.
     if old_name == new_name:
-      if symbol.getAttribute("oldname"):
-        symbol.removeAttribute("oldname")
+      if attributes.get("oldname"):
+        del attributes["oldname"]
     else:
-      symbol.setAttribute("oldname", old_name)
-      symbol.setAttribute("name", new_name)
+      attributes["oldname"] = old_name
+      attributes["name"] = new_name
     # Append new annotations.
     for ann in new_annotations:
       # Skip the Emoji symbol ID alias, and annotations that are not new.
       if not ann.startswith(u"= e-") and ann not in old_annotations:
-        ann_element = doc.createElement("ann")
-        ann_element.appendChild(doc.createTextNode(ann))
-        symbol.appendChild(ann_element)
+        symbol.children.append(emoji4unicode.Element("ann", children=[ann]))
   out_filename = os.path.join(here, "..", "generated", "emoji4unicode.xml")
-  emoji4unicode.Write(doc, out_filename)
-  doc.unlink()
+  emoji4unicode.Write(document, out_filename)
 
 
 if __name__ == "__main__":
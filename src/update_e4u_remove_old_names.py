@@ -25,21 +25,18 @@ and writes a modified XML file to ../generated/emoji4unicode.xml.
 __author__ = "Markus Scherer"
 
 import os.path
-import xml.dom.minidom
 import emoji4unicode
 import nameslist
 
 def main():
   here = os.path.dirname(__file__)
   e4u_filename = os.path.join(here, "..", "data", "emoji4unicode.xml")
-  doc = xml.dom.minidom.parse(e4u_filename)
-  root = doc.documentElement
-  for symbol in root.getElementsByTagName("e"):
-    if symbol.getAttribute("oldname"):
-      symbol.removeAttribute("oldname")
+  document = emoji4unicode.ReadDocument(e4u_filename)
+  for symbol in document.root.GetElements("e"):
+    if symbol.attributes.get("oldname"):
+      del symbol.attributes["oldname"]
   out_filename = os.path.join(here, "..", "generated", "emoji4unicode.xml")
-  emoji4unicode.Write(doc, out_filename)
-  doc.unlink()
+  emoji4unicode.Write(document, out_filename)
 
 
 if __name__ == "__main__":